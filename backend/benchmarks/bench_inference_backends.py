@@ -0,0 +1,155 @@
+"""
+Parity and latency of the Whisper and SpeechT5 inference backends
+(eager, int8, compile, onnx) on fixture audio, to pick one per deployment.
+
+STT: each backend transcribes the fixture clips; WER is against the reference
+text and drift is the WER of its transcripts against eager's.
+TTS: each backend synthesizes the fixture texts; the audio is transcribed with
+eager Whisper, so WER measures intelligibility and drift the change from eager.
+
+Fixture clips are WAV files with a same-named .txt transcript in --fixtures-dir;
+without one, song lines are synthesized with eager SpeechT5.
+
+Usage (from backend/):
+    python -m benchmarks.bench_inference_backends --models stt tts --backends eager int8 compile onnx
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import time
+import numpy as np
+import soundfile as sf
+from benchmarks.common import print_table, word_error_rate
+from models.audio import decode_audio
+from models.inference_backend import INFERENCE_BACKENDS
+
+
+def song_lines(data_path: str, count: int):
+    with open(data_path, 'r') as f:
+        lines = [line for song in json.load(f) for line in song['lyrics']]
+    return lines[:count]
+
+
+def load_fixtures(fixtures_dir: str):
+    """(audio, reference text) pairs from WAV + .txt files"""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.wav"))):
+        with open(os.path.splitext(path)[0] + ".txt", 'r') as f:
+            reference = f.read().strip()
+        with open(path, 'rb') as f:
+            fixtures.append((decode_audio(f.read()), reference))
+    return fixtures
+
+
+def timed(call, inputs):
+    """Outputs and per-input latencies in milliseconds, after one warm-up call"""
+    call(inputs[0])
+    outputs, latencies = [], []
+    for item in inputs:
+        start = time.perf_counter()
+        outputs.append(call(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return outputs, np.array(latencies)
+
+
+def mean_wer(references, hypotheses):
+    return float(np.mean([word_error_rate(ref, hyp) for ref, hyp in zip(references, hypotheses)]))
+
+
+def bench_stt(backends, fixtures):
+    from models.whisper_model import WhisperModel
+
+    audio = [clip for clip, _ in fixtures]
+    references = [text for _, text in fixtures]
+    audio_seconds = sum(len(clip) for clip in audio) / 16000
+    rows, eager_texts = [], None
+
+    for backend in backends:
+        start = time.perf_counter()
+        model = WhisperModel(backend=backend)
+        load_seconds = time.perf_counter() - start
+
+        texts, latencies = timed(model.transcribe, audio)
+        eager_texts = eager_texts or (texts if backend == "eager" else None)
+        rows.append({
+            "model": "stt", "backend": model.backend, "load_s": load_seconds,
+            "p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+            "rtf": latencies.sum() / 1000 / audio_seconds,
+            "wer": mean_wer(references, texts),
+            "drift": mean_wer(eager_texts, texts) if eager_texts else float("nan"),
+        })
+        del model
+        gc.collect()
+
+    return rows
+
+
+def bench_tts(backends, texts, transcriber):
+    from models.tts_model import TTSModel
+
+    rows, eager_transcripts = [], None
+    for backend in backends:
+        start = time.perf_counter()
+        model = TTSModel(backend=backend)
+        load_seconds = time.perf_counter() - start
+
+        clips, latencies = timed(model.generate, texts)
+        audio_seconds = sum(len(clip) for clip in clips) / 16000
+        transcripts = [transcriber.transcribe(clip) for clip in clips]
+        eager_transcripts = eager_transcripts or (transcripts if backend == "eager" else None)
+        rows.append({
+            "model": "tts", "backend": model.backend, "load_s": load_seconds,
+            "p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+            "rtf": latencies.sum() / 1000 / audio_seconds,
+            "wer": mean_wer(texts, transcripts),
+            "drift": mean_wer(eager_transcripts, transcripts) if eager_transcripts else float("nan"),
+        })
+        del model
+        gc.collect()
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=["stt", "tts"], default=["stt", "tts"])
+    parser.add_argument("--backends", nargs="+", choices=INFERENCE_BACKENDS, default=list(INFERENCE_BACKENDS))
+    parser.add_argument("--fixtures-dir", help="WAV clips with .txt transcripts (default: synthesized song lines)")
+    parser.add_argument("--clips", type=int, default=16, help="Song lines to use as fixtures")
+    parser.add_argument("--data-path", default="data/songs.json")
+    parser.add_argument("--save-fixtures", help="Write the synthesized fixtures here for later runs")
+    args = parser.parse_args()
+
+    # Eager first, it is the reference for drift
+    backends = sorted(set(args.backends), key=INFERENCE_BACKENDS.index)
+    texts = song_lines(args.data_path, args.clips)
+
+    from models.whisper_model import WhisperModel
+    from models.tts_model import TTSModel
+
+    if args.fixtures_dir:
+        fixtures = load_fixtures(args.fixtures_dir)
+    else:
+        reference_tts = TTSModel(backend="eager")
+        fixtures = [(reference_tts.generate(text), text) for text in texts]
+        del reference_tts
+        if args.save_fixtures:
+            os.makedirs(args.save_fixtures, exist_ok=True)
+            for i, (clip, text) in enumerate(fixtures):
+                sf.write(os.path.join(args.save_fixtures, f"{i:03d}.wav"), clip, samplerate=16000)
+                with open(os.path.join(args.save_fixtures, f"{i:03d}.txt"), 'w') as f:
+                    f.write(text)
+
+    rows = []
+    if "stt" in args.models:
+        rows += bench_stt(backends, fixtures)
+    if "tts" in args.models:
+        rows += bench_tts(backends, texts, WhisperModel(backend="eager"))
+
+    print_table(rows, ["model", "backend", "load_s", "p50_ms", "p95_ms", "rtf", "wer", "drift"])
+
+
+if __name__ == "__main__":
+    main()
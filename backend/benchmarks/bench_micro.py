@@ -0,0 +1,121 @@
+"""
+Micro-benchmarks of the model calls behind each endpoint, on fixture audio and text:
+
+    rag_build         LyricsRAG over the song catalog from scratch (encode + index)
+    rag_next_line     LyricsRAG.get_next_line with the caches cleared
+    rag_next_cached   LyricsRAG.get_next_line answered from the result cache
+    whisper           WhisperModel.transcribe on 2, 5 and 10 s clips
+    tts               TTSModel.synthesize of short phrases and lyrics lines
+
+Usage (from backend/):
+    python -m benchmarks.bench_micro --repeat 20
+    python -m benchmarks.bench_micro --tiny --repeat 5     # offline, tiny random-weight models
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from benchmarks.common import print_table, summarize, synthetic_speech
+
+BENCHMARKS = ("rag_build", "rag_next_line", "rag_next_cached", "whisper", "tts")
+QUERIES_PATH = os.path.join(os.path.dirname(__file__), "lyrics_queries.json")
+CLIP_SECONDS = (2, 5, 10)
+
+
+def measure(call, inputs, repeat: int):
+    """Latencies in seconds of call(input) for every input, repeat times over"""
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            call(item)
+            latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def bench_rag(names, args):
+    from models.lyrics_rag import LyricsRAG
+    from models.registry import model_registry
+
+    rag = model_registry.get("rag", wait=True)
+    with open(QUERIES_PATH, 'r') as f:
+        queries = [query["query"] for query in json.load(f)]
+    rows = {}
+
+    if "rag_build" in names:
+        def build(_):
+            # A fresh index directory each time, so nothing is loaded from disk
+            with tempfile.TemporaryDirectory() as index_dir:
+                LyricsRAG(data_path=args.data_path, index_dir=index_dir, model=rag.model)
+        rows["rag_build"] = measure(build, [None], args.repeat)
+
+    if "rag_next_line" in names:
+        def next_line(query):
+            rag.query_cache.clear()
+            rag.result_cache.clear()
+            rag.get_next_line(query)
+        rows["rag_next_line"] = measure(next_line, queries, args.repeat)
+
+    if "rag_next_cached" in names:
+        for query in queries:
+            rag.get_next_line(query)
+        rows["rag_next_cached"] = measure(rag.get_next_line, queries, args.repeat)
+    return rows
+
+
+def bench_whisper(args):
+    from models.registry import model_registry
+
+    stt = model_registry.get("stt", wait=True)
+    clips = [synthetic_speech(seconds, seed=i) for i, seconds in enumerate(CLIP_SECONDS)]
+    stt.transcribe(clips[0]) # warm-up
+    return {"whisper": measure(stt.transcribe, clips, args.repeat)}
+
+
+def bench_tts(args):
+    from benchmarks.bench_tts_batching import fixture_texts
+    from models.registry import model_registry
+
+    tts = model_registry.get("tts", wait=True)
+    texts = fixture_texts(args.data_path, 8)
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = os.path.join(out_dir, "speech.wav")
+        tts.synthesize(texts[0], path) # warm-up
+        return {"tts": measure(lambda text: tts.synthesize(text, path), texts, args.repeat)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=10, help="Passes over the fixture inputs")
+    parser.add_argument("--data-path", default="data/songs.json")
+    parser.add_argument("--tiny", action="store_true", help="Tiny random-weight models (MODEL_PROFILE=tiny)")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    # Before any model module is imported: the model ids are resolved on import
+    if args.tiny:
+        os.environ["MODEL_PROFILE"] = "tiny"
+
+    latencies = {}
+    rag_names = [name for name in args.benchmarks if name.startswith("rag_")]
+    if rag_names:
+        latencies.update(bench_rag(rag_names, args))
+    if "whisper" in args.benchmarks:
+        latencies.update(bench_whisper(args))
+    if "tts" in args.benchmarks:
+        latencies.update(bench_tts(args))
+
+    # rps here is calls per second of one sequential caller
+    rows = [{"benchmark": name, **summarize(latencies[name], float(latencies[name].sum()))}
+            for name in args.benchmarks]
+    print_table(rows, ["benchmark", "requests", "rps", "p50_ms", "p95_ms", "p99_ms"])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
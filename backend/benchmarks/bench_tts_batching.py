@@ -0,0 +1,57 @@
+"""
+Synthesis throughput of batched SpeechT5 + HiFiGAN against sequential calls.
+
+Usage (from backend/):
+    python -m benchmarks.bench_tts_batching --batch-sizes 1 2 4 8
+"""
+import argparse
+import json
+import time
+from benchmarks.common import print_table
+from models.registry import model_registry
+
+# Short clips the frontend asks for several at a time
+PROFESSIONS = ["Chef", "Doctor", "Police officer", "Criminal", "Tukang masak", "Doktor", "Polis", "Isha", "Keisatsukan"]
+
+
+def fixture_texts(data_path: str, count: int):
+    with open(data_path, 'r') as f:
+        lines = [line for song in json.load(f) for line in song['lyrics']]
+    texts = PROFESSIONS + lines
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--texts", type=int, default=32, help="Clips per run")
+    parser.add_argument("--data-path", default="data/songs.json")
+    args = parser.parse_args()
+
+    texts = fixture_texts(args.data_path, args.texts)
+    tts_model = model_registry.get("tts", wait=True)
+    tts_model.generate(texts[0]) # warm-up
+
+    start = time.perf_counter()
+    for text in texts:
+        tts_model.generate(text)
+    sequential = time.perf_counter() - start
+
+    rows = [{"mode": "sequential", "batch_size": 1, "clips_per_s": len(texts) / sequential, "speedup": 1.0}]
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            tts_model.generate_batch(texts[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "mode": "batched",
+            "batch_size": batch_size,
+            "clips_per_s": len(texts) / elapsed,
+            "speedup": sequential / elapsed
+        })
+
+    print_table(rows, ["mode", "batch_size", "clips_per_s", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
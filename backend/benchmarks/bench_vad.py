@@ -0,0 +1,104 @@
+"""
+Whisper time with and without the VAD (models/vad.py) in front of it.
+
+Each recording is transcribed as uploaded and after trimming; "vad" times include
+the trimming itself, and a clip the VAD rejects costs only that. The built-in
+recordings have the layout of real uploads (room noise, late start, early
+start, pauses); pass your own with --files (any format decode_audio reads).
+
+Usage (from backend/):
+    python -m benchmarks.bench_vad --repeat 5
+    python -m benchmarks.bench_vad --tiny --repeat 3
+    python -m benchmarks.bench_vad --files recordings/*.webm
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from benchmarks.common import print_table, synthetic_recording
+
+RECORDINGS = {
+    "short_answer": [("silence", 1.5), ("speech", 1.2), ("silence", 2.0)],
+    "lyrics_line": [("silence", 1.0), ("speech", 3.0), ("silence", 1.5), ("speech", 2.5), ("silence", 2.0)],
+    "long_pauses": [("silence", 0.5), ("speech", 2.0), ("silence", 3.0), ("speech", 2.0), ("silence", 3.0),
+                    ("speech", 2.0), ("silence", 1.0)],
+    "late_stop": [("silence", 1.0), ("speech", 4.0), ("silence", 8.0)],
+    "over_30s": [("silence", 2.0), ("speech", 12.0), ("silence", 6.0), ("speech", 12.0), ("silence", 4.0)],
+    "silent": [("silence", 10.0)],
+}
+
+
+def load_recordings(files):
+    from models.audio import decode_audio
+
+    if not files:
+        return {name: synthetic_recording(parts, seed=i) for i, (name, parts) in enumerate(RECORDINGS.items())}
+    recordings = {}
+    for path in files:
+        with open(path, 'rb') as f:
+            recordings[os.path.basename(path)] = decode_audio(f.read())
+    return recordings
+
+
+def best_of(call, repeat: int) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", help="Recordings to use instead of the built-in ones")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tiny", action="store_true", help="Tiny random-weight Whisper (MODEL_PROFILE=tiny)")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    # Before any model module is imported: the model ids are resolved on import
+    if args.tiny:
+        os.environ["MODEL_PROFILE"] = "tiny"
+    from models.registry import model_registry
+    from models.vad import vad
+
+    stt = model_registry.get("stt", wait=True)
+    recordings = load_recordings(args.files)
+    stt.transcribe(next(iter(recordings.values()))) # warm-up
+
+    rows = []
+    for name, audio in recordings.items():
+        result = vad.trim(audio)
+
+        def with_vad():
+            speech = vad.trim(audio)
+            if speech.has_speech:
+                stt.transcribe(speech.audio)
+
+        raw_ms = best_of(lambda: stt.transcribe(audio), args.repeat)
+        vad_ms = best_of(with_vad, args.repeat)
+        rows.append({
+            "recording": name,
+            "audio_s": result.input_s,
+            "kept_s": result.kept_s,
+            "trim_ms": best_of(lambda: vad.trim(audio), args.repeat),
+            "raw_ms": raw_ms,
+            "vad_ms": vad_ms,
+            "speedup": raw_ms / vad_ms if vad_ms else float("inf"),
+        })
+
+    total_raw = sum(row["raw_ms"] for row in rows)
+    total_vad = sum(row["vad_ms"] for row in rows)
+    print_table(rows, ["recording", "audio_s", "kept_s", "trim_ms", "raw_ms", "vad_ms", "speedup"])
+    print(f"\nAll recordings: {total_raw:.0f} ms -> {total_vad:.0f} ms "
+          f"({100 * (1 - total_vad / total_raw):.0f}% less Whisper time)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
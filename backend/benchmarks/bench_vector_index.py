@@ -0,0 +1,78 @@
+"""
+Query latency of the lyrics vector index backends on synthetic catalogs.
+
+Usage (from backend/):
+    python -m benchmarks.bench_vector_index --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+import numpy as np
+from models.vector_index import ExactIndex, IVFIndex
+
+
+def synthetic_catalog(n_rows: int, dim: int, n_topics: int = 256, seed: int = 0):
+    """Unit vectors clustered around random topics, roughly like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    rows = np.empty((n_rows, dim), dtype=np.float32)
+    for start in range(0, n_rows, 100_000):
+        stop = min(start + 100_000, n_rows)
+        rows[start:stop] = topics[rng.integers(0, n_topics, size=stop - start)]
+        rows[start:stop] += rng.normal(scale=0.6, size=(stop - start, dim)).astype(np.float32)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows
+
+
+def noisy_queries(embeddings: np.ndarray, n_queries: int, seed: int = 1):
+    """Perturbed copies of random catalog rows, like a slightly mis-sung line"""
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.integers(0, embeddings.shape[0], size=n_queries)].copy()
+    queries += rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def time_queries(index, queries, k, **params):
+    """Per-query latencies in milliseconds and the returned ids"""
+    latencies = []
+    ids = []
+    for query in queries:
+        start = time.perf_counter()
+        _, query_ids = index.search(query, k=k, **params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(query_ids[0])
+    return np.array(latencies), np.array(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384, help="Embedding size (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'backend':>14} {'p50 ms':>9} {'p99 ms':>9} {'recall@k':>9} {'build s':>8}")
+    for n_rows in args.sizes:
+        embeddings = synthetic_catalog(n_rows, args.dim)
+        queries = noisy_queries(embeddings, args.queries)
+
+        exact = ExactIndex(embeddings)
+        exact_latency, exact_ids = time_queries(exact, queries, args.k)
+        print(f"{n_rows:>9} {'exact':>14} {np.percentile(exact_latency, 50):>9.3f} "
+              f"{np.percentile(exact_latency, 99):>9.3f} {1.0:>9.3f} {0.0:>8.2f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(embeddings)
+        build_seconds = time.perf_counter() - start
+
+        for nprobe in args.nprobe:
+            latency, ids = time_queries(ivf, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, exact_ids)])
+            label = f"ivf/nprobe={nprobe}"
+            print(f"{n_rows:>9} {label:>14} {np.percentile(latency, 50):>9.3f} "
+                  f"{np.percentile(latency, 99):>9.3f} {recall:>9.3f} {build_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
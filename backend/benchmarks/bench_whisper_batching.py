@@ -0,0 +1,52 @@
+"""
+Throughput and tail latency of /api/stt/transcribe inference: the old
+one-request-per-call path against the cross-request batching scheduler.
+
+Usage (from backend/):
+    python -m benchmarks.bench_whisper_batching --concurrency 1 4 8 16 --requests 64
+"""
+import argparse
+import asyncio
+import numpy as np
+from benchmarks.common import run_closed_loop, summarize, print_table, synthetic_speech
+from models.whisper_model import whisper_batcher
+from models.registry import model_registry
+
+
+def fixture_clips(count: int, seed: int = 0):
+    """Clips of 1-12 s, like short sung or spoken utterances"""
+    rng = np.random.default_rng(seed)
+    return [synthetic_speech(float(rng.uniform(1, 12)), seed=i) for i in range(count)]
+
+
+async def sequential_call(audio):
+    # The previous handler called transcribe() directly on the event loop
+    model_registry.get("stt").transcribe(audio)
+
+
+async def batched_call(audio):
+    await whisper_batcher.submit((audio, None))
+
+
+async def main_async(args):
+    model_registry.get("stt", wait=True)
+    clips = fixture_clips(args.requests)
+    rows = []
+    for concurrency in args.concurrency:
+        for mode, call in (("sequential", sequential_call), ("batched", batched_call)):
+            latencies, elapsed = await run_closed_loop(call, clips, concurrency)
+            rows.append({"mode": mode, "concurrency": concurrency, **summarize(latencies, elapsed)})
+
+    print_table(rows, ["mode", "concurrency", "requests", "rps", "p50_ms", "p99_ms"])
+    print(f"batcher: {whisper_batcher.stats.as_dict()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per run")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
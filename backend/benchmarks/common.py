@@ -0,0 +1,89 @@
+"""Shared helpers for the benchmark scripts"""
+import asyncio
+import time
+import numpy as np
+from models.cache import normalize_text
+
+
+async def run_closed_loop(call, inputs, concurrency: int):
+    """
+    Drives call(input) from `concurrency` workers until every input is processed.
+    Returns (per-request latencies in seconds, total wall time in seconds).
+    """
+    queue = asyncio.Queue()
+    for item in inputs:
+        queue.put_nowait(item)
+    latencies = []
+
+    async def worker():
+        while not queue.empty():
+            item = queue.get_nowait()
+            start = time.perf_counter()
+            await call(item)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return np.array(latencies), time.perf_counter() - start
+
+
+def summarize(latencies: np.ndarray, elapsed: float) -> dict:
+    """requests/s and latency percentiles in milliseconds"""
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def print_table(rows, columns):
+    """Prints a list of dicts as a fixed-width table"""
+    print(" ".join(f"{column:>12}" for column in columns))
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = row.get(column, "")
+            cells.append(f"{value:>12.2f}" if isinstance(value, float) else f"{value!s:>12}")
+        print(" ".join(cells))
+
+
+def synthetic_speech(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """Voiced-sounding test signal: harmonic tones with syllable-rate amplitude modulation"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 110 + 40 * rng.random()
+    signal = sum(np.sin(2 * np.pi * pitch * h * t) / h for h in range(1, 6))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t + rng.random() * np.pi))
+    noise = rng.normal(scale=0.01, size=t.shape)
+    return (0.2 * signal * envelope + noise).astype(np.float32)
+
+
+def synthetic_recording(parts, sample_rate: int = 16000, noise_scale: float = 0.001, seed: int = 0) -> np.ndarray:
+    """
+    A recording as a user makes it: ("speech", seconds) and ("silence", seconds)
+    parts over steady room noise (noise_scale 0.001 is about -60 dBFS)
+    """
+    rng = np.random.default_rng(seed)
+    clips = [synthetic_speech(seconds, sample_rate, seed=seed + i) if kind == "speech"
+             else np.zeros(int(seconds * sample_rate), dtype=np.float32)
+             for i, (kind, seconds) in enumerate(parts)]
+    audio = np.concatenate(clips)
+    return (audio + rng.normal(scale=noise_scale, size=audio.shape)).astype(np.float32)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance divided by the reference length, after text normalization"""
+    ref = normalize_text(reference).split()
+    hyp = normalize_text(hypothesis).split()
+    if not ref:
+        return float(bool(hyp))
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
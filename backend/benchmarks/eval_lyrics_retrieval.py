@@ -0,0 +1,90 @@
+"""
+Accuracy and latency of the lyrics retrieval modes (dense, lexical, hybrid) on a
+labelled set of sung-line queries: exact lines, fragments, misspellings,
+Whisper-style simplified Chinese transcripts and paraphrases.
+
+A query is correct when the best match is the labelled song and line. Caches are
+cleared before every query, so latency includes the encoder call when there is one.
+
+Usage (from backend/):
+    python -m benchmarks.eval_lyrics_retrieval --modes dense lexical hybrid
+    LYRICS_EMBEDDING_MODEL=paraphrase-multilingual-MiniLM-L12-v2 python -m benchmarks.eval_lyrics_retrieval
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from benchmarks.common import print_table
+from models.cache import normalize_text
+from models.lyrics_index_store import DEFAULT_INDEX_DIR
+from models.lyrics_rag import LyricsRAG, RETRIEVAL_MODES
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "lyrics_queries.json")
+
+
+def evaluate(rag: LyricsRAG, queries):
+    """Per-query (correct line, correct song, encoded, latency ms) for the rag's current mode"""
+    outcomes = []
+    for query in queries:
+        rag.query_cache.clear()
+        rag.result_cache.clear()
+        encoded = rag.encoded_queries
+
+        start = time.perf_counter()
+        result = rag.get_next_line(query["query"])
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        song_ok = bool(result) and result["song_id"] == query["song_id"]
+        line_ok = song_ok and normalize_text(result["matched_line"]) == normalize_text(query["line"])
+        outcomes.append({"kind": query["kind"], "line_ok": line_ok, "song_ok": song_ok,
+                         "encoded": rag.encoded_queries > encoded, "latency_ms": latency_ms})
+    return outcomes
+
+
+def summarize(mode: str, outcomes, label: str = "all"):
+    latencies = np.array([o["latency_ms"] for o in outcomes])
+    return {
+        "mode": mode,
+        "queries": label,
+        "n": len(outcomes),
+        "line_acc": float(np.mean([o["line_ok"] for o in outcomes])),
+        "song_acc": float(np.mean([o["song_ok"] for o in outcomes])),
+        "encoded": float(np.mean([o["encoded"] for o in outcomes])),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default="data/songs.json")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Labelled queries JSON: query, song_id, line, kind")
+    parser.add_argument("--modes", nargs="+", default=list(RETRIEVAL_MODES), choices=RETRIEVAL_MODES)
+    parser.add_argument("--by-kind", action="store_true", help="Also break results down by query kind")
+    args = parser.parse_args()
+
+    with open(args.queries, 'r') as f:
+        queries = json.load(f)
+
+    # Built in hybrid mode so both the embeddings and the n-gram index exist
+    os.environ["LYRICS_RETRIEVAL"] = "hybrid"
+    rag = LyricsRAG(data_path=args.data_path, index_dir=args.index_dir)
+    rag.get_next_line("warm up")
+
+    rows = []
+    for mode in args.modes:
+        rag.retrieval = mode
+        outcomes = evaluate(rag, queries)
+        rows.append(summarize(mode, outcomes))
+        if args.by_kind:
+            for kind in dict.fromkeys(query["kind"] for query in queries):
+                rows.append(summarize(mode, [o for o in outcomes if o["kind"] == kind], kind))
+
+    print(f"Embedding model: {rag.model_name}, {len(queries)} queries")
+    print_table(rows, ["mode", "queries", "n", "line_acc", "song_acc", "encoded", "p50_ms", "p95_ms"])
+
+
+if __name__ == "__main__":
+    main()
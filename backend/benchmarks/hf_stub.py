@@ -0,0 +1,125 @@
+"""
+Local stand-in for the Hugging Face inference endpoint the LLM service calls, so
+/api/lyrics/explain can be tested and load-tested offline at a known latency.
+
+Serves the HF serverless API (POST /models/{model_id}, with "stream": true for
+SSE) and the text-generation-inference routes (POST /generate, /generate_stream).
+The text is made from the quoted lyric in the prompt, one token per word, and
+streams end with the special end-of-sequence token as TGI sends it. The tests
+use the same app through stub_llm_service().
+
+Usage (from backend/):
+    python -m benchmarks.hf_stub --port 8081 --first-token-ms 150 --token-ms 20
+    LLM_API_URL=http://127.0.0.1:8081/generate python main.py
+"""
+import argparse
+import asyncio
+import json
+import re
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def explanation_for(prompt: str) -> str:
+    """Deterministic explanation of the lyric quoted in an LLMService prompt"""
+    match = re.search(r'"(.*)"', prompt)
+    line = match.group(1) if match else prompt
+    return f" The singer says {line.lower()} to share a simple feeling with whoever is listening"
+
+
+def create_app(first_token_ms: float = 0.0, token_ms: float = 0.0, text: Optional[str] = None,
+               status: int = 200) -> FastAPI:
+    """
+    first_token_ms: delay before the first token (or before a blocking response)
+    token_ms: delay per generated token (a blocking response waits for all of them)
+    text: generate this text for every prompt instead of explanation_for(prompt)
+    status: answer every request with this HTTP status (e.g. 503 to test fallbacks)
+    """
+    app = FastAPI(title="HF inference stub")
+    app.state.requests = {"generate": 0, "generate_stream": 0}
+    app.state.prompts = []
+
+    def tokens(body: dict):
+        prompt = body.get("inputs", "")
+        app.state.prompts.append(prompt)
+        return [f" {word}" for word in (text if text is not None else explanation_for(prompt)).split()]
+
+    async def generate(body: dict):
+        app.state.requests["generate"] += 1
+        generated = "".join(tokens(body))
+        await asyncio.sleep((first_token_ms + token_ms * len(generated.split())) / 1000)
+        if status != 200:
+            return JSONResponse({"error": "Stub failure"}, status_code=status)
+        return {"generated_text": generated}
+
+    def generate_stream(body: dict):
+        app.state.requests["generate_stream"] += 1
+        words = tokens(body)
+        if status != 200:
+            return JSONResponse({"error": "Stub failure"}, status_code=status)
+
+        async def events():
+            await asyncio.sleep(first_token_ms / 1000)
+            for i, token in enumerate(words):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield "data: " + json.dumps({
+                    "token": {"id": i, "text": token, "special": False}, "generated_text": None
+                }) + "\n\n"
+            yield "data: " + json.dumps({
+                "token": {"id": len(words), "text": "</s>", "special": True}, "generated_text": "".join(words)
+            }) + "\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/generate")
+    async def tgi_generate(request: Request):
+        return await generate(await request.json())
+
+    @app.post("/generate_stream")
+    async def tgi_generate_stream(request: Request):
+        return generate_stream(await request.json())
+
+    @app.post("/models/{model_id:path}")
+    async def hf_api(model_id: str, request: Request):
+        body = await request.json()
+        if body.get("stream"):
+            return generate_stream(body)
+        result = await generate(body)
+        # The serverless API wraps the result in a one-element list
+        return [result] if isinstance(result, dict) else result
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "first_token_ms": first_token_ms, "token_ms": token_ms}
+
+    return app
+
+
+def stub_llm_service(app: FastAPI, cache_path: str, api_url: str = "http://hf-stub/generate",
+                     model_id: str = "stub/explainer"):
+    """An LLMService whose calls are answered in-process by app, with its own response cache"""
+    import httpx
+    from models.llm_cache import LLMResponseCache
+    from models.llm_service import LLMService
+
+    return LLMService(model_id=model_id, api_url=api_url, token="", cache=LLMResponseCache(cache_path),
+                      transport=httpx.ASGITransport(app=app))
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.first_token_ms, args.token_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
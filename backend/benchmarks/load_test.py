@@ -0,0 +1,138 @@
+"""
+HTTP load generator for the user-facing endpoints: /api/stt/transcribe,
+/api/stt/verify, /api/tts/synthesize, /api/lyrics/next and /api/lyrics/explain.
+
+Each endpoint is driven closed-loop at every concurrency level; the table shows
+requests/s, p50/p95/p99 latency and the number of non-2xx responses.
+
+Against a running server (start the HF stub and point LLM_API_URL at it to keep
+the LLM out of the measurement):
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 1 8 32
+
+In-process, offline, with tiny random-weight models and the HF stub (CI):
+    python -m benchmarks.load_test --tiny --llm-stub --concurrency 1 4 --requests 32
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import httpx
+from benchmarks.common import run_closed_loop, summarize, print_table, synthetic_speech
+
+ENDPOINTS = ("stt", "verify", "tts", "next", "explain")
+# Registry model each endpoint needs before it can answer
+ENDPOINT_MODELS = {"stt": "stt", "verify": "stt", "tts": "tts", "next": "rag", "explain": "llm"}
+# Answers of the Guess Professions game, as /api/stt/verify candidates
+PROFESSION_ANSWERS = ["doctor", "physician", "police", "policeman", "criminal", "thief", "chef", "cook"]
+
+
+def fixture_lines(data_path: str):
+    with open(data_path, 'r') as f:
+        return [line for song in json.load(f) for line in song['lyrics']]
+
+
+def make_request(endpoint: str, i: int, lines, clips, unique: bool):
+    """(path, httpx request kwargs) of the i-th request to an endpoint"""
+    line = lines[i % len(lines)]
+    if unique:
+        # Different text every time so the TTS, LLM and lyrics caches never answer
+        line = f"{line} {i}"
+    if endpoint == "stt":
+        return "/api/stt/transcribe", {"files": {"file": (f"clip{i}.wav", clips[i % len(clips)], "audio/wav")}}
+    if endpoint == "verify":
+        return "/api/stt/verify", {"files": {"file": (f"clip{i}.wav", clips[i % len(clips)], "audio/wav")},
+                                   "data": {"language": "en-SG", "candidates": PROFESSION_ANSWERS}}
+    if endpoint == "tts":
+        return "/api/tts/synthesize", {"json": {"text": line}}
+    if endpoint == "next":
+        return "/api/lyrics/next", {"json": {"sung_lyrics": line}}
+    return "/api/lyrics/explain", {"json": {"lyrics": line}}
+
+
+def in_process_client(args) -> httpx.AsyncClient:
+    """Client for main.app in this process; env vars must be set before main is imported"""
+    if args.tiny:
+        os.environ["MODEL_PROFILE"] = "tiny"
+    import main
+    from models.registry import model_registry
+
+    # Per-request access logs would dominate the output and the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.llm_stub:
+        from benchmarks.hf_stub import create_app, stub_llm_service
+
+        # A throwaway cache, so stub text never lands in the real explanation cache
+        cache_path = os.path.join(tempfile.mkdtemp(prefix="llm-stub-"), "llm.sqlite3")
+        stub = create_app(args.stub_first_token_ms, args.stub_token_ms)
+        model_registry.provide("llm", stub_llm_service(stub, cache_path))
+
+    # ASGITransport does not run the lifespan, so the models are loaded here
+    model_registry.start()
+    for endpoint in args.endpoints:
+        model_registry.get(ENDPOINT_MODELS[endpoint], wait=True)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://loadtest",
+                             timeout=args.timeout)
+
+
+async def run_endpoint(client: httpx.AsyncClient, endpoint: str, concurrency: int, args, lines, clips):
+    statuses = []
+
+    async def call(i):
+        path, kwargs = make_request(endpoint, i, lines, clips, args.unique)
+        response = await client.post(path, **kwargs)
+        statuses.append(response.status_code)
+
+    for i in range(args.warmup):
+        await call(i)
+    statuses.clear()
+
+    latencies, elapsed = await run_closed_loop(call, range(args.warmup, args.warmup + args.requests), concurrency)
+    errors = sum(1 for status in statuses if not 200 <= status < 300)
+    return {"endpoint": endpoint, "concurrency": concurrency, "errors": errors, **summarize(latencies, elapsed)}
+
+
+async def main_async(args):
+    from models.audio import encode_wav
+
+    lines = fixture_lines(args.data_path)
+    clips = [encode_wav(synthetic_speech(args.audio_seconds, seed=i)) for i in range(8)]
+    client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout) if args.url else in_process_client(args)
+
+    rows = []
+    async with client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                rows.append(await run_endpoint(client, endpoint, concurrency, args, lines, clips))
+
+    print_table(rows, ["endpoint", "concurrency", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server; the app is loaded in-process when omitted")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Measured requests per endpoint and concurrency")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before each run")
+    parser.add_argument("--unique", action="store_true", help="Make every text unique to bypass the response caches")
+    parser.add_argument("--audio-seconds", type=float, default=4.0, help="Length of the uploaded WAV clips")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--data-path", default="data/songs.json")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    parser.add_argument("--tiny", action="store_true", help="In-process only: tiny random-weight models (MODEL_PROFILE=tiny)")
+    parser.add_argument("--llm-stub", action="store_true", help="In-process only: answer LLM calls from benchmarks.hf_stub")
+    parser.add_argument("--stub-first-token-ms", type=float, default=150.0)
+    parser.add_argument("--stub-token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
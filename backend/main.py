@@ -1,16 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import stt, tts, lyrics
+from fastapi.responses import JSONResponse
+from routers import stt, tts, lyrics, admin
+from models.registry import model_registry, ModelNotReadyError, READY
+from models.batching import InferenceRejectedError
+from models.song_catalog import song_catalog
+from models.metrics import metrics, http_request_duration, http_requests_in_flight, resident_memory_bytes
+from models.profiling import profiler, current_capture, PROFILE_HEADER
+from fastapi.responses import PlainTextResponse
+import asyncio
 import uvicorn
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load in background threads so the server accepts requests right away
+    model_registry.start()
+    song_catalog.start()
+    yield
+    song_catalog.stop()
+    if model_registry.is_ready("llm"):
+        await model_registry.get("llm").aclose()
+
 app = FastAPI(
     title="Language Speaker API",
     description="Speech recognition and text-to-speech API for language learning",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration for Next.js frontend
@@ -33,13 +53,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger("api")
 
+def _route_template(request: Request) -> str:
+    """The matched route's path template (e.g. /api/lyrics/songs/{song_id}), so metric labels stay bounded"""
+    template = getattr(request.scope.get("route"), "path_format", None)
+    if template is None:
+        return "unmatched"
+    # Routes of included routers know their path without the router prefix
+    try:
+        relative = template.format(**request.path_params)
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = request.scope["path"]
+    return path[:len(path) - len(relative)] + template if path.endswith(relative) else template
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
+    # Handlers measure their upload stage from here
+    request.state.received_at = time.perf_counter()
+    http_requests_in_flight.inc()
     logger.info(f"Start Request: {request.method} {request.url.path}")
+
+    # Armed through /api/admin/profiles, or one request with X-Profile and the admin token
+    forced = PROFILE_HEADER in request.headers and admin.is_admin(request.headers.get("x-admin-token"))
+    capture = profiler.select(request.method, request.url.path, forced)
+    capture_token = current_capture.set(capture) if capture is not None else None
     
+    status = 500
     try:
         response = await call_next(request)
+        status = response.status_code
+        if capture is not None:
+            response.headers["X-Profile-Id"] = capture.id
         process_time = time.time() - start_time
         logger.info(f"End Request: {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.4f}s")
         return response
@@ -47,11 +92,31 @@ async def log_requests(request: Request, call_next):
         process_time = time.time() - start_time
         logger.error(f"Request Failed: {request.method} {request.url.path} - Error: {e} - Time: {process_time:.4f}s")
         raise
+    finally:
+        http_requests_in_flight.dec()
+        http_request_duration.observe(time.perf_counter() - request.state.received_at, request.method,
+                                      _route_template(request), status)
+        if capture is not None:
+            current_capture.reset(capture_token)
+            await asyncio.to_thread(profiler.finish, capture, status, time.perf_counter() - request.state.received_at)
+
+@app.exception_handler(InferenceRejectedError)
+async def inference_rejected_handler(request: Request, exc: InferenceRejectedError):
+    """Model still loading (503), queue full (429) or inference timed out (503)"""
+    content = {"detail": str(exc)}
+    if isinstance(exc, ModelNotReadyError):
+        content.update({"model": exc.name, "state": exc.state})
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=content,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 # Include routers
 app.include_router(stt.router, prefix="/api/stt", tags=["Speech-to-Text"])
 app.include_router(tts.router, prefix="/api/tts", tags=["Text-to-Speech"])
 app.include_router(lyrics.router, prefix="/api/lyrics", tags=["Song Lyrics"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 @app.get("/")
 async def root():
@@ -67,19 +132,44 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    # Check if models are loaded
-    stt_status = "loaded" if stt.whisper_model.pipe else "loading"
-    tts_status = "loaded" if tts.tts_model.processor else "loading"
-    
+    """Liveness: the process is up, with the per-model load state and load time"""
     return {
         "status": "healthy",
-        "models": {
-            "stt": stt_status,
-            "tts": tts_status,
-            "rag": "active", 
-            "llm": "active"
-        }
+        "models": model_registry.status()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once every model loaded at startup is ready, 503 while warming"""
+    models = model_registry.status()
+    warming = [name for name, model in models.items() if not model["lazy"] and model["state"] != READY]
+    if warming:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming", "models": models},
+            headers={"Retry-After": "5"}
+        )
+    return {"status": "ready", "models": models}
+
+model_ready = metrics.gauge("model_ready", "1 once the model is loaded, 0 while pending, loading or failed", ("model",))
+model_memory = metrics.gauge("model_memory_bytes", "Bytes of weights (and index rows) held by a loaded model", ("model",))
+process_memory = metrics.gauge("process_resident_memory_bytes", "Resident memory of the server process")
+
+def _collect_model_metrics():
+    process_memory.set(resident_memory_bytes())
+    for name, model in model_registry.status().items():
+        ready = model["state"] == READY
+        model_ready.set(1 if ready else 0, name)
+        instance = model_registry.get(name) if ready else None
+        if hasattr(instance, "memory_bytes"):
+            model_memory.set(instance.memory_bytes(), name)
+
+metrics.add_collector(_collect_model_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition: request and stage latency histograms, queues, caches and memory"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
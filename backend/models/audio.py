@@ -0,0 +1,228 @@
+import io
+import shutil
+import subprocess
+import threading
+import logging
+from collections import deque
+from math import gcd
+from typing import List, Optional
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+logger = logging.getLogger(__name__)
+
+# Whisper and SpeechT5 both work on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Resolved once at startup instead of on every request
+FFMPEG_PATH = shutil.which("ffmpeg")
+if not FFMPEG_PATH:
+    logger.warning("ffmpeg not found in PATH, only WAV/OGG/FLAC uploads can be decoded")
+
+
+class AudioDecodeError(Exception):
+    """Raised when uploaded audio bytes cannot be decoded"""
+
+
+def _to_mono_16k(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    if samples.ndim == 2:
+        samples = samples.mean(axis=1)
+    if sample_rate != target_rate:
+        divisor = gcd(sample_rate, target_rate)
+        samples = resample_poly(samples, target_rate // divisor, sample_rate // divisor)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+def _decode_with_soundfile(data: bytes, target_rate: int) -> np.ndarray:
+    samples, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    return _to_mono_16k(samples, sample_rate, target_rate)
+
+
+def _decode_with_ffmpeg(data: bytes, target_rate: int, timeout: float = 30.0) -> np.ndarray:
+    """Pipes the bytes through ffmpeg (stdin -> raw float32 PCM on stdout), no temp files"""
+    if not FFMPEG_PATH:
+        raise AudioDecodeError("ffmpeg is required to decode this audio format but was not found")
+
+    command = [
+        FFMPEG_PATH, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(target_rate),
+        "pipe:1",
+    ]
+    try:
+        process = subprocess.run(command, input=data, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError("ffmpeg timed out decoding audio")
+
+    if process.returncode != 0:
+        raise AudioDecodeError(process.stderr.decode("utf-8", errors="replace").strip() or "ffmpeg failed")
+
+    return np.frombuffer(process.stdout, dtype=np.float32).copy()
+
+
+def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodes uploaded audio bytes into a mono float32 array at sample_rate.
+    WAV, OGG (Vorbis/Opus) and FLAC are decoded in-process by libsndfile;
+    anything else (WebM/Opus, MP4) goes through an ffmpeg pipe.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+
+    try:
+        return _decode_with_soundfile(data, sample_rate)
+    except (RuntimeError, TypeError) as e:
+        logger.debug(f"soundfile could not decode upload, using ffmpeg: {e}")
+
+    return _decode_with_ffmpeg(data, sample_rate)
+
+
+class StreamingDecoder:
+    """
+    Decodes a container that arrives in chunks (e.g. MediaRecorder WebM) with one
+    long-lived ffmpeg process: every chunk is written to its stdin once and the
+    PCM produced so far is read back, so a chunk costs the same however long the
+    stream already is. command replaces the ffmpeg invocation (it must write
+    float32 PCM to stdout).
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, command: Optional[List[str]] = None):
+        if command is None:
+            if not FFMPEG_PATH:
+                raise AudioDecodeError("ffmpeg is required to decode this audio format but was not found")
+            command = [
+                FFMPEG_PATH, "-nostdin", "-hide_banner", "-loglevel", "error",
+                # Start decoding once the header is in instead of probing seconds of input
+                "-fflags", "+nobuffer", "-probesize", "32", "-analyzeduration", "0",
+                "-i", "pipe:0",
+                "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate),
+                "-flush_packets", "1",
+                "pipe:1",
+            ]
+        self.bytes_in = 0
+        self._pcm = bytearray()
+        self._lock = threading.Lock()
+        # Corrupt input can log a line per packet: stderr is drained as it comes, keeping the last lines
+        self._stderr = deque(maxlen=20)
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE)
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+        self._stderr_reader = threading.Thread(target=self._read_errors, daemon=True)
+        self._stderr_reader.start()
+
+    def _read_output(self):
+        while True:
+            data = self._process.stdout.read1(1 << 16)
+            if not data:
+                return
+            with self._lock:
+                self._pcm.extend(data)
+
+    def _read_errors(self):
+        for line in self._process.stderr:
+            self._stderr.append(line.decode("utf-8", errors="replace").strip())
+
+    def _take(self) -> np.ndarray:
+        """Decoded samples not returned yet (a trailing partial sample waits for the rest)"""
+        with self._lock:
+            usable = len(self._pcm) - len(self._pcm) % 4
+            data = bytes(self._pcm[:usable])
+            del self._pcm[:usable]
+        return np.frombuffer(data, dtype=np.float32).copy()
+
+    def _error(self) -> str:
+        try:
+            self._process.wait(timeout=5)
+            self._stderr_reader.join(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        return "\n".join(line for line in self._stderr if line) or "ffmpeg failed"
+
+    def feed(self, chunk: bytes) -> np.ndarray:
+        """Writes the next chunk; returns the samples decoded since the last call"""
+        try:
+            self._process.stdin.write(chunk)
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError, OSError):
+            raise AudioDecodeError(self._error())
+        self.bytes_in += len(chunk)
+        return self._take()
+
+    def finish(self, timeout: float = 30.0) -> np.ndarray:
+        """Ends the input and returns the rest of the samples"""
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.close()
+            raise AudioDecodeError("ffmpeg timed out decoding audio")
+        self._reader.join()
+        if self._process.returncode != 0:
+            raise AudioDecodeError(self._error())
+        return self._take()
+
+    def close(self):
+        """Stops the process, whether or not the input was finished"""
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._reader.join()
+        self._stderr_reader.join()
+        for pipe in (self._process.stdin, self._process.stdout, self._process.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+# Raw PCM layouts accepted from streaming clients
+PCM_FORMATS = {"pcm16": np.int16, "f32": np.float32}
+
+
+def pcm_to_float32(data: bytes, sample_format: str = "pcm16"):
+    """
+    Converts little-endian mono PCM bytes to float32 samples.
+    Returns (samples, leftover) where leftover holds a trailing partial sample
+    to prepend to the next chunk.
+    """
+    dtype = np.dtype(PCM_FORMATS[sample_format]).newbyteorder("<")
+    usable = len(data) - len(data) % dtype.itemsize
+    samples = np.frombuffer(data[:usable], dtype=dtype)
+    if dtype.kind == "i":
+        samples = samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32), data[usable:]
+
+
+def float_to_pcm16(samples: np.ndarray) -> bytes:
+    """float32 samples in [-1, 1] to little-endian 16-bit PCM bytes"""
+    clipped = np.clip(samples, -1.0, 1.0)
+    return (clipped * 32767).astype("<i2").tobytes()
+
+
+def streaming_wav_header(sample_rate: int = SAMPLE_RATE, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    WAV header for a stream of unknown length: the RIFF and data sizes are set
+    to the maximum, which browsers and ffmpeg read as "until end of stream".
+    """
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return b"".join([
+        b"RIFF", (0xFFFFFFFF).to_bytes(4, "little"), b"WAVE",
+        b"fmt ", (16).to_bytes(4, "little"), (1).to_bytes(2, "little"),
+        channels.to_bytes(2, "little"), sample_rate.to_bytes(4, "little"),
+        byte_rate.to_bytes(4, "little"), block_align.to_bytes(2, "little"),
+        bits_per_sample.to_bytes(2, "little"),
+        b"data", (0xFFFFFFFF).to_bytes(4, "little"),
+    ])
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """float32 samples to in-memory WAV bytes"""
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, samplerate=sample_rate, format="WAV")
+    return buffer.getvalue()
@@ -0,0 +1,219 @@
+import asyncio
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from models.metrics import queue_wait
+from models.profiling import current_capture, profiler
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceRejectedError(Exception):
+    """Base for requests turned away instead of queued (mapped to status_code + Retry-After)"""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(InferenceRejectedError):
+    """The admission queue is at capacity"""
+    status_code = 429
+
+
+class InferenceTimeoutError(InferenceRejectedError):
+    """The request waited and ran longer than the batcher's timeout"""
+    status_code = 503
+
+
+class BatchStats:
+    """Running counters for batch sizes and time spent waiting in the queue"""
+
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+        self.batch_size_counts = {}
+        self.queue_wait_ms_total = 0.0
+        self.queue_wait_ms_max = 0.0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def record(self, batch_size: int, waits_ms: List[float]):
+        self.batches += 1
+        self.items += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.batch_size_counts[batch_size] = self.batch_size_counts.get(batch_size, 0) + 1
+        self.queue_wait_ms_total += sum(waits_ms)
+        self.queue_wait_ms_max = max([self.queue_wait_ms_max] + waits_ms)
+
+    def as_dict(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "avg_queue_wait_ms": self.queue_wait_ms_total / self.items if self.items else 0.0,
+            "max_queue_wait_ms": self.queue_wait_ms_max,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AsyncBatcher:
+    """
+    Dynamic micro-batching in front of a blocking batch function.
+
+    Concurrent submit() calls are collected until max_batch_size items are queued
+    or max_wait_ms has passed since the first one, then process_batch runs once
+    on the whole list and each caller gets its own result. process_batch must
+    return one result per input, in order; an Exception in place of a result is
+    raised to that caller only.
+
+    Batches run on the batcher's own pool of `workers` threads, so a slow model
+    never blocks the event loop or another model's requests. At most
+    max_queue_size items wait for a worker (QueueFullError beyond that), and a
+    caller waiting longer than timeout_s gets InferenceTimeoutError; its item is
+    dropped if it has not started yet.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, name: str = "batcher", workers: int = 1,
+                 max_queue_size: int = 0, timeout_s: Optional[float] = None):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue_size = max_queue_size # 0 = unbounded
+        self.timeout_s = timeout_s
+        self.stats = BatchStats()
+        self.in_flight = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def _ensure_worker(self):
+        """Starts the collector task on the running loop (restarted if the loop changed)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._worker = loop.create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queues one item and waits for its result"""
+        self._ensure_worker()
+        if self.max_queue_size and self.queue_depth >= self.max_queue_size:
+            self.stats.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue_size} waiting)")
+
+        future = self._loop.create_future()
+        # A request picked for profiling has its batch profiled in the worker thread
+        self._queue.put_nowait((item, future, time.perf_counter(), current_capture.get()))
+        if not self.timeout_s:
+            return await future
+
+        try:
+            # Cancels the future on timeout, so a still-queued item is skipped
+            return await asyncio.wait_for(future, self.timeout_s)
+        except asyncio.TimeoutError:
+            self.stats.timed_out += 1
+            raise InferenceTimeoutError(f"{self.name} did not finish within {self.timeout_s:g}s")
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        """Queues several items at once; they may share a batch with other callers"""
+        return list(await asyncio.gather(*(self.submit(item) for item in items)))
+
+    async def _collect(self):
+        """Waits for the first item, then gathers more until the batch is full or the deadline passes"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            # Waiting for a free worker first lets the queue fill up into a bigger batch
+            await self._slots.acquire()
+            batch = await self._collect()
+            # Callers that gave up while queued don't need a slot in the batch
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = self._loop.create_task(self._process(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch):
+        started = time.perf_counter()
+        self.stats.record(len(batch), [(started - queued) * 1000 for _, _, queued, _ in batch])
+        for _, _, queued, _ in batch:
+            queue_wait.observe(started - queued, self.name)
+        self.in_flight += len(batch)
+        items = [item for item, _, _, _ in batch]
+        captures = [capture for _, _, _, capture in batch if capture is not None]
+
+        try:
+            if captures:
+                results = await self._loop.run_in_executor(
+                    self._executor, profiler.run_stage, captures, self.name, self.process_batch, items
+                )
+            else:
+                results = await self._loop.run_in_executor(self._executor, self.process_batch, items)
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight -= len(batch)
+            self._slots.release()
+
+        for (_, future, _, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def metrics(self):
+        """Batching stats plus current queue depth and admission settings"""
+        return {
+            **self.stats.as_dict(),
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "max_queue_size": self.max_queue_size,
+            "timeout_s": self.timeout_s,
+        }
@@ -0,0 +1,182 @@
+import os
+import itertools
+import threading
+import logging
+import torch
+from torch import nn
+from transformers.modeling_outputs import BaseModelOutput
+
+logger = logging.getLogger(__name__)
+
+# eager: plain PyTorch
+# int8: dynamically quantized nn.Linear layers (CPU only)
+# compile: torch.compile on the fixed-shape submodules
+# onnx: the fixed-shape submodules exported to and run by ONNX Runtime
+INFERENCE_BACKENDS = ("eager", "int8", "compile", "onnx")
+
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "data/onnx")
+
+_threads_configured = False
+
+# from_pretrained swaps process-wide torch defaults (dtype, meta-device init) while
+# it runs, so the registry's loader threads take turns reading weights
+pretrained_load_lock = threading.Lock()
+
+
+def torch_num_threads() -> int:
+    """
+    Intra-op threads per inference call. The STT and TTS batch workers can run
+    at the same time and each call gets its own thread team, so by default they
+    split the cores instead of both claiming all of them.
+    """
+    configured = os.getenv("TORCH_NUM_THREADS")
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+def configure_torch_threads():
+    """Applies the thread settings once per process (inter-op parallelism is not used)"""
+    global _threads_configured
+    if _threads_configured:
+        return
+    torch.set_num_threads(torch_num_threads())
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first parallel op; keep the default then
+        pass
+    _threads_configured = True
+    logger.info(f"Torch using {torch.get_num_threads()} intra-op threads")
+
+
+def module_bytes(*modules) -> int:
+    """Bytes held by the parameters and buffers of torch modules (other objects count 0)"""
+    total = 0
+    for module in modules:
+        if isinstance(module, nn.Module):
+            total += sum(t.numel() * t.element_size() for t in itertools.chain(module.parameters(), module.buffers()))
+    return total
+
+
+def resolve_backend(name: str, device: str) -> str:
+    """Validates a backend name, falling back to eager where it does not apply"""
+    name = (name or "eager").lower()
+    if name not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {', '.join(INFERENCE_BACKENDS)}")
+    if name in ("int8", "onnx") and device != "cpu":
+        logger.warning(f"Inference backend '{name}' targets CPU, using eager on {device}")
+        return "eager"
+    return name
+
+
+def quantize_int8(module: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations quantized per batch)"""
+    return torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+
+
+def compile_module(module: nn.Module) -> nn.Module:
+    return torch.compile(module, dynamic=True)
+
+
+def onnx_path(name: str) -> str:
+    return os.path.join(ONNX_CACHE_DIR, f"{name.replace('/', '--')}.onnx")
+
+
+def export_onnx(module: nn.Module, example_inputs: tuple, path: str, input_names, output_names, dynamic_axes):
+    """Exports once and reuses the file on later starts (delete it after changing models)"""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            module, example_inputs, tmp_path,
+            input_names=input_names, output_names=output_names,
+            dynamic_axes=dynamic_axes, opset_version=17, dynamo=False
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Exported ONNX model to {path}")
+    return path
+
+
+def onnx_session(path: str):
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("The onnx inference backend needs onnxruntime (pip install onnxruntime)")
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = torch_num_threads()
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class _WhisperEncoderOutput(nn.Module):
+    def __init__(self, encoder: nn.Module):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, input_features):
+        return self.encoder(input_features).last_hidden_state
+
+
+class OnnxWhisperEncoder(nn.Module):
+    """
+    Drop-in for WhisperEncoder that runs on ONNX Runtime. The encoder sees a
+    fixed 30 s window and dominates CPU time; the autoregressive decoder stays
+    in PyTorch. The conv layers are kept because generate() reads their strides.
+    """
+
+    def __init__(self, encoder: nn.Module, name: str):
+        super().__init__()
+        self.config = encoder.config
+        self.main_input_name = "input_features"
+        self.conv1 = encoder.conv1
+        self.conv2 = encoder.conv2
+        self.dtype_ = next(encoder.parameters()).dtype
+
+        example = torch.zeros(1, encoder.config.num_mel_bins, 2 * encoder.config.max_source_positions,
+                              dtype=self.dtype_)
+        path = export_onnx(
+            _WhisperEncoderOutput(encoder).eval(), (example,), onnx_path(f"{name}-encoder"),
+            input_names=["input_features"], output_names=["last_hidden_state"],
+            dynamic_axes={"input_features": {0: "batch"}, "last_hidden_state": {0: "batch"}}
+        )
+        self.session = onnx_session(path)
+
+    def forward(self, input_features, attention_mask=None, head_mask=None, output_attentions=None,
+                output_hidden_states=None, return_dict=None, **kwargs):
+        hidden = self.session.run(None, {"input_features": input_features.detach().cpu().float().numpy()})[0]
+        return BaseModelOutput(last_hidden_state=torch.from_numpy(hidden).to(self.dtype_))
+
+
+class _BatchedVocoder(nn.Module):
+    def __init__(self, vocoder: nn.Module):
+        super().__init__()
+        self.vocoder = vocoder
+
+    def forward(self, spectrogram):
+        return self.vocoder(spectrogram)
+
+
+class OnnxVocoder(nn.Module):
+    """HiFiGAN on ONNX Runtime; accepts (frames, bins) or (batch, frames, bins) like SpeechT5HifiGan"""
+
+    def __init__(self, vocoder: nn.Module, name: str):
+        super().__init__()
+        self.config = vocoder.config
+        example = torch.zeros(1, 50, vocoder.config.model_in_dim)
+        path = export_onnx(
+            _BatchedVocoder(vocoder).eval(), (example,), onnx_path(f"{name}-vocoder"),
+            input_names=["spectrogram"], output_names=["waveform"],
+            dynamic_axes={"spectrogram": {0: "batch", 1: "frames"}, "waveform": {0: "batch", 1: "samples"}}
+        )
+        self.session = onnx_session(path)
+
+    def forward(self, spectrogram):
+        batched = spectrogram.dim() == 3
+        inputs = spectrogram if batched else spectrogram.unsqueeze(0)
+        waveform = torch.from_numpy(self.session.run(None, {"spectrogram": inputs.detach().cpu().float().numpy()})[0])
+        return waveform if batched else waveform.squeeze(0)
@@ -0,0 +1,140 @@
+import copy
+import math
+import logging
+import numpy as np
+from collections import Counter
+from typing import List, Optional, Sequence
+from models.cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Character n-gram sizes: bigrams carry unsegmented scripts (Japanese, Chinese),
+# trigrams keep Latin-script matches specific
+NGRAM_SIZES = (2, 3)
+
+
+def char_ngrams(text: str, sizes: Sequence[int] = NGRAM_SIZES) -> Counter:
+    """Character n-gram counts of the normalized text, padded so word edges count"""
+    text = f" {normalize_text(text)} "
+    grams = Counter()
+    for n in sizes:
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+def _similarity(overlap, query_length, line_length):
+    """
+    Mean of the Dice coefficient and the share of the query's n-grams found in the
+    line: 1.0 for equal lines, still high for a fragment sung from a longer line
+    """
+    return (2 * overlap / (query_length + line_length) + overlap / query_length) / 2
+
+
+def ngram_similarity(query_grams: Counter, line: str) -> float:
+    """N-gram similarity of a query to one line, 1.0 when equal after normalization"""
+    line_grams = char_ngrams(line)
+    query_length = sum(query_grams.values())
+    if query_length == 0:
+        return 0.0
+    return float(_similarity(sum((query_grams & line_grams).values()), query_length, sum(line_grams.values())))
+
+
+class LexicalMatches:
+    """
+    Lexical result of one query: BM25-ranked candidates re-scored by n-gram
+    similarity, plus the similarity of any other row the query shares n-grams with.
+    """
+
+    def __init__(self, candidates, rows: np.ndarray, similarities: np.ndarray):
+        self.candidates = candidates # [(row, similarity)], most similar first
+        self._rows = rows # sorted rows sharing at least one n-gram with the query
+        self._similarities = similarities
+
+    def similarity(self, row: int) -> float:
+        i = np.searchsorted(self._rows, row)
+        return float(self._similarities[i]) if i < len(self._rows) and self._rows[i] == row else 0.0
+
+
+class LexicalIndex:
+    """
+    Character n-gram inverted index over lyrics lines, scored with BM25.
+
+    Misspelled or partial transcripts keep most of their n-grams, and no word
+    segmentation is needed, so it works the same for English, Malay, Japanese or
+    Korean. Rows line up with the embedding rows of the lyrics index.
+    """
+
+    def __init__(self, lines: List[str] = (), k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {} # n-gram -> (row ids, term frequencies)
+        self.lengths = np.empty(0, dtype=np.float32) # n-grams per row
+        self._add(lines, 0)
+
+    def __len__(self):
+        return self.lengths.shape[0]
+
+    def _add(self, lines: List[str], offset: int):
+        """Indexes lines as rows offset.. (postings arrays are replaced, never modified)"""
+        added = {}
+        lengths = np.empty(len(lines), dtype=np.float32)
+        for row, line in enumerate(lines, start=offset):
+            grams = char_ngrams(line)
+            lengths[row - offset] = sum(grams.values())
+            for gram, tf in grams.items():
+                added.setdefault(gram, ([], []))
+                added[gram][0].append(row)
+                added[gram][1].append(tf)
+
+        for gram, (rows, tfs) in added.items():
+            rows = np.array(rows, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            if gram in self.postings:
+                old_rows, old_tfs = self.postings[gram]
+                rows, tfs = np.concatenate([old_rows, rows]), np.concatenate([old_tfs, tfs])
+            self.postings[gram] = (rows, tfs)
+        self.lengths = np.concatenate([self.lengths, lengths])
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+
+    def extend(self, lines: List[str]) -> "LexicalIndex":
+        """New index with lines appended as the next rows; this one is left unchanged"""
+        index = copy.copy(self)
+        index.postings = dict(self.postings)
+        index._add(lines, len(self))
+        return index
+
+    def search(self, query: str, k: int = 50, mask: Optional[np.ndarray] = None) -> LexicalMatches:
+        """
+        BM25 over the rows allowed by mask; the k best are returned ranked by
+        n-gram similarity to the query (ties broken by row).
+        """
+        query_grams = char_ngrams(query)
+        query_length = sum(query_grams.values())
+        n_rows = len(self)
+
+        all_rows, all_scores, all_overlap = [], [], []
+        for gram, query_tf in query_grams.items():
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log(1 + (n_rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[rows] / self.avg_length)
+            all_rows.append(rows)
+            all_scores.append(query_tf * idf * tfs * (self.k1 + 1) / (tfs + norm))
+            all_overlap.append(np.minimum(tfs, query_tf))
+
+        if not all_rows:
+            return LexicalMatches([], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        overlap = np.bincount(inverse, weights=np.concatenate(all_overlap))
+        similarities = _similarity(overlap, query_length, self.lengths[rows])
+
+        allowed = np.arange(len(rows)) if mask is None else np.flatnonzero(mask[rows])
+        if len(allowed) > k:
+            allowed = allowed[np.argpartition(-scores[allowed], k - 1)[:k]]
+        order = allowed[np.lexsort((rows[allowed], -similarities[allowed]))]
+        candidates = [(int(rows[i]), float(similarities[i])) for i in order]
+        return LexicalMatches(candidates, rows, similarities)
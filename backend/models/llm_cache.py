@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Optional
+from models.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Generated text keyed by a hash of (model, prompt, generation params).
+
+    A bounded in-memory LRU sits in front of a SQLite table, so explanations
+    survive restarts and are shared by every worker process on the host.
+    """
+
+    def __init__(self, path: str = "data/llm_cache.sqlite3", memory_items: int = 1024):
+        self.path = path
+        self.memory = LRUCache(memory_items)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, prompt TEXT, params TEXT, response TEXT, created_at REAL)"
+            )
+            # Counted once here and kept up to date by put(), so stats() never scans the table.
+            # Rows added by other worker processes show up after a restart.
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, prompt: str, params: dict) -> str:
+        payload = json.dumps([model, prompt, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.disk_misses += 1
+            return None
+
+        self.disk_hits += 1
+        self.memory.set(key, row[0])
+        return row[0]
+
+    def put(self, key: str, model: str, prompt: str, params: dict, response: str):
+        self.memory.set(key, response)
+        try:
+            row = (model, prompt, json.dumps(params, sort_keys=True), response, time.time(), key)
+            with self._lock, self._db:
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO responses (model, prompt, params, response, created_at, key) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", row
+                ).rowcount
+                if not inserted:
+                    self._db.execute(
+                        "UPDATE responses SET model = ?, prompt = ?, params = ?, response = ?, created_at = ? "
+                        "WHERE key = ?", row
+                    )
+            self._disk_entries += inserted
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist LLM response {key}: {e}")
+
+    def __len__(self):
+        return self._disk_entries
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+            "disk_entries": len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
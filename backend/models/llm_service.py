@@ -1,50 +1,312 @@
-from huggingface_hub import InferenceClient
+import asyncio
+import httpx
+import json
 import logging
 import os
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+from models.batching import QueueFullError
+from models.llm_cache import LLMResponseCache
+from models.metrics import stage, stage_duration
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LLM_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+
+# Sent with every request and part of the cache key
+GENERATION_PARAMS = {
+    "max_new_tokens": 40,  # Keep it short
+    "temperature": 0.7,
+    "return_full_text": False,
+}
+
+
+class StreamTrimmer:
+    """
+    Applies LLMService.trim() to text arriving token by token.
+
+    Only whole words are released. The first max_words go out right away; the
+    next 5 are held back until it is clear whether the text ends within the
+    allowed buffer (flush them) or runs past it (send "..." and stop).
+    """
+
+    def __init__(self, max_words: int):
+        self.max_words = max_words
+        self.text = ""
+        self.cut = False
+        self._sent = 0 # characters of self.text already released
+
+    def _release(self, end: int) -> str:
+        start = self._sent
+        if start == 0:
+            start = len(self.text) - len(self.text.lstrip())
+        self._sent = max(self._sent, end)
+        return self.text[start:end] if end > start else ""
+
+    def feed(self, chunk: str) -> str:
+        """Adds generated text, returns what can be sent now"""
+        if self.cut:
+            return ""
+        self.text += chunk
+        words = [m.end() for m in re.finditer(r"\S+", self.text)]
+        # The last word may still be growing unless whitespace follows it
+        complete = words if self.text[-1:].isspace() else words[:-1]
+        if len(complete) > self.max_words + 5:
+            self.cut = True
+            return self._release(words[self.max_words - 1]) + "..."
+        if not complete:
+            return ""
+        return self._release(complete[min(len(complete), self.max_words) - 1])
+
+    def finish(self) -> str:
+        """Releases whatever is left once generation ended"""
+        if self.cut:
+            return ""
+        words = [m.end() for m in re.finditer(r"\S+", self.text)]
+        if len(words) > self.max_words + 5:
+            self.cut = True
+            return self._release(words[self.max_words - 1]) + "..."
+        return self._release(words[-1]) if words else ""
+
+
 class LLMService:
-    def __init__(self):
+    """
+    Async client for a text-generation-inference (TGI) compatible endpoint.
+
+    Explanations are cached in memory and in SQLite, keyed on model, prompt and
+    generation params. Identical prompts in flight at the same time share one
+    remote call, and at most max_pending distinct generations are outstanding
+    (QueueFullError beyond that). Prefetching leaves the last prefetch_reserve
+    of those slots to user requests.
+    """
+
+    def __init__(self, model_id: Optional[str] = None, api_url: Optional[str] = None, token: Optional[str] = None,
+                 cache: Optional[LLMResponseCache] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
         # Use Mistral-7B-Instruct-v0.2 or generic fallbacks
-        self.model_id = "mistralai/Mistral-7B-Instruct-v0.2"
-        # Try to get token from env, but client works anonymously with lower limits
-        self.token = os.getenv("HF_TOKEN")
-        self.client = InferenceClient(model=self.model_id, token=self.token)
-        self.cache = {}
+        self.model_id = model_id or os.getenv("LLM_MODEL_ID", DEFAULT_LLM_MODEL)
+        # HF serverless inference by default, or any TGI server (e.g. http://localhost:8080/generate)
+        self.api_url = api_url or os.getenv("LLM_API_URL", f"https://api-inference.huggingface.co/models/{self.model_id}")
+        # TGI streams from /generate_stream, the HF API from the same URL with "stream": true
+        default_stream_url = re.sub(r"/generate$", "/generate_stream", self.api_url)
+        self.stream_url = os.getenv("LLM_STREAM_URL", default_stream_url)
+        # Try to get token from env, but the endpoint works anonymously with lower limits
+        self.token = token if token is not None else os.getenv("HF_TOKEN")
+        self.cache = cache if cache is not None else LLMResponseCache(
+            path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3"),
+            memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "1024"))
+        )
+        self.max_pending = int(os.getenv("LLM_QUEUE_MAX_SIZE", "32"))
+        self.prefetch_concurrency = int(os.getenv("LLM_PREFETCH_CONCURRENCY", "2"))
+        self.prefetch_reserve = int(os.getenv("LLM_PREFETCH_RESERVE", "8"))
+        # Shared by every prefetch job, so a burst of songs does not multiply the concurrency
+        self._prefetch_semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+
+        timeout = float(os.getenv("LLM_TIMEOUT_S", "20"))
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        # One pooled keep-alive client for every request
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "8"))),
+            transport=transport
+        )
+
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._prefetch_tasks = set()
+        self.streams = 0
+        self.coalesced = 0
+        self.failures = 0
+        # Time to first token of streamed generations
+        self.ttft_ms = deque(maxlen=1000)
+
+    @staticmethod
+    def build_prompt(lyrics_line: str, max_words: int) -> str:
+        return f"""<s>[INST] Explain this song lyric in {max_words} words or less: "{lyrics_line}" [/INST]"""
 
-    def explain_lyrics(self, lyrics_line: str, max_words: int = 10) -> str:
+    @staticmethod
+    def trim(text: str, max_words: int) -> str:
+        """Simple cleanup to ensure it's not too long"""
+        explanation = text.strip()
+        words = explanation.split()
+        if len(words) > max_words + 5: # Allow slight buffer
+            explanation = " ".join(words[:max_words]) + "..."
+        return explanation
+
+    def cache_key(self, lyrics_line: str, max_words: int) -> str:
+        return self.cache.key(self.model_id, self.build_prompt(lyrics_line, max_words), GENERATION_PARAMS)
+
+    async def explain_lyrics(self, lyrics_line: str, max_words: int = 10) -> str:
         """
         Generates a concise explanation of the lyrics line.
         """
-        if lyrics_line in self.cache:
-            return self.cache[lyrics_line]
+        return await self._explain(lyrics_line, max_words)
+
+    async def _explain(self, lyrics_line: str, max_words: int, reserve: int = 0) -> str:
+        prompt = self.build_prompt(lyrics_line, max_words)
+        key = self.cache.key(self.model_id, prompt, GENERATION_PARAMS)
+
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.check_capacity(reserve)
+            task = asyncio.ensure_future(self._generate(key, prompt, lyrics_line, max_words))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
 
-        prompt = f"""<s>[INST] Explain this song lyric in {max_words} words or less: "{lyrics_line}" [/INST]"""
+        # A caller that disconnects must not cancel the generation others wait on
+        return await asyncio.shield(task)
 
+    @property
+    def pending(self) -> int:
+        """Distinct non-streamed generations in flight"""
+        return len(self._inflight)
+
+    def check_capacity(self, reserve: int = 0):
+        """Raises QueueFullError when max_pending - reserve generations (streamed or not) are outstanding"""
+        pending = self.pending + self.streams
+        if pending >= self.max_pending - reserve:
+            raise QueueFullError(f"{pending} LLM generations already pending")
+
+    async def cached_explanation(self, lyrics_line: str, max_words: int = 10) -> Optional[str]:
+        """The cached explanation, or the result of an identical generation already in flight"""
+        key = self.cache_key(lyrics_line, max_words)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+        return None
+
+    async def explain_lyrics_stream(self, lyrics_line: str, max_words: int = 10) -> AsyncIterator[str]:
+        """
+        Yields the explanation as it is generated, trimmed to max_words on the fly.
+        Call check_capacity() first; the result is cached once the stream completes.
+        """
+        prompt = self.build_prompt(lyrics_line, max_words)
+        key = self.cache.key(self.model_id, prompt, GENERATION_PARAMS)
+        trimmer = StreamTrimmer(max_words)
+        payload = {"inputs": prompt, "parameters": GENERATION_PARAMS, "stream": True}
+        started = time.perf_counter()
+        first_token = True
+        sent_any = False
+
+        self.streams += 1
         try:
-            # Generate response
-            response = self.client.text_generation(
-                prompt,
-                max_new_tokens=40,  # Keep it short
-                temperature=0.7,
-                return_full_text=False
-            )
-            
-            explanation = response.strip()
-            
-            # Simple cleanup to ensure it's not too long
-            words = explanation.split()
-            if len(words) > max_words + 5: # Allow slight buffer
-                explanation = " ".join(words[:max_words]) + "..."
-            
-            self.cache[lyrics_line] = explanation
-            return explanation
+            async with self.client.stream("POST", self.stream_url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    token = json.loads(line[5:]).get("token") or {}
+                    if token.get("special"):
+                        continue
+
+                    if first_token:
+                        first_token = False
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        self.ttft_ms.append(ttft_ms)
+                        stage_duration.observe(ttft_ms / 1000, "llm_first_token")
+                        logger.info(f"LLM time to first token: {ttft_ms:.0f} ms")
+
+                    piece = trimmer.feed(token.get("text", ""))
+                    if piece:
+                        sent_any = True
+                        yield piece
+                    if trimmer.cut:
+                        # Leaving the block closes the connection, which stops generation
+                        break
 
+            piece = trimmer.finish()
+            if piece:
+                yield piece
         except Exception as e:
+            self.failures += 1
+            logger.error(f"Error streaming explanation: {e}")
+            if not sent_any:
+                yield f"Meaning: {lyrics_line} (unavailable)"
+            return
+        finally:
+            self.streams -= 1
+
+        await asyncio.to_thread(self.cache.put, key, self.model_id, prompt, GENERATION_PARAMS,
+                                self.trim(trimmer.text, max_words))
+
+    def ttft_stats(self):
+        values = sorted(self.ttft_ms)
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "p50_ms": values[len(values) // 2],
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max_ms": values[-1],
+        }
+
+    async def _generate(self, key: str, prompt: str, lyrics_line: str, max_words: int) -> str:
+        try:
+            with stage("llm_call"):
+                response = await self.client.post(self.api_url, json={"inputs": prompt, "parameters": GENERATION_PARAMS})
+            response.raise_for_status()
+            body = response.json()
+            # TGI /generate returns an object, the HF Inference API a one-element list
+            generated = body[0]["generated_text"] if isinstance(body, list) else body["generated_text"]
+        except Exception as e:
+            self.failures += 1
             logger.error(f"Error generating explanation: {e}")
-            print(f"Error generating explanation: {e}")
-            # Fallback simple explanations if API fails/rate limits
+            # Fallback simple explanations if API fails/rate limits (not cached)
             return f"Meaning: {lyrics_line} (unavailable)"
 
-llm_service = LLMService()
+        explanation = self.trim(generated, max_words)
+        await asyncio.to_thread(self.cache.put, key, self.model_id, prompt, GENERATION_PARAMS, explanation)
+        return explanation
+
+    async def prefetch(self, lines: List[str], max_words: int = 10) -> int:
+        """Explains every line that is not cached yet, a few at a time; returns how many were generated"""
+        lines = [line for line in dict.fromkeys(lines) if line and line.strip()]
+
+        async def explain(line):
+            if await asyncio.to_thread(self.cache.get, self.cache_key(line, max_words)) is not None:
+                return 0
+            async with self._prefetch_semaphore:
+                try:
+                    await self._explain(line, max_words, reserve=self.prefetch_reserve)
+                    return 1
+                except QueueFullError:
+                    # The reserved slots are for user requests; the line is explained on demand instead
+                    return 0
+
+        generated = sum(await asyncio.gather(*(explain(line) for line in lines)))
+        logger.info(f"Prefetched {generated} explanations ({len(lines)} lines checked)")
+        return generated
+
+    def start_prefetch(self, lines: List[str], max_words: int = 10) -> asyncio.Task:
+        """Runs prefetch() in the background"""
+        task = asyncio.ensure_future(self.prefetch(lines, max_words))
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+        return task
+
+    def stats(self):
+        return {
+            "cache": self.cache.stats(),
+            "pending": self.pending,
+            "streams": self.streams,
+            "max_pending": self.max_pending,
+            "prefetch_reserve": self.prefetch_reserve,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "prefetch_jobs": len(self._prefetch_tasks),
+            "time_to_first_token": self.ttft_stats(),
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
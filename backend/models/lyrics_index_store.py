@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import uuid
+import logging
+import numpy as np
+from models.tiny_models import TINY_MODELS_DIR, ensure_tiny_model, model_source, use_tiny_models
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes so old indexes are rebuilt
+INDEX_FORMAT_VERSION = 4
+
+# e.g. paraphrase-multilingual-MiniLM-L12-v2 for non-English catalogs (the index is rebuilt on change)
+DEFAULT_EMBEDDING_MODEL = os.getenv("LYRICS_EMBEDDING_MODEL", model_source("sentence_encoder", "all-MiniLM-L6-v2"))
+# Tiny-model embeddings get their own directory so they never replace the real index
+DEFAULT_INDEX_DIR = os.getenv("LYRICS_INDEX_DIR", os.path.join(TINY_MODELS_DIR, "index") if use_tiny_models() else "data/index")
+
+
+def flatten_songs(songs):
+    """Turns the songs list into one document + metadata entry per lyrics line"""
+    documents = []
+    metadatas = []
+
+    for song in songs:
+        lyrics = song['lyrics']
+
+        for i, line in enumerate(lyrics):
+            documents.append(line)
+
+            next_line = lyrics[i+1] if i + 1 < len(lyrics) else None
+            metadatas.append({
+                "song_id": song['id'],
+                "line_number": i,
+                "next_line": next_line if next_line else "END_OF_SONG",
+                "title": song['title'],
+                "artist": song['artist'],
+                "language": song.get('language'),
+                "difficulty": song.get('difficulty'),
+                "current_line": line
+            })
+
+    return documents, metadatas
+
+
+class LyricsIndexStore:
+    """
+    Persists the lyrics embedding matrix next to a compact metadata file.
+
+    The index is keyed by a hash of the songs file and the embedding model name,
+    so a replica only re-encodes the catalog when one of them changes. Every save
+    writes its embeddings under a new build id and the metadata names that file,
+    so replacing metadata.json switches both at once.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        self.metadata_path = os.path.join(index_dir, "metadata.json")
+
+    def embeddings_path(self, build_id: str) -> str:
+        return os.path.join(self.index_dir, f"embeddings-{build_id}.npy")
+
+    @staticmethod
+    def compute_key(data_path: str, model_name: str) -> str:
+        """Hash of the songs file contents, the model name and the index format"""
+        digest = hashlib.sha256()
+        with open(data_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0" + model_name.encode("utf-8"))
+        digest.update(b"\0" + str(INDEX_FORMAT_VERSION).encode("utf-8"))
+        return digest.hexdigest()
+
+    def load(self, key: str):
+        """Returns (embeddings, metadatas) when the stored index matches key, else None"""
+        if not os.path.exists(self.metadata_path):
+            return None
+
+        try:
+            with open(self.metadata_path, 'r') as f:
+                meta = json.load(f)
+
+            if meta.get("key") != key:
+                logger.info("Lyrics index is stale, it will be rebuilt")
+                return None
+
+            embeddings = np.load(self.embeddings_path(meta["build_id"]), mmap_mode="r")
+            if embeddings.shape[0] != meta["count"]:
+                logger.warning("Lyrics index row count mismatch, it will be rebuilt")
+                return None
+
+            return embeddings, self._expand_metadata(meta)
+
+        except Exception as e:
+            logger.warning(f"Could not load lyrics index from {self.index_dir}: {e}")
+            return None
+
+    def save(self, key: str, model_name: str, embeddings, metadatas):
+        """
+        Writes the embeddings of a new build, then the metadata pointing at them
+        (replacing it marks the build valid), then drops the previous builds.
+        A crash at any point leaves the old or the new index, never a mix.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        build_id = uuid.uuid4().hex[:16]
+
+        tmp_embeddings = self.embeddings_path(build_id) + ".tmp"
+        with open(tmp_embeddings, 'wb') as f:
+            np.save(f, embeddings)
+        os.replace(tmp_embeddings, self.embeddings_path(build_id))
+
+        meta = self._compact_metadata(metadatas)
+        meta.update({
+            "key": key,
+            "model_name": model_name,
+            "version": INDEX_FORMAT_VERSION,
+            "count": int(embeddings.shape[0]),
+            "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            "build_id": build_id,
+        })
+
+        tmp_metadata = self.metadata_path + ".tmp"
+        with open(tmp_metadata, 'w') as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_metadata, self.metadata_path)
+
+        # Older builds (and embeddings.npy from format 3); a reader that mapped one keeps its pages
+        current = os.path.basename(self.embeddings_path(build_id))
+        for name in os.listdir(self.index_dir):
+            if name.startswith("embeddings") and name.endswith(".npy") and name != current:
+                try:
+                    os.unlink(os.path.join(self.index_dir, name))
+                except OSError:
+                    pass
+
+        logger.info(f"Saved lyrics index with {meta['count']} lines to {self.index_dir}")
+
+    def load_or_build(self, data_path: str, encoder, model_name: str, force: bool = False):
+        """
+        Loads the persisted index (memory-mapped) when it matches the songs file and model,
+        otherwise encodes every line with encoder and persists the result.
+        """
+        key = self.compute_key(data_path, model_name)
+
+        if not force:
+            cached = self.load(key)
+            if cached is not None:
+                logger.info(f"Loaded lyrics index with {len(cached[1])} lines from {self.index_dir}")
+                return cached
+
+        with open(data_path, 'r') as f:
+            songs = json.load(f)
+
+        documents, metadatas = flatten_songs(songs)
+        if not documents:
+            return None, []
+
+        embeddings = np.asarray(encoder.encode(documents), dtype=np.float32)
+
+        try:
+            self.save(key, model_name, embeddings, metadatas)
+        except OSError as e:
+            # A read-only filesystem should not stop the service from starting
+            logger.warning(f"Could not persist lyrics index to {self.index_dir}: {e}")
+
+        return embeddings, metadatas
+
+    @staticmethod
+    def _compact_metadata(metadatas):
+        """Stores song fields once and one [song_id, line_number, line] row per lyrics line"""
+        songs = {}
+        rows = []
+        for meta in metadatas:
+            songs.setdefault(meta['song_id'], {
+                "title": meta['title'],
+                "artist": meta['artist'],
+                "language": meta.get('language'),
+                "difficulty": meta.get('difficulty'),
+            })
+            rows.append([meta['song_id'], meta['line_number'], meta['current_line']])
+        return {"songs": songs, "rows": rows}
+
+    @staticmethod
+    def _expand_metadata(meta):
+        """Rebuilds the per-line metadata dicts from the compact layout"""
+        songs = meta["songs"]
+        rows = meta["rows"]
+        metadatas = []
+
+        for i, (song_id, line_number, line) in enumerate(rows):
+            next_row = rows[i+1] if i + 1 < len(rows) else None
+            next_line = next_row[2] if next_row and next_row[0] == song_id else "END_OF_SONG"
+            song = songs[song_id]
+            metadatas.append({
+                "song_id": song_id,
+                "line_number": line_number,
+                "next_line": next_line,
+                "title": song["title"],
+                "artist": song["artist"],
+                "language": song.get("language"),
+                "difficulty": song.get("difficulty"),
+                "current_line": line
+            })
+
+        return metadatas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prebuild the persisted lyrics embedding index")
+    parser.add_argument("--data-path", default="data/songs.json", help="Songs JSON file to index")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help="Output directory")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="SentenceTransformer model name")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the stored index is up to date")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from sentence_transformers import SentenceTransformer
+
+    store = LyricsIndexStore(args.index_dir)
+    embeddings, metadatas = store.load_or_build(
+        args.data_path, SentenceTransformer(ensure_tiny_model(args.model)), args.model, force=args.force
+    )
+    print(f"Lyrics index ready: {len(metadatas)} lines in {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,121 +1,642 @@
-import json
 import os
+import threading
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from models.lyrics_index_store import LyricsIndexStore, DEFAULT_EMBEDDING_MODEL, DEFAULT_INDEX_DIR, flatten_songs
+from models.vector_index import build_vector_index
+from models.tiny_models import ensure_tiny_model
+from models.inference_backend import module_bytes, pretrained_load_lock
+from models.lexical_index import LexicalIndex, char_ngrams, ngram_similarity
+from models.batching import AsyncBatcher
+from models.cache import LRUCache, normalize_text
+from models.metrics import stage
+from models.registry import model_registry
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Metadata fields that can be used as search pre-filters
+FILTER_FIELDS = ("language", "song_id", "difficulty")
+
+# dense: embeddings only | lexical: n-gram index only, never encodes queries |
+# hybrid: lexical first stage, dense search and fusion when no line matches near-exactly
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+# Distinguishes "not cached" from a cached no-match (None)
+_MISSING = object()
+
+class LyricsIndexSnapshot:
+    """
+    One version of the searchable lyrics: embedding rows, their metadata, the
+    vector index and the pre-filter row groups. Never modified once published.
+
+    Rows of deleted or replaced songs stay in place as tombstones (live[row] is
+    False) until the next compaction; live is None when there are none.
+    """
+
+    def __init__(self, embeddings=None, metadatas=None, index=None, filter_rows=None,
+                 live: Optional[np.ndarray] = None, generation: int = 0,
+                 lexical: Optional[LexicalIndex] = None):
+        self.embeddings = embeddings
+        self.metadatas = metadatas or []
+        self.index = index
+        self.lexical = lexical # None in dense retrieval mode
+        self.filter_rows = filter_rows or {field: {} for field in FILTER_FIELDS}
+        self.live = live
+        self.generation = generation
+        self.size = len(self.metadatas)
+        self.tombstones = 0 if live is None else self.size - int(np.count_nonzero(live))
+
+    def song_rows(self, song_id: str) -> np.ndarray:
+        """Live rows of one song, in line order"""
+        rows = self.filter_rows["song_id"].get(song_id, np.empty(0, dtype=np.int64))
+        return rows if self.live is None else rows[self.live[rows]]
+
+    def is_live(self, row: int) -> bool:
+        return self.live is None or bool(self.live[row])
+
 class LyricsRAG:
-    def __init__(self, data_path="data/songs.json"):
+    def __init__(self, data_path="data/songs.json", index_dir=DEFAULT_INDEX_DIR, model=None, index_backend=None):
         self.data_path = data_path
         # Use a lightweight model for embeddings
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        
-        self.songs_data = [] # Store metadata
-        self.embeddings = None # Store vectors
-        
+        self.model_name = DEFAULT_EMBEDDING_MODEL
+        if model is None:
+            with pretrained_load_lock:
+                model = SentenceTransformer(ensure_tiny_model(self.model_name))
+        self.model = model
+        # Embeddings are persisted so restarts skip re-encoding the catalog
+        self.index_store = LyricsIndexStore(index_dir)
+        # exact | ivf, defaults to LYRICS_VECTOR_INDEX
+        self.index_backend = index_backend
+
+        # Everything a search reads, swapped as one reference so concurrent
+        # searches see either the old or the new index, never a mix
+        self._state = LyricsIndexSnapshot()
+        # Writers (upsert/delete/compact/sync) are serialized; readers never lock
+        self._write_lock = threading.RLock()
+        # Preallocated embedding rows that upserts append into; snapshots hold views of it
+        self._buffer = None
+        # Compact once tombstones exceed this fraction of the rows
+        self.compact_ratio = float(os.getenv("LYRICS_COMPACT_RATIO", "0.25"))
+
+        # Practice sessions score the lines right after the last match before searching globally
+        self.session_window = int(os.getenv("LYRICS_SESSION_WINDOW", "4"))
+        self.session_min_confidence = float(os.getenv("LYRICS_SESSION_MIN_CONFIDENCE", "0.6"))
+        self.window_hits = 0
+        self.window_fallbacks = 0
+
+        self.retrieval = os.getenv("LYRICS_RETRIEVAL", "hybrid").lower()
+        if self.retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown LYRICS_RETRIEVAL mode: {self.retrieval}")
+        # BM25 candidates taken from the n-gram index per query
+        self.lexical_candidates = int(os.getenv("LYRICS_LEXICAL_CANDIDATES", "50"))
+        # N-gram similarity at which a line counts as sung (near-)exactly and the encoder is skipped
+        self.lexical_exact_score = float(os.getenv("LYRICS_LEXICAL_EXACT_SCORE", "0.85"))
+        # Fused score = w * cosine + (1 - w) * n-gram similarity
+        self.fusion_dense_weight = float(os.getenv("LYRICS_FUSION_DENSE_WEIGHT", "0.5"))
+        self.lexical_resolved = 0
+        self.encoded_queries = 0
+
+        # Popular lines are sung over and over, so cache by normalized transcript
+        cache_size = int(os.getenv("LYRICS_CACHE_SIZE", "4096"))
+        cache_ttl = float(os.getenv("LYRICS_CACHE_TTL_SECONDS", "3600"))
+        self.query_cache = LRUCache(cache_size, cache_ttl) # text -> query vector
+        self.result_cache = LRUCache(cache_size, cache_ttl) # (text, filters, top_k) -> result
+
         self._load_and_index_data()
 
     def _load_and_index_data(self):
-        """Loads songs from JSON and creates in-memory embeddings"""
+        """Loads the persisted embedding index, re-encoding the songs only when they changed"""
         try:
-            with open(self.data_path, 'r') as f:
-                songs = json.load(f)
-            
-            documents = []
-            metadatas = []
-            
-            for song in songs:
-                song_id = song['id']
-                lyrics = song['lyrics']
-                
-                for i, line in enumerate(lyrics):
-                    # We index the CURRENT line
-                    documents.append(line)
-                    
-                    next_line = lyrics[i+1] if i + 1 < len(lyrics) else None
-                    metadatas.append({
-                        "song_id": song_id,
-                        "line_number": i,
-                        "next_line": next_line if next_line else "END_OF_SONG",
-                        "title": song['title'],
-                        "artist": song['artist'],
-                        "current_line": line
-                    })
-            
-            if documents:
-                # Create embeddings
-                self.embeddings = self.model.encode(documents)
-                self.songs_data = metadatas
-                logger.info(f"Indexed {len(documents)} lyrics lines with NumPy")
-                
+            embeddings, metadatas = self.index_store.load_or_build(
+                self.data_path, self.model, self.model_name
+            )
+
+            if metadatas:
+                with self._write_lock:
+                    self._buffer = None
+                    self._publish(LyricsIndexSnapshot(
+                        embeddings, metadatas, build_vector_index(embeddings, self.index_backend),
+                        self._build_filter_rows(metadatas), generation=self._state.generation + 1,
+                        lexical=self._build_lexical(metadatas)
+                    ))
+                self.query_cache.clear()
+                logger.info(f"Indexed {len(metadatas)} lyrics lines with {self.index.name} search")
+
         except Exception as e:
             logger.error(f"Error indexing data: {e}")
             raise
 
-    def get_next_line(self, user_input: str):
+    # Read-only views of the current snapshot
+    @property
+    def songs_data(self):
+        return self._state.metadatas
+
+    @property
+    def embeddings(self):
+        return self._state.embeddings
+
+    @property
+    def index(self):
+        return self._state.index
+
+    @staticmethod
+    def _build_filter_rows(metadatas, offset: int = 0, base=None):
+        """
+        Groups row ids by language, song and difficulty for pre-filtering.
+        With base, the rows of metadatas (numbered from offset) are added to a copy of it.
+        """
+        filter_rows = {field: {} for field in FILTER_FIELDS}
+        for row, meta in enumerate(metadatas, start=offset):
+            for field in FILTER_FIELDS:
+                filter_rows[field].setdefault(meta.get(field), []).append(row)
+
+        merged = {field: dict(base[field]) if base else {} for field in FILTER_FIELDS}
+        for field, values in filter_rows.items():
+            for value, rows in values.items():
+                rows = np.array(rows, dtype=np.int64)
+                if value in merged[field]:
+                    rows = np.concatenate([merged[field][value], rows])
+                merged[field][value] = rows
+        return merged
+
+    @staticmethod
+    def _filter_mask(state: LyricsIndexSnapshot, language: Optional[str] = None,
+                     song_id: Optional[str] = None, difficulty: Optional[str] = None):
+        """Boolean row mask for the requested filters and live rows, or None when nothing is excluded"""
+        filters = {"language": language, "song_id": song_id, "difficulty": difficulty}
+        mask = state.live
+
+        for field, value in filters.items():
+            if value is None:
+                continue
+            field_mask = np.zeros(state.size, dtype=bool)
+            field_mask[state.filter_rows[field].get(value, np.empty(0, dtype=np.int64))] = True
+            mask = field_mask if mask is None else mask & field_mask
+
+        return mask
+
+    def _build_lexical(self, metadatas, base: Optional[LexicalIndex] = None) -> Optional[LexicalIndex]:
+        """N-gram index over the lines of metadatas (appended to base when given)"""
+        if self.retrieval == "dense":
+            return None
+        lines = [meta['current_line'] for meta in metadatas]
+        return base.extend(lines) if base is not None else LexicalIndex(lines)
+
+    def _publish(self, state: LyricsIndexSnapshot):
+        """Makes state the index every new search uses (call with the write lock held)"""
+        self._state = state
+        # Cached results name rows of the old snapshot
+        self.result_cache.clear()
+
+    def _append_rows(self, state: LyricsIndexSnapshot, vectors: np.ndarray) -> np.ndarray:
+        """
+        Embedding matrix of state with vectors appended. Rows are written past the
+        end of the shared buffer, so views held by older snapshots are untouched.
+        """
+        size, count = state.size, vectors.shape[0]
+        if count == 0:
+            return state.embeddings
+        if self._buffer is None or self._buffer.shape[0] < size + count:
+            capacity = int((size + count) * 1.5) + 16
+            buffer = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if size:
+                buffer[:size] = state.embeddings
+            self._buffer = buffer
+        self._buffer[size:size + count] = vectors
+        return self._buffer[:size + count]
+
+    def _apply(self, vectors: np.ndarray, metadatas, removed_rows: np.ndarray):
+        """Builds and publishes the snapshot with metadatas appended and removed_rows tombstoned"""
+        state = self._state
+        size = state.size
+        new_size = size + len(metadatas)
+
+        live = np.ones(new_size, dtype=bool)
+        if state.live is not None:
+            live[:size] = state.live
+        live[removed_rows] = False
+
+        embeddings = self._append_rows(state, vectors)
+        if not metadatas:
+            index = state.index
+        elif state.index is None:
+            index = build_vector_index(embeddings, self.index_backend)
+        else:
+            index = state.index.extend(embeddings)
+
+        self._publish(LyricsIndexSnapshot(
+            embeddings,
+            state.metadatas + metadatas,
+            index,
+            self._build_filter_rows(metadatas, size, state.filter_rows) if metadatas else state.filter_rows,
+            None if live.all() else live,
+            state.generation + 1,
+            self._build_lexical(metadatas, state.lexical) if metadatas else state.lexical
+        ))
+
+        if self._state.tombstones > self.compact_ratio * self._state.size:
+            self._compact()
+
+    def upsert_song(self, song: dict) -> dict:
+        """
+        Adds or replaces one song. Only new or changed lines are encoded; the old
+        rows of the song become tombstones. Returns counts for the admin API.
+        """
+        documents, metadatas = flatten_songs([song])
+
+        with self._write_lock:
+            state = self._state
+            old_rows = state.song_rows(song['id'])
+            # Unchanged lines keep their vectors
+            reusable = {state.metadatas[row]['current_line']: row for row in old_rows}
+            missing = [i for i, line in enumerate(documents) if line not in reusable]
+
+            vectors = np.empty((len(documents), 0), dtype=np.float32)
+            if missing:
+                encoded = np.atleast_2d(np.asarray(self.model.encode([documents[i] for i in missing]), dtype=np.float32))
+                vectors = np.empty((len(documents), encoded.shape[1]), dtype=np.float32)
+                vectors[missing] = encoded
+            elif documents:
+                vectors = np.empty((len(documents), state.embeddings.shape[1]), dtype=np.float32)
+            for i, line in enumerate(documents):
+                if line in reusable:
+                    vectors[i] = state.embeddings[reusable[line]]
+
+            self._apply(vectors, metadatas, old_rows)
+            logger.info(f"Upserted song {song['id']}: {len(documents)} lines, {len(missing)} encoded")
+            return {"song_id": song['id'], "lines": len(documents), "encoded": len(missing), **self.index_stats()}
+
+    def delete_song(self, song_id: str) -> bool:
+        """Removes one song from search, returns False if it was not indexed"""
+        with self._write_lock:
+            old_rows = self._state.song_rows(song_id)
+            if len(old_rows) == 0:
+                return False
+            self._apply(np.empty((0, 0), dtype=np.float32), [], old_rows)
+            logger.info(f"Deleted song {song_id}: {len(old_rows)} lines")
+            return True
+
+    def sync_songs(self, songs) -> dict:
+        """
+        Brings the index in line with a songs list edited outside the admin API:
+        changed songs are upserted, songs missing from the list are deleted
+        """
+        with self._write_lock:
+            state = self._state
+            changed = []
+            for song in songs:
+                _, metadatas = flatten_songs([song])
+                if [state.metadatas[row] for row in state.song_rows(song['id'])] != metadatas:
+                    changed.append(song)
+            song_ids = {song['id'] for song in songs}
+            removed = [song_id for song_id in state.filter_rows["song_id"]
+                       if song_id not in song_ids and len(state.song_rows(song_id))]
+
+            # Re-entrant lock: no other writer lands between the diff and the edits
+            for song in changed:
+                self.upsert_song(song)
+            for song_id in removed:
+                self.delete_song(song_id)
+
+        logger.info(f"Synced lyrics index: {len(changed)} songs upserted, {len(removed)} deleted")
+        return {"upserted": len(changed), "deleted": len(removed)}
+
+    def compact(self) -> int:
+        """Drops tombstoned rows now, returns how many were removed"""
+        with self._write_lock:
+            return self._compact()
+
+    def _compact(self) -> int:
+        state = self._state
+        if state.live is None:
+            return 0
+
+        keep = np.flatnonzero(state.live)
+        metadatas = [state.metadatas[row] for row in keep]
+        embeddings, index = None, None
+        if metadatas:
+            embeddings = np.ascontiguousarray(state.embeddings[keep], dtype=np.float32)
+            index = state.index.select(keep, embeddings)
+
+        self._buffer = embeddings
+        self._publish(LyricsIndexSnapshot(
+            embeddings, metadatas, index, self._build_filter_rows(metadatas), generation=state.generation + 1,
+            lexical=self._build_lexical(metadatas)
+        ))
+        logger.info(f"Compacted lyrics index: {state.tombstones} tombstones removed, {len(metadatas)} rows")
+        return state.tombstones
+
+    def save_index(self):
+        """Persists the live rows for the current songs file, so a restart does not re-encode them"""
+        with self._write_lock:
+            state = self._state
+            keep = np.arange(state.size) if state.live is None else np.flatnonzero(state.live)
+            if len(keep) == 0:
+                return
+            key = self.index_store.compute_key(self.data_path, self.model_name)
+            self.index_store.save(key, self.model_name, state.embeddings[keep], [state.metadatas[row] for row in keep])
+
+    def index_stats(self):
+        state = self._state
+        return {
+            "rows": state.size,
+            "tombstones": state.tombstones,
+            "generation": state.generation,
+        }
+
+    def memory_bytes(self) -> int:
+        """Bytes of encoder weights plus the embedding rows (the upsert buffer when there is one)"""
+        embeddings = self._buffer if self._buffer is not None else self._state.embeddings
+        return module_bytes(self.model) + (embeddings.nbytes if embeddings is not None else 0)
+
+    def retrieval_stats(self):
+        return {
+            "mode": self.retrieval,
+            "lexical_resolved": self.lexical_resolved,
+            "encoded_queries": self.encoded_queries,
+            "window_hits": self.window_hits,
+            "window_fallbacks": self.window_fallbacks,
+        }
+
+    def search(self, user_input: str, top_k: int = 5, language: Optional[str] = None,
+               song_id: Optional[str] = None, difficulty: Optional[str] = None,
+               nprobe: Optional[int] = None):
+        """
+        Returns up to top_k (row, score) candidates for the sung input, best first.
+        Filters are applied before scoring; nprobe tunes recall for the ANN backend.
+        """
+        filters = {"language": language, "song_id": song_id, "difficulty": difficulty}
+        return self.search_batch([user_input], top_k, [filters], nprobe)[0]
+
+    def search_batch(self, user_inputs: List[str], top_k: int = 5,
+                     filters: Optional[List[dict]] = None, nprobe: Optional[int] = None,
+                     state: Optional[LyricsIndexSnapshot] = None):
+        """
+        Batched search. In hybrid mode the n-gram index runs first: a line matching
+        near-exactly is returned without encoding the input, the rest are encoded in
+        one call and searched densely, one matrix multiply per distinct filter
+        combination, and fused with their lexical candidates. Returns one
+        candidate list per input.
+        """
+        state = state or self._state
+        if state.index is None or not user_inputs:
+            return [[] for _ in user_inputs]
+
+        filters = filters or [{} for _ in user_inputs]
+        groups = {}
+        for i, query_filters in enumerate(filters):
+            key = tuple(query_filters.get(field) for field in FILTER_FIELDS)
+            groups.setdefault(key, []).append(i)
+        masks = {key: self._filter_mask(state, *key) for key in groups}
+
+        results = [[] for _ in user_inputs]
+        use_lexical = state.lexical is not None and self.retrieval != "dense"
+        lexical = {}
+        dense = []
+        for key, positions in groups.items():
+            for i in positions:
+                if not use_lexical:
+                    dense.append(i)
+                    continue
+                with stage("lexical_search"):
+                    lexical[i] = state.lexical.search(user_inputs[i], max(top_k, self.lexical_candidates), masks[key])
+                candidates = lexical[i].candidates
+                if self.retrieval == "lexical" or (candidates and candidates[0][1] >= self.lexical_exact_score):
+                    results[i] = self._rank(state, candidates)[:top_k]
+                    self.lexical_resolved += bool(candidates)
+                else:
+                    dense.append(i)
+
+        if not dense:
+            return results
+
+        vectors = dict(zip(dense, self._embed([user_inputs[i] for i in dense])))
+        k = max(top_k, self.lexical_candidates) if use_lexical else top_k
+        for key, positions in groups.items():
+            positions = [i for i in positions if i in vectors]
+            if not positions:
+                continue
+            queries = np.vstack([vectors[i] for i in positions])
+            with stage("vector_search"):
+                scores, ids = state.index.search(queries, k=k, mask=masks[key], nprobe=nprobe)
+            for i, row_ids, row_scores in zip(positions, ids, scores):
+                candidates = [(int(row), float(score)) for row, score in zip(row_ids, row_scores) if row >= 0]
+                if i in lexical:
+                    candidates = self._fuse(state, vectors[i], candidates, lexical[i])
+                results[i] = candidates[:top_k]
+
+        return results
+
+    def _fuse(self, state: LyricsIndexSnapshot, vector: np.ndarray, dense, matches):
+        """Scores the union of dense and lexical candidates by weighted cosine + n-gram similarity"""
+        cosine = dict(dense)
+        rows = list(dict.fromkeys([row for row, _ in dense] + [row for row, _ in matches.candidates]))
+        missing = [row for row in rows if row not in cosine]
+        if missing:
+            cosine.update(zip(missing, np.dot(state.embeddings[missing], vector).tolist()))
+
+        weight = self.fusion_dense_weight
+        return self._rank(state, [
+            (row, weight * cosine[row] + (1 - weight) * matches.similarity(row)) for row in rows
+        ])
+
+    @staticmethod
+    def _rank(state: LyricsIndexSnapshot, candidates):
+        """Best first; equal scores ordered by song and line, so the result does not depend on row order"""
+        return sorted(candidates, key=lambda c: (
+            -c[1], state.metadatas[c[0]]['song_id'], state.metadatas[c[0]]['line_number']
+        ))
+
+    def _embed(self, user_inputs: List[str]) -> np.ndarray:
+        """Query vectors for the inputs, encoding only texts missing from the query cache"""
+        keys = [normalize_text(text) for text in user_inputs]
+        vectors = [self.query_cache.get(key) for key in keys]
+
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+
+        if missing:
+            self.encoded_queries += len(missing)
+            with stage("query_encode"):
+                encoded = np.atleast_2d(self.model.encode([user_inputs[positions[0]] for positions in missing.values()]))
+            for (key, positions), vector in zip(missing.items(), encoded):
+                self.query_cache.set(key, vector)
+                for i in positions:
+                    vectors[i] = vector
+
+        return np.vstack(vectors)
+
+    @staticmethod
+    def _next_lines(state: LyricsIndexSnapshot, row: int, count: int = 2):
+        """The lines following row within the same song"""
+        song_id = state.metadatas[row]['song_id']
+        next_lines = []
+        for next_row in range(row + 1, min(row + 1 + count, state.size)):
+            next_meta = state.metadatas[next_row]
+            if next_meta['song_id'] != song_id or not state.is_live(next_row):
+                break
+            next_lines.append(next_meta['current_line'])
+        return next_lines
+
+    def get_next_line(self, user_input: str, language: Optional[str] = None,
+                      song_id: Optional[str] = None, difficulty: Optional[str] = None,
+                      top_k: int = 1):
         """
         Retrieves the song and next lines based on user's sung lyrics.
-        Searches across ALL songs (Global Search).
-        Returns dictionary with song info and next lines.
+        Searches across ALL songs (Global Search) unless filters are given.
+        Returns dictionary with song info, next lines and the top_k candidates.
+        """
+        return self.get_next_lines([{
+            "user_input": user_input,
+            "language": language,
+            "song_id": song_id,
+            "difficulty": difficulty,
+            "top_k": top_k
+        }])[0]
+
+    def _search_windows(self, state: LyricsIndexSnapshot, queries: List[dict]):
+        """
+        Scores each query only against its session window: the last matched line of
+        the song and the session_window lines after it. Returns one result per query,
+        None when the best line is below session_min_confidence.
+        """
+        windows = []
+        for query in queries:
+            song_id, line_number = query["window"]
+            windows.append(state.song_rows(song_id)[max(line_number, 0):line_number + 1 + self.session_window])
+
+        # A (near-)exact line in the window needs no encoder call
+        scores = [None for _ in queries]
+        if self.retrieval != "dense" and state.lexical is not None:
+            for i, (query, rows) in enumerate(zip(queries, windows)):
+                query_grams = char_ngrams(query["user_input"])
+                similarity = np.array([ngram_similarity(query_grams, state.metadatas[row]['current_line']) for row in rows])
+                if self.retrieval == "lexical" or (len(rows) and similarity.max() >= self.lexical_exact_score):
+                    scores[i] = similarity
+
+        dense = [i for i, score in enumerate(scores) if score is None]
+        if dense:
+            vectors = self._embed([queries[i]["user_input"] for i in dense])
+            for i, vector in zip(dense, vectors):
+                scores[i] = np.dot(state.embeddings[windows[i]], vector) if len(windows[i]) else np.empty(0)
+
+        results = []
+        for query, rows, row_scores in zip(queries, windows, scores):
+            top_k = max(query.get("top_k") or 1, 1)
+            candidates = self._rank(state, [(int(row), float(score)) for row, score in zip(rows, row_scores)])[:top_k]
+
+            if not candidates or candidates[0][1] < self.session_min_confidence:
+                self.window_fallbacks += 1
+                results.append(None)
+                continue
+            self.window_hits += 1
+            results.append(self._build_result(state, query["user_input"], candidates, source="window"))
+        return results
+
+    def get_next_lines(self, queries: List[dict]):
+        """
+        Batched get_next_line. Each query is a dict with user_input and optional
+        language, song_id, difficulty and top_k. A query with window=(song_id,
+        line_number) searches that part of the song first and the whole index only
+        if nothing there is confident enough. Returns one result (or None) per query.
         """
         try:
-            if self.embeddings is None or len(self.songs_data) == 0:
-                print("No embeddings found")
-                return None
-                
-            # Embed user input
-            user_embedding = self.model.encode([user_input])
-            
-            # Compute dot product
-            scores = np.dot(self.embeddings, user_embedding.T).flatten()
-            
-            # Find best match globally
-            best_idx = np.argmax(scores)
-            best_score = scores[best_idx]
-            
-            matched_metadata = self.songs_data[best_idx]
-            
-            # Similarity threshold (Higher is better for cosine similarity)
-            # 1.0 is exact match, 0.0 is orthogonal
-            if best_score < 0.5: # Lower threshold for discovery
-                logger.info(f"Low confidence match: {best_score} for '{user_input}'")
-                return None
-            
-            logger.info(f"Global Match: '{matched_metadata['title']}' - Score: {best_score}")
-            
-            # Get next 2 lines
-            # We need to find the song in self.songs_data to get subsequent lines
-            # self.songs_data is flat list, but we can index into it
-            
-            next_lines = []
-            
-            # Line + 1
-            if best_idx + 1 < len(self.songs_data):
-                next_meta = self.songs_data[best_idx + 1]
-                if next_meta['song_id'] == matched_metadata['song_id']:
-                   next_lines.append(next_meta['current_line'])
-            
-            # Line + 2
-            if best_idx + 2 < len(self.songs_data):
-                next_meta_2 = self.songs_data[best_idx + 2]
-                if next_meta_2['song_id'] == matched_metadata['song_id']:
-                   next_lines.append(next_meta_2['current_line'])
-
-            return {
-                "song_id": matched_metadata['song_id'],
-                "title": matched_metadata['title'],
-                "artist": matched_metadata.get('artist', 'Unknown'), # Add safely
-                "matched_line": matched_metadata['current_line'],
-                "matched_line_number": matched_metadata['line_number'],
-                "next_lines": next_lines,
-                "confidence": float(best_score)
-            }
-            
+            # One snapshot for the whole batch, even if an update is published meanwhile
+            state = self._state
+            if state.index is None or state.size == 0:
+                logger.warning("No embeddings found, lyrics search has nothing to match")
+                return [None for _ in queries]
+
+            results = [_MISSING for _ in queries]
+            windowed = [i for i, query in enumerate(queries) if query.get("window")]
+            if windowed:
+                for i, result in zip(windowed, self._search_windows(state, [queries[i] for i in windowed])):
+                    if result is not None:
+                        results[i] = result
+
+            cache_keys = []
+            for i, query in enumerate(queries):
+                key = (
+                    normalize_text(query["user_input"]),
+                    tuple(query.get(field) for field in FILTER_FIELDS),
+                    max(query.get("top_k") or 1, 1),
+                    state.generation
+                )
+                cache_keys.append(key)
+                if results[i] is _MISSING:
+                    results[i] = self.result_cache.get(key, _MISSING)
+
+            pending = [i for i, result in enumerate(results) if result is _MISSING]
+            if pending:
+                top_k = max(cache_keys[i][2] for i in pending)
+                all_candidates = self.search_batch(
+                    [queries[i]["user_input"] for i in pending],
+                    top_k,
+                    [{field: queries[i].get(field) for field in FILTER_FIELDS} for i in pending],
+                    state=state
+                )
+
+                for i, candidates in zip(pending, all_candidates):
+                    results[i] = self._build_result(state, queries[i]["user_input"], candidates[:cache_keys[i][2]])
+                    self.result_cache.set(cache_keys[i], results[i])
+
+            return results
+
         except Exception as e:
             logger.error(f"Error identifying lyrics: {e}")
+            return [None for _ in queries]
+
+    def _build_result(self, state: LyricsIndexSnapshot, user_input: str, candidates, source: str = "global"):
+        """Turns ranked (row, score) candidates into the get_next_line response dict"""
+        if not candidates:
             return None
 
-# Singleton instance
-lyrics_rag = LyricsRAG()
+        best_idx, best_score = candidates[0]
+        matched_metadata = state.metadatas[best_idx]
+
+        # Similarity threshold (Higher is better for cosine similarity)
+        # 1.0 is exact match, 0.0 is orthogonal
+        if best_score < 0.5: # Lower threshold for discovery
+            logger.info(f"Low confidence match: {best_score} for '{user_input}'")
+            return None
+
+        logger.info(f"{source.title()} Match: '{matched_metadata['title']}' - Score: {best_score}")
+
+        return {
+            "song_id": matched_metadata['song_id'],
+            "title": matched_metadata['title'],
+            "artist": matched_metadata.get('artist', 'Unknown'), # Add safely
+            "matched_line": matched_metadata['current_line'],
+            "matched_line_number": matched_metadata['line_number'],
+            "next_lines": self._next_lines(state, best_idx),
+            "confidence": float(best_score),
+            "source": source,
+            "candidates": [
+                {
+                    "song_id": state.metadatas[row]['song_id'],
+                    "title": state.metadatas[row]['title'],
+                    "matched_line": state.metadatas[row]['current_line'],
+                    "matched_line_number": state.metadatas[row]['line_number'],
+                    "confidence": score
+                } for row, score in candidates
+            ]
+        }
+
+def _get_next_lines(queries: List[dict]) -> List:
+    return model_registry.get("rag").get_next_lines(queries)
+
+# Coalesces concurrent /next requests into one encode + one matrix multiply.
+# The index itself is loaded by the registry (models/registry.py).
+lyrics_batcher = AsyncBatcher(
+    _get_next_lines,
+    max_batch_size=int(os.getenv("LYRICS_BATCH_MAX_SIZE", "32")),
+    max_wait_ms=float(os.getenv("LYRICS_BATCH_MAX_WAIT_MS", "5")),
+    workers=int(os.getenv("LYRICS_WORKERS", "1")),
+    max_queue_size=int(os.getenv("LYRICS_QUEUE_MAX_SIZE", "256")),
+    timeout_s=float(os.getenv("LYRICS_TIMEOUT_S", "5")),
+    name="lyrics_query_batcher"
+)
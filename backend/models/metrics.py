@@ -0,0 +1,248 @@
+"""
+Prometheus metrics in the text exposition format, kept in-process.
+
+Recording is a perf_counter() call, a lock and a bisect per observation, so it
+stays on in production. Values kept elsewhere (cache counters, queue depths,
+model memory) are copied into gauges by collectors at scrape time instead of
+being recorded on the request path.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds: from sub-millisecond index lookups to multi-second inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def set(self, value: float, *labels):
+        """Sets the value (for counters: a total kept elsewhere, copied by a collector)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def clear(self):
+        """Drops every label set (a collector re-publishing the current ones)"""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {} # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors, rendered together by render()"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """collector() runs before every render() and sets gauges/counters from state kept elsewhere"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                # A broken collector must not take the whole scrape down
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+        lines = []
+        for metric in self._metrics.values():
+            samples = metric.render()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def resident_memory_bytes() -> int:
+    """Resident set size of this process (0 where /proc is not available)"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+# Singleton instance and the metrics recorded on the request path
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent, by route template",
+    ("method", "route", "status")
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "Requests being handled")
+stage_duration = metrics.histogram(
+    "pipeline_stage_duration_seconds",
+    "Time spent in one stage of the request pipeline (audio decode, Whisper forward, query encode...)",
+    ("stage",)
+)
+queue_wait = metrics.histogram(
+    "batcher_queue_wait_seconds", "Time an item waited in an inference queue before its batch started",
+    ("batcher",)
+)
+
+
+
+# Copied from state kept elsewhere by the routers' collectors at scrape time
+batcher_queue_depth = metrics.gauge("batcher_queue_depth", "Items waiting for a batch worker", ("batcher",))
+batcher_in_flight = metrics.gauge("batcher_in_flight", "Items in batches being processed", ("batcher",))
+batcher_items = metrics.counter("batcher_items_total", "Items processed", ("batcher",))
+batcher_batches = metrics.counter("batcher_batches_total", "Batches processed", ("batcher",))
+batcher_rejected = metrics.counter("batcher_rejected_total", "Items turned away with a full queue", ("batcher",))
+batcher_timed_out = metrics.counter("batcher_timed_out_total", "Items that exceeded the batcher timeout", ("batcher",))
+cache_hits = metrics.counter("cache_hits_total", "Lookups answered from the cache", ("cache",))
+cache_misses = metrics.counter("cache_misses_total", "Lookups the cache could not answer", ("cache",))
+cache_hit_ratio = metrics.gauge("cache_hit_ratio", "Hits over lookups since the process started", ("cache",))
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage: `with stage("whisper_forward"): ...`"""
+    return stage_duration.time(name)
+
+
+def publish_batcher(batcher):
+    batcher_queue_depth.set(batcher.queue_depth, batcher.name)
+    batcher_in_flight.set(batcher.in_flight, batcher.name)
+    batcher_items.set(batcher.stats.items, batcher.name)
+    batcher_batches.set(batcher.stats.batches, batcher.name)
+    batcher_rejected.set(batcher.stats.rejected, batcher.name)
+    batcher_timed_out.set(batcher.stats.timed_out, batcher.name)
+
+
+def publish_cache(name: str, hits: int, misses: int):
+    cache_hits.set(hits, name)
+    cache_misses.set(misses, name)
+    cache_hit_ratio.set(hits / (hits + misses) if hits + misses else 0.0, name)
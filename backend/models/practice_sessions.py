@@ -0,0 +1,83 @@
+import os
+import secrets
+import logging
+from typing import Optional
+from models.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class PracticeSession:
+    """Where a user is in the song they practice: the last matched line, -1 before the first"""
+
+    def __init__(self, session_id: str, song_id: str):
+        self.session_id = session_id
+        self.song_id = song_id
+        self.line_number = -1
+        self.matches = 0
+        self.fallbacks = 0
+
+    def window(self):
+        """(song_id, line_number) for LyricsRAG windowed search"""
+        return self.song_id, self.line_number
+
+    def record(self, result: Optional[dict]):
+        """Moves the position to a matched line; a global match in another song switches songs"""
+        if not result:
+            return
+        if result.get("source") == "global":
+            self.fallbacks += 1
+        self.song_id = result["song_id"]
+        self.line_number = result["matched_line_number"]
+        self.matches += 1
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "song_id": self.song_id,
+            "line_number": self.line_number,
+            "matches": self.matches,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class PracticeSessionStore:
+    """
+    Practice sessions by id. Bounded: the least recently used session is evicted
+    first, and a session expires ttl_seconds after its last use.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600):
+        self._sessions = LRUCache(max_sessions, ttl_seconds)
+        self.created = 0
+
+    def create(self, song_id: str) -> PracticeSession:
+        session = PracticeSession(secrets.token_urlsafe(16), song_id)
+        self._sessions.set(session.session_id, session)
+        self.created += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[PracticeSession]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            # Re-set to restart the TTL
+            self._sessions.set(session_id, session)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id) is not None
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "created": self.created,
+            "max_sessions": self._sessions.maxsize,
+            "ttl_seconds": self._sessions.ttl_seconds,
+        }
+
+
+# Singleton instance
+practice_sessions = PracticeSessionStore(
+    max_sessions=int(os.getenv("PRACTICE_SESSION_MAX", "10000")),
+    ttl_seconds=float(os.getenv("PRACTICE_SESSION_TTL_S", "3600"))
+)
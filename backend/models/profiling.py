@@ -0,0 +1,270 @@
+"""
+Opt-in profiling of individual requests.
+
+An admin arms a route for its next N requests (optionally sampled), or sends one
+request with an X-Profile header. Model stages of a selected request (the
+batches it takes part in) then run under cProfile and torch.profiler, and the
+results are written to one directory per request under PROFILE_DIR, keeping
+only the newest PROFILE_MAX_CAPTURES / PROFILE_MAX_MB.
+
+While nothing is armed, a request costs one dict check in the middleware and a
+context variable lookup per batch item.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+
+
+class Capture:
+    """Profiles of one request, written to their own directory"""
+
+    def __init__(self, capture_id: str, path: str, method: str, route: str):
+        self.id = capture_id
+        self.path = path
+        self.method = method
+        self.route = route
+        self.started_at = time.time()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def stage_prefix(self, name: str) -> str:
+        with self._lock:
+            return os.path.join(self.path, f"{len(self.stages) + 1:02d}-{name}")
+
+    def add_stage(self, stage: dict):
+        with self._lock:
+            self.stages.append(stage)
+
+
+# The capture of the request being handled; batchers carry it over to their worker threads
+current_capture: contextvars.ContextVar[Optional[Capture]] = contextvars.ContextVar("profile_capture", default=None)
+
+
+class RequestProfiler:
+    """Selects requests to profile and manages the bounded directory of captures"""
+
+    def __init__(self, profile_dir: str = "data/profiles", max_captures: int = 20,
+                 max_bytes: int = 200 * 1024 * 1024, torch_trace: bool = True):
+        self.profile_dir = profile_dir
+        self.max_captures = max_captures
+        self.max_bytes = max_bytes
+        self.torch_trace = torch_trace
+        self._armed: Dict[str, dict] = {} # route -> {"remaining", "sample_rate"}
+        self._lock = threading.Lock()
+        # cProfile and torch.profiler are process-wide on recent Pythons / torch: one stage at a time
+        self._stage_lock = threading.Lock()
+        self._sequence = 0
+
+    def arm(self, route: str, requests: int, sample_rate: float = 1.0) -> Dict[str, dict]:
+        """Profiles the next `requests` requests to the path `route` (each with probability sample_rate); 0 disarms"""
+        with self._lock:
+            if requests > 0:
+                self._armed[route] = {"remaining": requests, "sample_rate": sample_rate}
+            else:
+                self._armed.pop(route, None)
+            return self.armed()
+
+    def armed(self) -> Dict[str, dict]:
+        return {route: dict(state) for route, state in self._armed.items()}
+
+    def select(self, method: str, route: str, forced: bool = False) -> Optional[Capture]:
+        """A new Capture if this request should be profiled, else None"""
+        if not self._armed and not forced:
+            return None
+
+        with self._lock:
+            state = self._armed.get(route)
+            if not forced:
+                if state is None or random.random() >= state["sample_rate"]:
+                    return None
+                state["remaining"] -= 1
+                if state["remaining"] <= 0:
+                    del self._armed[route]
+            self._sequence += 1
+            sequence = self._sequence
+
+        now = time.time()
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        capture_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}-{sequence:04d}-{slug}"
+        capture = Capture(capture_id, os.path.join(self.profile_dir, capture_id), method, route)
+        os.makedirs(capture.path, exist_ok=True)
+        logger.info(f"Profiling {method} {route} as {capture_id}")
+        return capture
+
+    def run_stage(self, captures: List[Capture], name: str, fn: Callable, *args):
+        """Runs fn(*args) under cProfile and torch.profiler and saves the results to every capture"""
+        if not self._stage_lock.acquire(blocking=False):
+            for capture in captures:
+                capture.add_stage({"name": name, "skipped": "another stage was being profiled"})
+            return fn(*args)
+
+        try:
+            torch_profile = self._start_torch_profile()
+            python_profile = cProfile.Profile()
+            start = time.perf_counter()
+            python_profile.enable()
+            try:
+                return fn(*args)
+            finally:
+                python_profile.disable()
+                seconds = time.perf_counter() - start
+                if torch_profile is not None:
+                    torch_profile.__exit__(None, None, None)
+                # A torch trace can only be exported once: requests sharing the batch get copies
+                saved = self._save_stage(captures[0], name, seconds, python_profile, torch_profile)
+                for capture in captures[1:]:
+                    self._copy_stage(saved, capture, name)
+        finally:
+            self._stage_lock.release()
+
+    def _start_torch_profile(self):
+        if not self.torch_trace:
+            return None
+        try:
+            # torch is only needed once a stage is actually profiled
+            from torch.profiler import ProfilerActivity, profile
+            torch_profile = profile(activities=[ProfilerActivity.CPU])
+            torch_profile.__enter__()
+            return torch_profile
+        except Exception as e:
+            logger.warning(f"torch.profiler unavailable, capturing the Python profile only: {e}")
+            return None
+
+    def _save_stage(self, capture: Capture, name: str, seconds: float, python_profile, torch_profile):
+        stage = {"name": name, "seconds": round(seconds, 6), "files": []}
+        try:
+            os.makedirs(capture.path, exist_ok=True)
+            prefix = capture.stage_prefix(name)
+
+            python_profile.dump_stats(f"{prefix}.prof")
+            summary = io.StringIO()
+            pstats.Stats(python_profile, stream=summary).sort_stats("cumulative").print_stats(40)
+            with open(f"{prefix}.txt", 'w') as f:
+                f.write(summary.getvalue())
+            stage["files"] += [os.path.basename(f"{prefix}.prof"), os.path.basename(f"{prefix}.txt")]
+
+            if torch_profile is not None:
+                torch_profile.export_chrome_trace(f"{prefix}.trace.json")
+                with open(f"{prefix}.torch.txt", 'w') as f:
+                    f.write(torch_profile.key_averages().table(sort_by="self_cpu_time_total", row_limit=30))
+                stage["files"] += [os.path.basename(f"{prefix}.trace.json"), os.path.basename(f"{prefix}.torch.txt")]
+        except Exception as e:
+            logger.error(f"Could not save the {name} profile of {capture.id}: {e}")
+            stage["error"] = str(e)
+        capture.add_stage(stage)
+        return capture, stage
+
+    def _copy_stage(self, saved, capture: Capture, name: str):
+        source, stage = saved
+        copy = dict(stage, files=[])
+        try:
+            os.makedirs(capture.path, exist_ok=True)
+            prefix = os.path.basename(capture.stage_prefix(name))
+            for filename in stage["files"]:
+                # 01-whisper_batcher.prof -> 03-whisper_batcher.prof
+                copied = prefix + filename[filename.index("."):]
+                shutil.copyfile(os.path.join(source.path, filename), os.path.join(capture.path, copied))
+                copy["files"].append(copied)
+        except OSError as e:
+            logger.error(f"Could not copy the {name} profile to {capture.id}: {e}")
+            copy["error"] = str(e)
+        capture.add_stage(copy)
+
+    def finish(self, capture: Capture, status: int, seconds: float):
+        """Writes the request summary and drops the oldest captures beyond the limits"""
+        meta = {
+            "id": capture.id,
+            "method": capture.method,
+            "route": capture.route,
+            "status": status,
+            "seconds": round(seconds, 6),
+            "started_at": capture.started_at,
+            "stages": capture.stages,
+        }
+        try:
+            os.makedirs(capture.path, exist_ok=True)
+            with open(os.path.join(capture.path, "meta.json"), 'w') as f:
+                json.dump(meta, f, indent=2)
+        except OSError as e:
+            logger.error(f"Could not save profile {capture.id}: {e}")
+        self._prune(keep=capture.id)
+
+    def _capture_ids(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.profile_dir)
+                          if os.path.isdir(os.path.join(self.profile_dir, name)))
+        except FileNotFoundError:
+            return []
+
+    def _capture_files(self, capture_id: str) -> Dict[str, int]:
+        path = os.path.join(self.profile_dir, capture_id)
+        try:
+            return {name: os.path.getsize(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+        except OSError:
+            return {}
+
+    def _prune(self, keep: Optional[str] = None):
+        ids = self._capture_ids()
+        sizes = {capture_id: sum(self._capture_files(capture_id).values()) for capture_id in ids}
+        total = sum(sizes.values())
+        for capture_id in ids:
+            if len(ids) <= self.max_captures and total <= self.max_bytes:
+                break
+            if capture_id == keep:
+                continue
+            shutil.rmtree(os.path.join(self.profile_dir, capture_id), ignore_errors=True)
+            ids.remove(capture_id)
+            total -= sizes[capture_id]
+
+    def list_captures(self) -> List[dict]:
+        """Newest first, with each capture's summary and files"""
+        captures = []
+        for capture_id in reversed(self._capture_ids()):
+            files = self._capture_files(capture_id)
+            meta = {"id": capture_id}
+            if "meta.json" in files:
+                try:
+                    with open(os.path.join(self.profile_dir, capture_id, "meta.json"), 'r') as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            captures.append({**meta, "files": files})
+        return captures
+
+    def file_path(self, capture_id: str, filename: str) -> Optional[str]:
+        """Path of one captured file, or None (names are looked up, never joined blindly)"""
+        if capture_id not in self._capture_ids() or filename not in self._capture_files(capture_id):
+            return None
+        return os.path.join(self.profile_dir, capture_id, filename)
+
+    def clear(self) -> int:
+        """Disarms every route and deletes all captures"""
+        with self._lock:
+            self._armed.clear()
+        ids = self._capture_ids()
+        for capture_id in ids:
+            shutil.rmtree(os.path.join(self.profile_dir, capture_id), ignore_errors=True)
+        return len(ids)
+
+
+# Singleton instance
+profiler = RequestProfiler(
+    profile_dir=os.getenv("PROFILE_DIR", "data/profiles"),
+    max_captures=int(os.getenv("PROFILE_MAX_CAPTURES", "20")),
+    max_bytes=int(os.getenv("PROFILE_MAX_MB", "200")) * 1024 * 1024,
+    torch_trace=os.getenv("PROFILE_TORCH_TRACE", "1").lower() not in ("0", "false", "no")
+)
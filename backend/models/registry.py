@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional
+from models.batching import InferenceRejectedError
+
+logger = logging.getLogger(__name__)
+
+# Model states reported by /health and /ready
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Seconds before a failed model is tried again
+FAILED_RETRY_INTERVAL_S = 30
+
+
+class ModelNotReadyError(InferenceRejectedError):
+    """Raised when a model is requested before it finished loading (mapped to 503 + Retry-After)"""
+    status_code = 503
+
+    def __init__(self, name: str, state: str, retry_after: int = 5):
+        super().__init__(f"Model '{name}' is {state}", retry_after)
+        self.name = name
+        self.state = state
+
+
+class _ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], object], lazy: bool):
+        self.name = name
+        self.loader = loader
+        self.lazy = lazy
+        self.state = PENDING
+        self.instance = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.failed_at = 0.0
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loads models in background threads so the server can bind immediately.
+
+    Eager models start loading (concurrently) when start() is called; lazy ones
+    on their first request. get() never blocks a request on a cold model: it
+    raises ModelNotReadyError instead, unless wait=True (CLIs, benchmarks, tests).
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], object], lazy: bool = False):
+        self._entries[name] = _ModelEntry(name, loader, lazy)
+
+    def provide(self, name: str, instance):
+        """Marks a model as ready with an instance built elsewhere (tests, embedding apps)"""
+        entry = self._entries[name]
+        with entry.lock:
+            entry.instance = instance
+            entry.state = READY
+            entry.error = None
+            entry.load_seconds = 0.0
+        entry.loaded.set()
+
+    def start(self):
+        """Starts loading every eager model, each in its own thread"""
+        for entry in self._entries.values():
+            if not entry.lazy:
+                self._load_in_background(entry)
+
+    def _load_in_background(self, entry: _ModelEntry):
+        with entry.lock:
+            if entry.state in (LOADING, READY):
+                return
+            if entry.state == FAILED and time.monotonic() - entry.failed_at < FAILED_RETRY_INTERVAL_S:
+                return
+            entry.state = LOADING
+            entry.loaded.clear()
+
+        threading.Thread(target=self._load, args=(entry,), name=f"load-{entry.name}", daemon=True).start()
+
+    def _load(self, entry: _ModelEntry):
+        logger.info(f"Loading model '{entry.name}'...")
+        start = time.perf_counter()
+        try:
+            instance = entry.loader()
+        except Exception as e:
+            logger.error(f"Model '{entry.name}' failed to load: {e}")
+            with entry.lock:
+                entry.state = FAILED
+                entry.error = str(e)
+                entry.failed_at = time.monotonic()
+            entry.loaded.set()
+            return
+
+        with entry.lock:
+            entry.instance = instance
+            entry.load_seconds = time.perf_counter() - start
+            entry.error = None
+            entry.state = READY
+        entry.loaded.set()
+        logger.info(f"Model '{entry.name}' ready in {entry.load_seconds:.1f}s")
+
+    def get(self, name: str, wait: bool = False):
+        """Returns the loaded model, starting a lazy/failed load if needed"""
+        entry = self._entries[name]
+        if entry.state == READY:
+            return entry.instance
+
+        self._load_in_background(entry)
+        if wait:
+            entry.loaded.wait()
+            if entry.state == READY:
+                return entry.instance
+            raise RuntimeError(f"Model '{name}' failed to load: {entry.error}")
+
+        raise ModelNotReadyError(name, entry.state)
+
+    def ensure_ready(self, *names: str):
+        """Raises ModelNotReadyError unless every named model is loaded"""
+        for name in names:
+            self.get(name)
+
+    def is_ready(self, name: str) -> bool:
+        return self._entries[name].state == READY
+
+    def status(self):
+        return {
+            name: {
+                "state": entry.state,
+                "lazy": entry.lazy,
+                "load_seconds": round(entry.load_seconds, 3) if entry.load_seconds is not None else None,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+
+def _load_whisper():
+    from models.whisper_model import WhisperModel
+    return WhisperModel()
+
+def _load_tts():
+    from models.tts_model import TTSModel
+    return TTSModel()
+
+def _load_rag():
+    from models.lyrics_rag import LyricsRAG
+    # Same file as the song catalog, so admin edits reach both
+    return LyricsRAG(data_path=os.getenv("SONGS_PATH", "data/songs.json"))
+
+def _load_llm():
+    from models.llm_service import LLMService
+    return LLMService()
+
+
+# Comma-separated model names to load on first use instead of at startup
+LAZY_MODELS = {name.strip() for name in os.getenv("LAZY_MODELS", "").split(",") if name.strip()}
+
+# Singleton instance
+model_registry = ModelRegistry()
+model_registry.register("stt", _load_whisper, lazy="stt" in LAZY_MODELS)
+model_registry.register("tts", _load_tts, lazy="tts" in LAZY_MODELS)
+model_registry.register("rag", _load_rag, lazy="rag" in LAZY_MODELS)
+model_registry.register("llm", _load_llm, lazy="llm" in LAZY_MODELS)
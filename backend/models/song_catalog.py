@@ -0,0 +1,224 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import logging
+from typing import Callable, List, Optional
+from models.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Fields of the list view; lyrics are only served by the per-song endpoint
+SUMMARY_FIELDS = ("id", "title", "artist", "language", "difficulty")
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a pagination cursor that does not point into the catalog"""
+
+
+def encode_cursor(song_id: str) -> str:
+    return base64.urlsafe_b64encode(song_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+
+class CatalogSnapshot:
+    """
+    One parsed version of the songs file. Never modified after it is built, so
+    readers holding a reference always see a consistent catalog.
+    """
+
+    def __init__(self, songs, version: str, mtime_ns: int, size: int):
+        self.version = version
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.ids = tuple(song['id'] for song in songs)
+        self.positions = {song_id: i for i, song_id in enumerate(self.ids)}
+        self.songs = {song['id']: song for song in songs}
+        self.summaries = tuple({field: song.get(field) for field in SUMMARY_FIELDS} for song in songs)
+        # Each song serialized once; list pages are joined from these fragments
+        self.summary_json = tuple(json.dumps(summary, ensure_ascii=False).encode("utf-8") for summary in self.summaries)
+        self.song_json = {song['id']: json.dumps(song, ensure_ascii=False).encode("utf-8") for song in songs}
+        self.pages = LRUCache(256) # (language, difficulty, cursor, limit) -> (body, etag, next_cursor)
+
+    def page(self, language: Optional[str] = None, difficulty: Optional[str] = None,
+             cursor: Optional[str] = None, limit: int = 100):
+        """Returns (JSON body bytes, ETag, next cursor or None) for one filtered page"""
+        key = (language, difficulty, cursor, limit)
+        cached = self.pages.get(key)
+        if cached is not None:
+            return cached
+
+        start = 0
+        if cursor:
+            after = decode_cursor(cursor)
+            if after not in self.positions:
+                raise InvalidCursorError(f"Invalid cursor: {cursor}")
+            start = self.positions[after] + 1
+
+        rows = []
+        next_cursor = None
+        for i in range(start, len(self.ids)):
+            summary = self.summaries[i]
+            if language and summary['language'] != language:
+                continue
+            if difficulty and (summary['difficulty'] or "").lower() != difficulty.lower():
+                continue
+            if len(rows) == limit:
+                next_cursor = encode_cursor(self.ids[rows[-1]])
+                break
+            rows.append(i)
+
+        body = b"[" + b",".join(self.summary_json[i] for i in rows) + b"]"
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        result = (body, etag, next_cursor)
+        self.pages.set(key, result)
+        return result
+
+    def song(self, song_id: str):
+        """(JSON body bytes, ETag) of one song with its lyrics, None if unknown"""
+        body = self.song_json.get(song_id)
+        if body is None:
+            return None
+        return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class SongCatalog:
+    """
+    The songs file parsed once into a CatalogSnapshot. A watcher thread polls the
+    file and swaps in a new snapshot when it changes; a file that fails to parse
+    keeps the previous snapshot in service. Listeners are called with the new
+    snapshot after a change made outside upsert()/delete().
+    """
+
+    def __init__(self, data_path: str = "data/songs.json", poll_interval_s: float = 2.0):
+        self.data_path = data_path
+        self.poll_interval_s = poll_interval_s
+        self.reloads = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.reload_if_changed()
+            snapshot = self._snapshot
+        return snapshot
+
+    def get(self, song_id: str):
+        """The full song dict (with lyrics), None if unknown"""
+        return self.snapshot.songs.get(song_id)
+
+    def add_listener(self, listener: Callable[[CatalogSnapshot], None]):
+        """Calls listener(snapshot) from the watcher thread whenever the file is reloaded"""
+        self._listeners.append(listener)
+
+    def reload_if_changed(self) -> bool:
+        """Re-parses the file if its mtime or size changed, returns whether a new snapshot was swapped in"""
+        with self._reload_lock:
+            try:
+                stat = os.stat(self.data_path)
+            except OSError as e:
+                if self._snapshot is None:
+                    raise
+                logger.warning(f"Song catalog {self.data_path} unavailable, keeping the loaded version: {e}")
+                return False
+
+            current = self._snapshot
+            if current is not None and (current.mtime_ns, current.size) == (stat.st_mtime_ns, stat.st_size):
+                return False
+
+            try:
+                with open(self.data_path, 'rb') as f:
+                    raw = f.read()
+                songs = json.loads(raw)
+            except (OSError, ValueError) as e:
+                if current is None:
+                    raise
+                logger.error(f"Could not reload song catalog, keeping the previous version: {e}")
+                return False
+
+            version = hashlib.sha256(raw).hexdigest()[:16]
+            # Single reference assignment: readers see the old or the new catalog, never a mix
+            snapshot = self._snapshot = CatalogSnapshot(songs, version, stat.st_mtime_ns, stat.st_size)
+            if current is None:
+                return True
+            self.reloads += 1
+            logger.info(f"Song catalog reloaded: {len(songs)} songs (version {version})")
+
+        # Outside the lock: a listener may take a while (e.g. re-encoding changed lyrics)
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Song catalog listener failed: {e}")
+        return True
+
+    def _write(self, songs):
+        """Atomically replaces the songs file and swaps in the matching snapshot (call with _reload_lock held)"""
+        raw = json.dumps(songs, ensure_ascii=False, indent=4).encode("utf-8")
+        tmp_path = self.data_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, self.data_path)
+        stat = os.stat(self.data_path)
+        self._snapshot = CatalogSnapshot(songs, hashlib.sha256(raw).hexdigest()[:16], stat.st_mtime_ns, stat.st_size)
+
+    def upsert(self, song: dict) -> bool:
+        """Adds or replaces one song in the file, returns True if it was new"""
+        self.snapshot # loaded before taking the lock
+        with self._reload_lock:
+            snapshot = self._snapshot
+            songs = [snapshot.songs[song_id] for song_id in snapshot.ids]
+            position = snapshot.positions.get(song['id'])
+            if position is None:
+                songs.append(song)
+            else:
+                songs[position] = song
+            self._write(songs)
+        return position is None
+
+    def delete(self, song_id: str) -> bool:
+        """Removes one song from the file, returns False if it was unknown"""
+        self.snapshot
+        with self._reload_lock:
+            snapshot = self._snapshot
+            if song_id not in snapshot.positions:
+                return False
+            self._write([snapshot.songs[i] for i in snapshot.ids if i != song_id])
+        return True
+
+    def start(self):
+        """Loads the catalog and starts watching the file"""
+        self.reload_if_changed()
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="song-catalog-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                logger.error(f"Song catalog watcher error: {e}")
+
+
+# Singleton instance
+song_catalog = SongCatalog(
+    data_path=os.getenv("SONGS_PATH", "data/songs.json"),
+    poll_interval_s=float(os.getenv("SONGS_POLL_INTERVAL_S", "2"))
+)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import logging
+from typing import Dict, List
+import numpy as np
+from models.tiny_models import TINY_MODELS_DIR, use_tiny_models
+
+logger = logging.getLogger(__name__)
+
+# Random tiny-profile voices are kept apart from the real x-vectors
+DEFAULT_VOICES_DIR = os.getenv("TTS_VOICES_DIR", os.path.join(TINY_MODELS_DIR, "voices") if use_tiny_models() else "data/voices")
+
+XVECTOR_DATASET = "Matthijs/cmu-arctic-xvectors"
+# Row of the x-vector dataset the service has always used as its voice
+DEFAULT_VOICE_ROW = 7306
+# CMU ARCTIC speakers in the x-vector dataset, stored under their own names
+ARCTIC_SPEAKERS = ("bdl", "clb", "jmk", "ksp", "rms", "slt")
+
+
+class SpeakerEmbeddingStore:
+    """
+    Precomputed SpeechT5 speaker x-vectors, one row per voice.
+
+    The vectors live in a small .npy matrix (memory-mapped on load) next to a
+    JSON index mapping voice names to rows, so no dataset is touched at startup.
+    """
+
+    def __init__(self, voices_dir: str = DEFAULT_VOICES_DIR):
+        self.voices_dir = voices_dir
+        self.embeddings_path = os.path.join(voices_dir, "speaker_embeddings.npy")
+        self.index_path = os.path.join(voices_dir, "voices.json")
+        self.embeddings = None
+        self.voices: Dict[str, int] = {}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path) and os.path.exists(self.embeddings_path)
+
+    def load(self) -> bool:
+        """Loads the store if it exists, returns whether it did"""
+        if not self.exists():
+            return False
+
+        with open(self.index_path, 'r') as f:
+            voices = json.load(f)["voices"]
+        embeddings = np.load(self.embeddings_path, mmap_mode="r")
+        if embeddings.ndim != 2 or max(voices.values(), default=-1) >= embeddings.shape[0]:
+            raise ValueError(f"Speaker embedding store in {self.voices_dir} is inconsistent")
+
+        self.embeddings = embeddings
+        self.voices = voices
+        logger.info(f"Loaded {len(voices)} voices from {self.voices_dir}")
+        return True
+
+    def save(self, voices: Dict[str, np.ndarray], source: str = XVECTOR_DATASET):
+        """Writes the matrix then the index (the index marks the store valid)"""
+        os.makedirs(self.voices_dir, exist_ok=True)
+        names = list(voices)
+        embeddings = np.stack([np.asarray(voices[name], dtype=np.float32) for name in names])
+
+        tmp_embeddings = self.embeddings_path + ".tmp"
+        with open(tmp_embeddings, 'wb') as f:
+            np.save(f, embeddings)
+        os.replace(tmp_embeddings, self.embeddings_path)
+
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, 'w') as f:
+            json.dump({
+                "voices": {name: i for i, name in enumerate(names)},
+                "dim": int(embeddings.shape[1]),
+                "source": source,
+            }, f, indent=2)
+        os.replace(tmp_index, self.index_path)
+
+        self.embeddings = embeddings
+        self.voices = {name: i for i, name in enumerate(names)}
+        logger.info(f"Saved {len(names)} voices to {self.voices_dir}")
+
+    def names(self) -> List[str]:
+        return list(self.voices)
+
+    def __contains__(self, voice: str) -> bool:
+        return voice in self.voices
+
+    def get(self, voice: str) -> np.ndarray:
+        """The (dim,) x-vector of a voice, KeyError if unknown"""
+        return np.asarray(self.embeddings[self.voices[voice]], dtype=np.float32)
+
+
+def extract_voices(dataset) -> Dict[str, np.ndarray]:
+    """Picks the default row plus the first utterance of every ARCTIC speaker"""
+    voices = {"default": np.asarray(dataset[DEFAULT_VOICE_ROW]["xvector"], dtype=np.float32)}
+    for i, filename in enumerate(dataset["filename"]):
+        for speaker in ARCTIC_SPEAKERS:
+            if speaker not in voices and f"_{speaker}_" in filename:
+                voices[speaker] = np.asarray(dataset[i]["xvector"], dtype=np.float32)
+        if len(voices) == len(ARCTIC_SPEAKERS) + 1:
+            break
+    return voices
+
+
+def build_from_dataset(store: SpeakerEmbeddingStore):
+    from datasets import load_dataset
+
+    dataset = load_dataset(XVECTOR_DATASET, split="validation")
+    store.save(extract_voices(dataset))
+
+
+# Singleton instance, filled on import when the store has been built
+speaker_embedding_store = SpeakerEmbeddingStore()
+try:
+    speaker_embedding_store.load()
+except (OSError, ValueError) as e:
+    logger.warning(f"Could not load speaker embeddings from {DEFAULT_VOICES_DIR}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the TTS speaker embeddings into a compact .npy store")
+    parser.add_argument("--voices-dir", default=DEFAULT_VOICES_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    store = SpeakerEmbeddingStore(args.voices_dir)
+    build_from_dataset(store)
+    print(f"Speaker embedding store ready: {', '.join(store.names())} in {args.voices_dir}")
+
+
+if __name__ == "__main__":
+    main()
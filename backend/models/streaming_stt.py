@@ -0,0 +1,93 @@
+import numpy as np
+from typing import List, Optional
+from models.audio import SAMPLE_RATE
+
+
+def _common_prefix(a: List[str], b: List[str]) -> List[str]:
+    prefix = []
+    for left, right in zip(a, b):
+        if left != right:
+            break
+        prefix.append(left)
+    return prefix
+
+
+class StreamingTranscriber:
+    """
+    Rolling audio buffer for incremental transcription.
+
+    Audio is appended as it arrives; every step_s of new audio the caller decodes
+    the current window and passes the text to update(). Words on which two
+    consecutive hypotheses agree are reported as stable. Once the window reaches
+    window_s its latest hypothesis is committed as a final segment and the buffer
+    starts over, so decode cost stays bounded however long the stream runs.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, window_s: float = 8.0,
+                 step_s: float = 1.0, min_audio_s: float = 0.5):
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_s * sample_rate)
+        self.step_samples = int(step_s * sample_rate)
+        self.min_samples = int(min_audio_s * sample_rate)
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.total_samples = 0 # everything received so far, including committed windows
+        self.samples_since_decode = 0
+
+        self.committed: List[str] = [] # words of finished windows
+        self.previous: List[str] = [] # last hypothesis for the current window
+        self.stable: List[str] = [] # agreed prefix of the current window
+
+    def add_audio(self, samples: np.ndarray):
+        if len(samples) == 0:
+            return
+        self.buffer = np.concatenate([self.buffer, samples.astype(np.float32)])
+        self.total_samples += len(samples)
+        self.samples_since_decode += len(samples)
+
+    def should_decode(self) -> bool:
+        """True when enough new audio arrived since the last decode (or the window is full)"""
+        if len(self.buffer) < self.min_samples:
+            return False
+        return self.samples_since_decode >= self.step_samples or len(self.buffer) >= self.window_samples
+
+    def window(self) -> np.ndarray:
+        return self.buffer
+
+    def update(self, text: str) -> dict:
+        """
+        Records the hypothesis for the current window.
+        Returns the full text so far, its stable part and, when the window was
+        full, the final text of the segment that was just committed.
+        """
+        words = text.split()
+        self.stable = _common_prefix(self.previous, words)
+        self.previous = words
+        self.samples_since_decode = 0
+
+        update = {
+            "text": " ".join(self.committed + words),
+            "stable_text": " ".join(self.committed + self.stable),
+            "final": None,
+        }
+
+        if len(self.buffer) >= self.window_samples:
+            self.committed += words
+            update["final"] = " ".join(words)
+            update["stable_text"] = update["text"]
+            self._reset_window()
+
+        return update
+
+    def finish(self, text: Optional[str] = None) -> str:
+        """Commits the last hypothesis for the remaining audio and returns the full transcript"""
+        words = text.split() if text is not None else self.previous
+        self.committed += words
+        self._reset_window()
+        return " ".join(self.committed)
+
+    def _reset_window(self):
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.samples_since_decode = 0
+        self.previous = []
+        self.stable = []
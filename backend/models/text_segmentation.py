@@ -0,0 +1,57 @@
+import re
+from typing import List
+
+# Sentence ends (Latin and CJK), kept with the preceding text
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？…])\s*")
+# Clause boundaries used to split sentences that are still too long
+_CLAUSE_END = re.compile(r"(?<=[,;:、，；：])\s*")
+
+
+def _pack(pieces: List[str], max_chars: int) -> List[str]:
+    """Greedily joins consecutive pieces while they fit in max_chars"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}".strip() if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text_for_tts(text: str, max_chars: int = 200, first_max_chars: int = 60,
+                       first_min_chars: int = 20) -> List[str]:
+    """
+    Splits text into sentence- or clause-sized chunks for incremental synthesis.
+    The first chunk is kept short so the first audio is ready quickly; long
+    sentences are split at clause boundaries, then at word boundaries.
+    """
+    pieces = []
+    for sentence in filter(None, (s.strip() for s in _SENTENCE_END.split(text))):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in filter(None, (c.strip() for c in _CLAUSE_END.split(sentence))):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+            else:
+                pieces.extend(_pack(clause.split(), max_chars))
+
+    if not pieces:
+        return []
+
+    # Break the opening sentence at a clause if that gets audio out sooner,
+    # but not into a fragment too short to sound natural
+    first = pieces[0]
+    if len(first) > first_max_chars:
+        clauses = [c.strip() for c in _CLAUSE_END.split(first) if c.strip()]
+        head = clauses.pop(0) if clauses else first
+        while clauses and len(head) < first_min_chars and len(head) + 1 + len(clauses[0]) <= first_max_chars:
+            head = f"{head} {clauses.pop(0)}"
+        if clauses:
+            pieces = [head] + _pack(clauses, max_chars) + pieces[1:]
+
+    return [pieces[0]] + _pack(pieces[1:], max_chars)
@@ -0,0 +1,214 @@
+"""
+Tiny random-weight stand-ins for the Whisper, SpeechT5 + HiFiGAN and sentence
+encoder models, so tests and benchmarks run offline on CI-sized CPUs.
+
+With MODEL_PROFILE=tiny every loader reads from TINY_MODELS_DIR instead of the
+Hugging Face Hub, and each model is generated there on first use (or ahead of
+time with `python -m models.tiny_models`). The models have the same classes,
+processors and call paths as the real ones but output noise: timings measure
+the serving path, not model quality.
+"""
+import argparse
+import os
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# full: the Hugging Face models | tiny: random-weight stand-ins built locally
+MODEL_PROFILE = os.getenv("MODEL_PROFILE", "full").lower()
+TINY_MODELS_DIR = os.getenv("TINY_MODELS_DIR", "data/tiny_models")
+
+# Whisper control tokens the ASR pipeline and generation config look up by name
+WHISPER_SPECIAL_TOKENS = ("<|endoftext|>", "<|startoftranscript|>", "<|translate|>", "<|transcribe|>",
+                          "<|startoflm|>", "<|startofprev|>", "<|nocaptions|>", "<|notimestamps|>")
+
+_build_lock = threading.Lock()
+
+
+def use_tiny_models() -> bool:
+    return MODEL_PROFILE == "tiny"
+
+
+def model_source(name: str, default: str) -> str:
+    """Where a model loads from: the Hub id, or its tiny stand-in directory under MODEL_PROFILE=tiny"""
+    return os.path.join(TINY_MODELS_DIR, name) if use_tiny_models() else default
+
+
+def _printable_chars():
+    return [chr(c) for c in range(33, 127)]
+
+
+def build_whisper(path: str):
+    """Multilingual Whisper with a byte-level tokenizer (256 byte tokens, no merges) and a 2-layer, 64-wide model"""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+    from transformers import (GenerationConfig, WhisperConfig, WhisperFeatureExtractor,
+                              WhisperForConditionalGeneration, WhisperProcessor, WhisperTokenizerFast)
+    from transformers.models.whisper.tokenization_whisper import LANGUAGES
+
+    vocab = {ch: i for i, ch in enumerate(sorted(pre_tokenizers.ByteLevel.alphabet()))}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    end = WHISPER_SPECIAL_TOKENS[0]
+    tokenizer = WhisperTokenizerFast(tokenizer_object=backend, unk_token=end, bos_token=end, eos_token=end, pad_token=end)
+    language_tokens = [f"<|{code}|>" for code in LANGUAGES]
+    tokenizer.add_special_tokens({"additional_special_tokens": list(WHISPER_SPECIAL_TOKENS[1:]) + language_tokens})
+    ids = {token: tokenizer.convert_tokens_to_ids(token) for token in WHISPER_SPECIAL_TOKENS + tuple(language_tokens)}
+
+    special = {
+        "decoder_start_token_id": ids["<|startoftranscript|>"],
+        "eos_token_id": ids[end],
+        "pad_token_id": ids[end],
+        "bos_token_id": ids[end],
+    }
+    torch.manual_seed(0)
+    model = WhisperForConditionalGeneration(WhisperConfig(
+        vocab_size=len(tokenizer), d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_source_positions=1500, max_target_positions=448, suppress_tokens=[], begin_suppress_tokens=[], **special
+    ))
+    model.generation_config = GenerationConfig(
+        # Greedy, as the pipeline would otherwise fall back to beam search
+        no_timestamps_token_id=ids["<|notimestamps|>"], max_length=448, num_beams=1, is_multilingual=True,
+        lang_to_id={token: ids[token] for token in language_tokens},
+        task_to_id={"transcribe": ids["<|transcribe|>"], "translate": ids["<|translate|>"]}, **special
+    )
+    model.save_pretrained(path)
+    WhisperProcessor(feature_extractor=WhisperFeatureExtractor(), tokenizer=tokenizer).save_pretrained(path)
+
+
+def build_speecht5(path: str):
+    """SpeechT5 text-to-speech with a character tokenizer (no sentencepiece needed) and a 1-layer, 64-wide model"""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import (PreTrainedTokenizerFast, SpeechT5Config, SpeechT5FeatureExtractor,
+                              SpeechT5ForTextToSpeech, SpeechT5Processor)
+
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3, " ": 4}
+    for ch in _printable_chars():
+        vocab[ch] = len(vocab)
+    backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split("", "isolated")
+    backend.post_processor = processors.TemplateProcessing(single="$A </s>", special_tokens=[("</s>", 2)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, bos_token="<s>", eos_token="</s>",
+                                        pad_token="<pad>", unk_token="<unk>")
+
+    torch.manual_seed(0)
+    model = SpeechT5ForTextToSpeech(SpeechT5Config(
+        vocab_size=len(vocab), hidden_size=64, encoder_layers=1, decoder_layers=1,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        speech_decoder_prenet_units=64, speech_decoder_postnet_units=64, speech_decoder_postnet_layers=2,
+        pad_token_id=1, bos_token_id=0, eos_token_id=2, decoder_start_token_id=2
+    ))
+    model.save_pretrained(path)
+    SpeechT5Processor(feature_extractor=SpeechT5FeatureExtractor(), tokenizer=tokenizer).save_pretrained(path)
+
+
+def build_hifigan(path: str):
+    """HiFiGAN vocoder with 32 initial channels instead of 512"""
+    import torch
+    from transformers import SpeechT5HifiGan, SpeechT5HifiGanConfig
+
+    torch.manual_seed(0)
+    SpeechT5HifiGan(SpeechT5HifiGanConfig(upsample_initial_channel=32)).save_pretrained(path)
+
+
+def build_sentence_encoder(path: str):
+    """
+    1-layer, 32-wide BERT with a character WordPiece vocabulary (characters outside
+    it map to [UNK]), mean-pooled and normalized like all-MiniLM-L6-v2.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+    try:
+        from sentence_transformers.sentence_transformer.modules import Normalize, Pooling, Transformer
+    except ImportError: # sentence-transformers < 6
+        from sentence_transformers.models import Normalize, Pooling, Transformer
+
+    vocab = {token: i for i, token in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"])}
+    for ch in _printable_chars():
+        vocab[ch] = len(vocab)
+        vocab[f"##{ch}"] = len(vocab)
+    backend = Tokenizer(models.WordPiece(vocab=vocab, unk_token="[UNK]", max_input_chars_per_word=100))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])]
+    )
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="[UNK]", pad_token="[PAD]",
+                                        cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]", model_max_length=128)
+
+    torch.manual_seed(0)
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=1, num_attention_heads=2,
+                         intermediate_size=64, max_position_embeddings=128)).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    # Unit-length embeddings, so search scores are cosine similarities as with the real encoder
+    SentenceTransformer(modules=[Transformer(path, max_seq_length=128), Pooling(32, "mean"), Normalize()],
+                        device="cpu").save(path)
+
+
+TINY_BUILDERS = {
+    "whisper": build_whisper,
+    "speecht5_tts": build_speecht5,
+    "speecht5_hifigan": build_hifigan,
+    "sentence_encoder": build_sentence_encoder,
+}
+
+
+def ensure_tiny_model(source: str, models_dir: str = None) -> str:
+    """
+    Builds a tiny model the first time its directory is loaded from. Any other
+    source (a Hub id, a real local model) is returned unchanged.
+    """
+    name = os.path.basename(os.path.normpath(source))
+    models_dir = os.path.normpath(models_dir or TINY_MODELS_DIR)
+    if name not in TINY_BUILDERS or os.path.dirname(os.path.normpath(source)) != models_dir:
+        return source
+
+    with _build_lock:
+        if not os.path.exists(os.path.join(source, "config.json")):
+            logger.info(f"Building tiny random-weight model '{name}' in {source}")
+            # Built next to the target and renamed, so a crash never leaves a half-written model
+            tmp_path = f"{source}.tmp"
+            TINY_BUILDERS[name](tmp_path)
+            os.replace(tmp_path, source)
+    return source
+
+
+def build_tiny_voices(store, dim: int = 512):
+    """Fills a speaker embedding store with random x-vectors under the real voice names"""
+    from models.speaker_embeddings import ARCTIC_SPEAKERS
+
+    rng = np.random.default_rng(0)
+    voices = {}
+    for name in ("default",) + ARCTIC_SPEAKERS:
+        vector = rng.standard_normal(dim)
+        voices[name] = (vector / np.linalg.norm(vector)).astype(np.float32)
+    store.save(voices, source="random")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the tiny random-weight models ahead of time (e.g. in a CI cache step)")
+    parser.add_argument("--models-dir", default=TINY_MODELS_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    for name in TINY_BUILDERS:
+        ensure_tiny_model(os.path.join(args.models_dir, name), args.models_dir)
+
+    from models.speaker_embeddings import SpeakerEmbeddingStore
+    store = SpeakerEmbeddingStore(os.path.join(args.models_dir, "voices"))
+    if not store.load():
+        build_tiny_voices(store)
+    print(f"Tiny models ready in {args.models_dir}: {', '.join(TINY_BUILDERS)}, voices")
+
+
+if __name__ == "__main__":
+    main()
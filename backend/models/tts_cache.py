@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import logging
+from typing import Iterable, Optional
+from models.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class TTSAudioCache:
+    """
+    Content-addressed cache of synthesized WAV audio.
+
+    Entries are keyed by a hash of (text, voice, model version). A bounded
+    in-memory LRU sits in front of an on-disk tier that evicts the least
+    recently used files once it grows past disk_max_bytes. Eviction runs in a
+    background thread so the put() that crosses the budget does not wait for it.
+    Every method does blocking file I/O: call them off the event loop.
+    """
+
+    def __init__(self, cache_dir: str = "data/tts_cache", memory_items: int = 256,
+                 disk_max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.memory = LRUCache(memory_items)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+        self._evictor: Optional[threading.Thread] = None
+        self._disk_bytes = self._scan_disk_bytes()
+
+    @staticmethod
+    def key(text: str, voice: str, model_version: str) -> str:
+        payload = json.dumps([text.strip(), voice, model_version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.wav")
+
+    def _scan_disk_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".wav"):
+                    total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Touch so disk eviction sees it as recently used
+            os.utime(path)
+        except OSError:
+            self.disk_misses += 1
+            return None
+
+        self.disk_hits += 1
+        self.memory.set(key, data)
+        return data
+
+    def contains(self, key: str) -> bool:
+        return key in self.memory or os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes):
+        self.memory.set(key, data)
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            existed = os.path.exists(path)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write TTS cache entry {key}: {e}")
+            return
+
+        if not existed:
+            with self._lock:
+                self._disk_bytes += len(data)
+                if self._disk_bytes <= self.disk_max_bytes or (self._evictor and self._evictor.is_alive()):
+                    return
+                self._evictor = threading.Thread(target=self._evict_disk, name="tts-cache-evict", daemon=True)
+                self._evictor.start()
+
+    def wait_for_eviction(self, timeout: Optional[float] = None):
+        """Blocks until a running eviction has finished"""
+        evictor = self._evictor
+        if evictor is not None:
+            evictor.join(timeout)
+
+    def _evict_disk(self):
+        """Deletes least recently used files until the tier is back under 90% of its budget"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".wav"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.disk_max_bytes * 0.9)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total - removed <= target:
+                break
+            try:
+                os.unlink(path)
+                removed += size
+            except OSError:
+                pass
+
+        # Files written during the scan were counted by their put()
+        with self._lock:
+            self._disk_bytes = max(0, self._disk_bytes - removed)
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+        }
+
+
+def prewarm(texts: Iterable[str], synthesize_wav, cache: TTSAudioCache, voice: str, model_version: str) -> int:
+    """Synthesizes and caches every text that is not cached yet, returns how many were generated"""
+    generated = 0
+    for text in dict.fromkeys(t.strip() for t in texts if t and t.strip()):
+        key = cache.key(text, voice, model_version)
+        if cache.contains(key):
+            continue
+        cache.put(key, synthesize_wav(text))
+        generated += 1
+        logger.info(f"Pre-warmed TTS for: {text[:50]}")
+    return generated
+
+
+# Singleton instance
+tts_audio_cache = TTSAudioCache(
+    cache_dir=os.getenv("TTS_CACHE_DIR", "data/tts_cache"),
+    memory_items=int(os.getenv("TTS_CACHE_MEMORY_ITEMS", "256")),
+    disk_max_bytes=int(os.getenv("TTS_CACHE_DISK_MAX_MB", "512")) * 1024 * 1024
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the TTS audio cache with every song line")
+    parser.add_argument("--data-path", default="data/songs.json", help="Songs JSON file")
+    parser.add_argument("--text", action="append", default=[], help="Extra text to synthesize (repeatable)")
+    parser.add_argument("--voice", action="append", default=[], help="Voice to pre-warm (repeatable, default voice if omitted)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from models.tts_model import DEFAULT_VOICE, MODEL_VERSION
+    from models.registry import model_registry
+    tts_model = model_registry.get("tts", wait=True)
+
+    with open(args.data_path, 'r') as f:
+        songs = json.load(f)
+    texts = [line for song in songs for line in song['lyrics']] + args.text
+
+    generated = 0
+    for voice in args.voice or [DEFAULT_VOICE]:
+        synthesize_wav = lambda text: tts_model.synthesize_wav(text, voice)
+        generated += prewarm(texts, synthesize_wav, tts_audio_cache, voice, MODEL_VERSION)
+    print(f"TTS cache pre-warmed: {generated} new clips, {len(texts)} texts checked")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,184 @@
 import torch
 from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
-from datasets import load_dataset
 import soundfile as sf
 import numpy as np
-from typing import Optional
+import os
+from typing import List, Optional
+from models.audio import encode_wav
+from models.speaker_embeddings import speaker_embedding_store, build_from_dataset
+from models.tiny_models import build_tiny_voices, ensure_tiny_model, model_source, use_tiny_models
+from models.batching import AsyncBatcher
+from models.metrics import stage
+from models.registry import model_registry
+from models.inference_backend import (
+    configure_torch_threads, module_bytes, pretrained_load_lock, resolve_backend, quantize_int8, compile_module, OnnxVocoder
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+TTS_MODEL_ID = model_source("speecht5_tts", "microsoft/speecht5_tts")
+VOCODER_MODEL_ID = model_source("speecht5_hifigan", "microsoft/speecht5_hifigan")
+DEFAULT_VOICE = "default"
+TTS_INFERENCE_BACKEND = os.getenv("TTS_INFERENCE_BACKEND", "eager").lower()
+
+def model_version(backend: str) -> str:
+    # int8 weights change the audio slightly, the other backends match eager
+    suffix = "+int8" if backend == "int8" else ""
+    return f"{TTS_MODEL_ID}+{VOCODER_MODEL_ID}{suffix}"
+
+# Part of the audio cache key, so cached clips are dropped when the models change.
+# Module level so cache hits can be served while the model is still loading.
+MODEL_VERSION = model_version(TTS_INFERENCE_BACKEND)
+
 class TTSModel:
-    _instance: Optional['TTSModel'] = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
-    
-    def __init__(self):
-        if self._initialized:
-            return
-            
+    def __init__(self, backend: Optional[str] = None):
+        """backend: eager | int8 | compile | onnx, defaults to TTS_INFERENCE_BACKEND"""
         logger.info("Loading TTS model...")
+        configure_torch_threads()
         
         device = "cuda" if torch.cuda.is_available() else "cpu"
         
         # Load SpeechT5 model
-        self.processor = SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
-        self.model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
-        self.vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
+        with pretrained_load_lock:
+            tts_model_id = ensure_tiny_model(TTS_MODEL_ID)
+            self.processor = SpeechT5Processor.from_pretrained(tts_model_id)
+            self.model = SpeechT5ForTextToSpeech.from_pretrained(tts_model_id)
+            self.vocoder = SpeechT5HifiGan.from_pretrained(ensure_tiny_model(VOCODER_MODEL_ID))
         
         self.model.to(device)
         self.vocoder.to(device)
+        self.model.eval()
+        self.vocoder.eval()
+
+        # The autoregressive decoder (Linear heavy) is quantized; the HiFiGAN
+        # vocoder has fixed structure, so it is what gets compiled or exported
+        self.backend = resolve_backend(backend or TTS_INFERENCE_BACKEND, device)
+        self.model_version = model_version(self.backend)
+        if self.backend == "int8":
+            self.model = quantize_int8(self.model)
+        elif self.backend == "compile":
+            self.vocoder = compile_module(self.vocoder)
+        elif self.backend == "onnx":
+            self.vocoder = OnnxVocoder(self.vocoder, VOCODER_MODEL_ID)
         
-        # Load speaker embeddings
-        embeddings_dataset = load_dataset("Matthijs/cmu-arctic-xvectors", split="validation")
-        self.speaker_embeddings = torch.tensor(embeddings_dataset[7306]["xvector"]).unsqueeze(0)
-        self.speaker_embeddings = self.speaker_embeddings.to(device)
+        # Speaker x-vectors come from the precomputed .npy store
+        self.voices = speaker_embedding_store
+        if not self.voices.voices and use_tiny_models():
+            build_tiny_voices(self.voices)
+        elif not self.voices.voices:
+            logger.warning("Speaker embedding store not found, extracting it once from the x-vector dataset "
+                           "(run `python -m models.speaker_embeddings` at build time to skip this)")
+            build_from_dataset(self.voices)
+        self._voice_tensors = {} # voice -> (1, dim) tensor on device
         
         self.device = device
-        self._initialized = True
-        logger.info(f"TTS model loaded successfully on {device}")
+        logger.info(f"TTS model loaded successfully on {device} ({self.backend} backend)")
     
-    def synthesize(self, text: str, output_path: str) -> str:
-        """Synthesize speech from text and save to file"""
+    def memory_bytes(self) -> int:
+        """Bytes of SpeechT5 and vocoder weights (quantized or exported parts are not counted)"""
+        return module_bytes(self.model, self.vocoder)
+
+    def speaker_embedding(self, voice: str = DEFAULT_VOICE) -> torch.Tensor:
+        """The voice's x-vector as a (1, dim) device tensor, copied to the device once per voice"""
+        tensor = self._voice_tensors.get(voice)
+        if tensor is None:
+            tensor = torch.from_numpy(self.voices.get(voice)).unsqueeze(0).to(self.device)
+            self._voice_tensors[voice] = tensor
+        return tensor
+
+    def generate(self, text: str, voice: str = DEFAULT_VOICE) -> np.ndarray:
+        """Synthesize speech from text as a 16 kHz float32 array"""
         inputs = self.processor(text=text, return_tensors="pt")
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
         
+        # The vocoder runs separately (as generate_speech would) so both stages are timed
         with torch.no_grad():
-            speech = self.model.generate_speech(
-                inputs["input_ids"],
-                self.speaker_embeddings,
-                vocoder=self.vocoder
-            )
-        
-        # Convert to numpy and save
-        speech_np = speech.cpu().numpy()
-        sf.write(output_path, speech_np, samplerate=16000)
+            with stage("speecht5_generate"):
+                spectrogram = self.model.generate_speech(inputs["input_ids"], self.speaker_embedding(voice))
+            with stage("vocoder"):
+                speech = self.vocoder(spectrogram)
         
+        return speech.cpu().numpy()
+
+    def synthesize(self, text: str, output_path: str, voice: str = DEFAULT_VOICE) -> str:
+        """Synthesize speech from text and save to file"""
+        sf.write(output_path, self.generate(text, voice), samplerate=16000)
         return output_path
 
-# Singleton instance
-tts_model = TTSModel()
+    def synthesize_wav(self, text: str, voice: str = DEFAULT_VOICE) -> bytes:
+        """Synthesize speech from text as in-memory WAV bytes"""
+        return encode_wav(self.generate(text, voice))
+
+    def generate_batch(self, items: List) -> List:
+        """
+        Synthesize several texts with padded SpeechT5 + HiFiGAN forward passes.
+        Items are texts or (text, voice) pairs; voices can be mixed in a batch.
+        Generation runs until the longest clip in a batch stops, so texts are
+        grouped with others of similar length first. A group that fails is
+        retried one text at a time so one bad input only fails its own request.
+        """
+        texts = [item if isinstance(item, str) else item[0] for item in items]
+        voices = [DEFAULT_VOICE if isinstance(item, str) else item[1] for item in items]
+        outputs = [None] * len(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        groups = []
+        for i in order:
+            if groups and len(texts[i]) <= 2 * max(len(texts[groups[-1][0]]), 1):
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+
+        for positions in groups:
+            try:
+                speeches = self._generate_padded([texts[i] for i in positions], [voices[i] for i in positions])
+                for i, speech in zip(positions, speeches):
+                    outputs[i] = speech
+            except Exception as e:
+                logger.warning(f"Batched synthesis of {len(positions)} texts failed, retrying one by one: {e}")
+                for i in positions:
+                    try:
+                        outputs[i] = self.generate(texts[i], voices[i])
+                    except Exception as item_error:
+                        outputs[i] = item_error
+
+        return outputs
+
+    def _generate_padded(self, texts: List[str], voices: List[str]) -> List[np.ndarray]:
+        if len(texts) == 1:
+            return [self.generate(texts[0], voices[0])]
+
+        inputs = self.processor(text=texts, padding=True, return_tensors="pt")
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            with stage("speecht5_generate"):
+                spectrograms, spectrogram_lengths = self.model.generate_speech(
+                    inputs["input_ids"],
+                    torch.cat([self.speaker_embedding(voice) for voice in voices]),
+                    attention_mask=inputs["attention_mask"],
+                    return_output_lengths=True
+                )
+            with stage("vocoder"):
+                waveforms = self.vocoder(spectrograms)
+
+        # Samples per spectrogram frame, as generate_speech computes the waveform lengths
+        hop = int(waveforms.size(1) / max(spectrogram_lengths))
+        waveforms = waveforms.cpu().numpy()
+        return [waveforms[i, :hop * int(length)] for i, length in enumerate(spectrogram_lengths)]
+
+def _generate_batch(items: List) -> List:
+    return model_registry.get("tts").generate_batch(items)
+
+# Groups concurrent synthesis requests into shared forward passes.
+# The model itself is loaded by the registry (models/registry.py).
+tts_batcher = AsyncBatcher(
+    _generate_batch,
+    max_batch_size=int(os.getenv("TTS_BATCH_MAX_SIZE", "8")),
+    max_wait_ms=float(os.getenv("TTS_BATCH_MAX_WAIT_MS", "10")),
+    workers=int(os.getenv("TTS_WORKERS", "1")),
+    max_queue_size=int(os.getenv("TTS_QUEUE_MAX_SIZE", "64")),
+    timeout_s=float(os.getenv("TTS_TIMEOUT_S", "60")),
+    name="tts_batcher"
+)
@@ -0,0 +1,143 @@
+import os
+from dataclasses import dataclass
+import numpy as np
+from models.audio import SAMPLE_RATE
+from models.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+vad_audio_seconds = metrics.counter(
+    "stt_vad_audio_seconds_total", "Uploaded audio seen by the VAD (input) and cut before Whisper (removed)", ("kind",)
+)
+vad_rejected = metrics.counter("stt_vad_rejected_total", "Uploads answered with an empty transcript for lack of speech")
+
+
+@dataclass
+class VADResult:
+    audio: np.ndarray # speech with padding, long pauses shortened; empty when rejected
+    input_s: float
+    kept_s: float
+
+    @property
+    def has_speech(self) -> bool:
+        return len(self.audio) > 0
+
+    @property
+    def removed_s(self) -> float:
+        return self.input_s - self.kept_s
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detection in front of Whisper.
+
+    A 30 ms frame is voiced when its RMS level is above a threshold derived from
+    the clip itself: a margin over the noise floor (10th percentile of frame
+    levels), but never more than the same margin under the loud frames (99th
+    percentile), so a clip with no pauses stays whole. A clip whose loud frames
+    are less than min_contrast_db above its noise floor is steady noise or hum
+    and has no voiced frames.
+
+    Frames below min_db are not voiced either, unless the loud frames are
+    themselves within the margin of min_db: a quiet speaker is lowered to, not
+    cut by, the floor. Loud frames more than the margin under min_db are silence.
+
+    Voiced regions are padded by padding_s; leading and trailing silence is cut
+    and pauses longer than max_pause_s are shortened to it. Clips with less than
+    min_speech_s of voiced frames are rejected.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: float = 30.0, min_db: float = -40.0,
+                 margin_db: float = 12.0, min_contrast_db: float = 10.0, padding_s: float = 0.2, max_pause_s: float = 0.6,
+                 min_speech_s: float = 0.2):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.min_db = min_db
+        self.margin_db = margin_db
+        self.min_contrast_db = min_contrast_db
+        self.padding_frames = int(round(padding_s * sample_rate / self.frame))
+        self.max_pause_frames = max(1, int(round(max_pause_s * sample_rate / self.frame)))
+        self.min_speech_frames = int(round(min_speech_s * sample_rate / self.frame))
+
+        self.clips = 0
+        self.rejected = 0
+        self.input_s = 0.0
+        self.removed_s = 0.0
+
+    def frame_levels(self, audio: np.ndarray) -> np.ndarray:
+        """RMS level in dBFS of every frame (a trailing partial frame counts as one)"""
+        padded = np.pad(audio, (0, -len(audio) % self.frame))
+        frames = padded.reshape(-1, self.frame).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return 20 * np.log10(rms + 1e-10)
+
+    def voiced_frames(self, audio: np.ndarray) -> np.ndarray:
+        levels = self.frame_levels(audio)
+        noise_db, loud_db = np.percentile(levels, [10, 99])
+        if loud_db - noise_db < self.min_contrast_db or loud_db < self.min_db - self.margin_db:
+            return np.zeros(len(levels), dtype=bool)
+        floor = min(self.min_db, loud_db - self.margin_db)
+        threshold = max(floor, min(noise_db + self.margin_db, loud_db - self.margin_db))
+        return levels > threshold
+
+    def keep_mask(self, voiced: np.ndarray) -> np.ndarray:
+        """Frames to keep: padded speech and at most max_pause_frames of every inner pause"""
+        if self.padding_frames:
+            kernel = np.ones(2 * self.padding_frames + 1)
+            keep = np.convolve(voiced, kernel, mode="same") > 0
+        else:
+            keep = voiced.copy()
+
+        # Runs of dropped frames: leading and trailing ones go, inner ones are shortened
+        edges = np.flatnonzero(np.diff(np.concatenate([[1], keep.astype(np.int8), [1]])))
+        for start, end in zip(edges[::2], edges[1::2]):
+            if start == 0 or end == len(keep):
+                continue
+            head = self.max_pause_frames // 2
+            keep[start:start + head] = True
+            keep[max(start + head, end - (self.max_pause_frames - head)):end] = True
+        return keep
+
+    def trim(self, audio: np.ndarray) -> VADResult:
+        """The speech of a 16 kHz clip, with its removed duration recorded"""
+        input_s = len(audio) / self.sample_rate
+        voiced = self.voiced_frames(audio) if len(audio) else np.zeros(0, dtype=bool)
+
+        if voiced.sum() < max(1, self.min_speech_frames):
+            result = VADResult(np.zeros(0, dtype=np.float32), input_s, 0.0)
+        else:
+            samples = np.repeat(self.keep_mask(voiced), self.frame)[:len(audio)]
+            speech = audio[samples]
+            result = VADResult(speech, input_s, len(speech) / self.sample_rate)
+
+        self.clips += 1
+        self.input_s += result.input_s
+        self.removed_s += result.removed_s
+        vad_audio_seconds.inc("input", amount=result.input_s)
+        vad_audio_seconds.inc("removed", amount=result.removed_s)
+        if not result.has_speech:
+            self.rejected += 1
+            vad_rejected.inc()
+        return result
+
+    def stats(self):
+        return {
+            "clips": self.clips,
+            "rejected": self.rejected,
+            "input_s": round(self.input_s, 3),
+            "removed_s": round(self.removed_s, 3),
+            "removed_ratio": self.removed_s / self.input_s if self.input_s else 0.0,
+        }
+
+
+# Singleton instance
+VAD_ENABLED = os.getenv("STT_VAD", "1").lower() not in ("0", "false", "no")
+vad = EnergyVAD(
+    min_db=float(os.getenv("STT_VAD_MIN_DB", "-40")),
+    margin_db=float(os.getenv("STT_VAD_MARGIN_DB", "12")),
+    min_contrast_db=float(os.getenv("STT_VAD_MIN_CONTRAST_DB", "10")),
+    padding_s=float(os.getenv("STT_VAD_PADDING_S", "0.2")),
+    max_pause_s=float(os.getenv("STT_VAD_MAX_PAUSE_S", "0.6")),
+    min_speech_s=float(os.getenv("STT_VAD_MIN_SPEECH_S", "0.2"))
+)
@@ -0,0 +1,206 @@
+import copy
+import os
+import logging
+import numpy as np
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (scores, positions) of the k best entries of a 1-D score array, best first"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(scores.shape[0])
+    order = np.argsort(-scores[positions], kind="stable")
+    positions = positions[order]
+    return scores[positions], positions
+
+
+def _pad(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pads a result row to length k with -inf scores and -1 ids"""
+    out_scores = np.full(k, -np.inf, dtype=np.float32)
+    out_ids = np.full(k, -1, dtype=np.int64)
+    out_scores[:len(scores)] = scores
+    out_ids[:len(ids)] = ids
+    return out_scores, out_ids
+
+
+class ExactIndex:
+    """Brute-force inner-product search over the whole matrix (exact results)"""
+
+    name = "exact"
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def extend(self, embeddings: np.ndarray) -> "ExactIndex":
+        """Index over embeddings, whose first len(self) rows are the current ones"""
+        return ExactIndex(embeddings)
+
+    def select(self, rows: np.ndarray, embeddings: np.ndarray) -> "ExactIndex":
+        """Index over embeddings == current embeddings[rows] (compaction)"""
+        return ExactIndex(embeddings)
+
+    def search(self, queries: np.ndarray, k: int = 1, mask: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None):
+        """
+        Scores every query against the allowed rows in one matrix multiply.
+        queries is (n, dim); mask is an optional boolean pre-filter over rows.
+        Returns (scores, ids), both (n, k), padded with -inf / -1. nprobe is ignored.
+        """
+        queries = np.atleast_2d(queries)
+        if mask is None:
+            candidate_ids = None
+            matrix = self.embeddings
+        else:
+            candidate_ids = np.flatnonzero(mask)
+            matrix = self.embeddings[candidate_ids]
+
+        all_scores = np.dot(queries, matrix.T)
+
+        out_scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        out_ids = np.empty((queries.shape[0], k), dtype=np.int64)
+        for q, row_scores in enumerate(all_scores):
+            scores, positions = _top_k(row_scores, k)
+            ids = positions if candidate_ids is None else candidate_ids[positions]
+            out_scores[q], out_ids[q] = _pad(scores, ids, k)
+
+        return out_scores, out_ids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index: rows are clustered with spherical k-means and a query
+    only scores the rows of its nprobe closest clusters.
+
+    nlist and nprobe trade recall for latency. Filters that leave at most
+    exact_filter_threshold rows (e.g. a single song) are scored exactly instead.
+    """
+
+    name = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+                 train_iterations: int = 10, train_sample: int = 100_000,
+                 exact_filter_threshold: int = 2048, seed: int = 0):
+        self.embeddings = embeddings
+        n_rows = embeddings.shape[0]
+        self.nlist = max(1, min(nlist or int(4 * np.sqrt(n_rows)), n_rows))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+        self.exact_filter_threshold = exact_filter_threshold
+        self._exact = ExactIndex(embeddings)
+
+        self.centroids = self._train(train_iterations, train_sample, seed)
+        self._build_lists(self._assign(self.embeddings))
+
+        logger.info(f"Built IVF index: {n_rows} rows, nlist={self.nlist}, nprobe={self.nprobe}")
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def _build_lists(self, assignments: np.ndarray):
+        """Row ids grouped per cluster, as one sorted array plus offsets"""
+        self._assignments = assignments
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self._list_rows = order.astype(np.int64)
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _with_rows(self, embeddings: np.ndarray, assignments: np.ndarray) -> "IVFIndex":
+        index = copy.copy(self)
+        index.embeddings = embeddings
+        index._exact = ExactIndex(embeddings)
+        index._build_lists(assignments)
+        return index
+
+    def extend(self, embeddings: np.ndarray) -> "IVFIndex":
+        """
+        New index over embeddings, whose first len(self) rows are the current ones.
+        Only the appended rows are assigned; the centroids are not retrained.
+        """
+        added = self._assign(embeddings[len(self):])
+        return self._with_rows(embeddings, np.concatenate([self._assignments, added]))
+
+    def select(self, rows: np.ndarray, embeddings: np.ndarray) -> "IVFIndex":
+        """New index over embeddings == current embeddings[rows], keeping the cluster assignments"""
+        return self._with_rows(embeddings, self._assignments[rows])
+
+    def _train(self, iterations: int, sample_size: int, seed: int) -> np.ndarray:
+        """Spherical k-means on a sample of the rows"""
+        rng = np.random.default_rng(seed)
+        n_rows = self.embeddings.shape[0]
+        sample_ids = rng.choice(n_rows, size=min(sample_size, n_rows), replace=False)
+        sample = np.asarray(self.embeddings[np.sort(sample_ids)], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample.shape[0], size=self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(np.dot(sample, centroids.T), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = np.bincount(assignments, minlength=self.nlist) == 0
+            # Re-seed empty clusters so every list stays useful
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        return centroids.astype(np.float32)
+
+    def _assign(self, rows: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignments = np.empty(rows.shape[0], dtype=np.int64)
+        for start in range(0, rows.shape[0], chunk_size):
+            chunk = np.asarray(rows[start:start + chunk_size], dtype=np.float32)
+            assignments[start:start + chunk_size] = np.argmax(np.dot(chunk, self.centroids.T), axis=1)
+        return assignments
+
+    def search(self, queries: np.ndarray, k: int = 1, mask: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None):
+        """Same contract as ExactIndex.search; nprobe overrides the index default per call"""
+        queries = np.atleast_2d(queries)
+        if mask is not None and np.count_nonzero(mask) <= self.exact_filter_threshold:
+            return self._exact.search(queries, k, mask)
+
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        centroid_scores = np.dot(queries, self.centroids.T)
+
+        out_scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        out_ids = np.empty((queries.shape[0], k), dtype=np.int64)
+        for q, query in enumerate(queries):
+            _, lists = _top_k(centroid_scores[q], nprobe)
+            candidate_ids = np.concatenate([
+                self._list_rows[self._list_offsets[c]:self._list_offsets[c + 1]] for c in lists
+            ])
+            if mask is not None:
+                candidate_ids = candidate_ids[mask[candidate_ids]]
+            candidate_ids.sort()
+
+            scores, positions = _top_k(np.dot(self.embeddings[candidate_ids], query), k)
+            out_scores[q], out_ids[q] = _pad(scores, candidate_ids[positions], k)
+
+        return out_scores, out_ids
+
+
+def build_vector_index(embeddings: np.ndarray, backend: Optional[str] = None, **params):
+    """
+    Creates the configured vector index.
+    Defaults come from LYRICS_VECTOR_INDEX (exact|ivf), LYRICS_IVF_NLIST and LYRICS_IVF_NPROBE.
+    """
+    backend = (backend or os.getenv("LYRICS_VECTOR_INDEX", "exact")).lower()
+
+    if backend == "exact":
+        return ExactIndex(embeddings)
+
+    if backend == "ivf":
+        if "nlist" not in params and os.getenv("LYRICS_IVF_NLIST"):
+            params["nlist"] = int(os.getenv("LYRICS_IVF_NLIST"))
+        if "nprobe" not in params and os.getenv("LYRICS_IVF_NPROBE"):
+            params["nprobe"] = int(os.getenv("LYRICS_IVF_NPROBE"))
+        return IVFIndex(embeddings, **params)
+
+    raise ValueError(f"Unknown vector index backend: {backend}")
@@ -1,39 +1,110 @@
+import os
+import numpy as np
 import torch
+import soundfile as sf
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-from typing import Optional
+from transformers.models.whisper.tokenization_whisper import LANGUAGES, TO_LANGUAGE_CODE
+from models.batching import AsyncBatcher
+from models.audio import SAMPLE_RATE
+from models.registry import model_registry
+from models.tiny_models import ensure_tiny_model, model_source
+from models.metrics import stage
+from models.inference_backend import (
+    configure_torch_threads, module_bytes, pretrained_load_lock, resolve_backend, quantize_int8, compile_module, OnnxWhisperEncoder
+)
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bounds (seconds) of the length groups that share a forward pass
+LENGTH_BUCKETS_S = (5, 10, 20, 30)
+
+def _pipeline_input(audio):
+    """
+    Accepts a 16 kHz float32 array, a {"raw", "sampling_rate"} dict or a file path.
+    The pipeline pops keys from dict inputs, so it always gets a fresh dict.
+    """
+    if isinstance(audio, np.ndarray):
+        return {"raw": audio, "sampling_rate": SAMPLE_RATE}
+    if isinstance(audio, dict):
+        return dict(audio)
+    return audio
+
+def _audio_duration(audio) -> float:
+    """Duration in seconds of an array, {"raw", "sampling_rate"} dict or file path, 0 if unknown"""
+    try:
+        if isinstance(audio, np.ndarray):
+            return len(audio) / SAMPLE_RATE
+        if isinstance(audio, dict):
+            return len(audio["raw"]) / audio["sampling_rate"]
+        return sf.info(audio).duration
+    except Exception:
+        return 0.0
+
+def _length_bucket(duration: float) -> int:
+    for i, limit in enumerate(LENGTH_BUCKETS_S):
+        if duration <= limit:
+            return i
+    return len(LENGTH_BUCKETS_S)
+
+def whisper_language(language: Optional[str]) -> Optional[str]:
+    """
+    Whisper's code for a BCP 47 tag (en-SG, zh-CN), a code (ja) or a name (japanese).
+    None means "detect"; an unknown language raises ValueError.
+    """
+    if not language:
+        return None
+    value = language.strip().lower().replace("_", "-")
+    if value in TO_LANGUAGE_CODE:
+        return TO_LANGUAGE_CODE[value]
+    code = value.split("-")[0]
+    if code in LANGUAGES:
+        return code
+    raise ValueError(f"Unsupported language: {language}")
+
+def _surface_forms(text: str) -> List[str]:
+    """Spellings Whisper would write for a candidate answer: as given and capitalized"""
+    forms = [text, text[:1].upper() + text[1:]]
+    return list(dict.fromkeys(forms))
+
+# Tokens that may end a one-word answer ("Doctor.", "医者。")
+ENDING_TEXTS = (".", "!", "?", "。", "！", "？")
+
+WHISPER_MODEL_ID = model_source("whisper", "openai/whisper-base")
+
 class WhisperModel:
-    _instance: Optional['WhisperModel'] = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
-    
-    def __init__(self):
-        if self._initialized:
-            return
-            
+    def __init__(self, backend: Optional[str] = None, model_id: Optional[str] = None):
+        """
+        backend: eager | int8 | compile | onnx, defaults to STT_INFERENCE_BACKEND
+        model_id: Hub id or local directory, defaults to WHISPER_MODEL_ID
+        """
         logger.info("Loading Whisper model...")
+        configure_torch_threads()
         
         device = "cuda:0" if torch.cuda.is_available() else "cpu"
         torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
         
-        model_id = "openai/whisper-base"
+        model_id = ensure_tiny_model(model_id or WHISPER_MODEL_ID)
         
-        model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id,
-            torch_dtype=torch_dtype,
-            low_cpu_mem_usage=True,
-            use_safetensors=True
-        )
+        with pretrained_load_lock:
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                model_id,
+                torch_dtype=torch_dtype,
+                low_cpu_mem_usage=True,
+                use_safetensors=True
+            )
+            processor = AutoProcessor.from_pretrained(model_id)
         model.to(device)
-        
-        processor = AutoProcessor.from_pretrained(model_id)
+        model.eval()
+
+        self.backend = resolve_backend(backend or os.getenv("STT_INFERENCE_BACKEND", "eager"), device)
+        if self.backend == "int8":
+            model = quantize_int8(model)
+        elif self.backend == "compile":
+            model.model.encoder = compile_module(model.model.encoder)
+        elif self.backend == "onnx":
+            model.model.encoder = OnnxWhisperEncoder(model.model.encoder, model_id)
         
         self.pipe = pipeline(
             "automatic-speech-recognition",
@@ -48,13 +119,175 @@ class WhisperModel:
             device=device,
         )
         
-        self._initialized = True
-        logger.info(f"Whisper model loaded successfully on {device}")
+        logger.info(f"Whisper model loaded successfully on {device} ({self.backend} backend)")
     
-    def transcribe(self, audio_path: str) -> str:
-        """Transcribe audio file to text"""
-        result = self.pipe(audio_path)
+    def memory_bytes(self) -> int:
+        """Bytes of model weights (quantized or exported parts are not counted)"""
+        return module_bytes(self.pipe.model)
+
+    @staticmethod
+    def _generate_kwargs(language: Optional[str]) -> dict:
+        # Without a language Whisper detects it from the audio, and may pick the wrong one
+        return {"language": language, "task": "transcribe"} if language else {}
+
+    def transcribe(self, audio, language: Optional[str] = None) -> str:
+        """Transcribe a 16 kHz float32 array (or an audio file path) to text, in `language` if given"""
+        with stage("whisper_forward"):
+            result = self.pipe(_pipeline_input(audio), generate_kwargs=self._generate_kwargs(language))
         return result["text"].strip()
 
-# Singleton instance
-whisper_model = WhisperModel()
+    def transcribe_batch(self, audio_inputs: List, languages: Optional[List[Optional[str]]] = None) -> List:
+        """
+        Transcribe several inputs, running each group of similar-length clips
+        in the same language through the pipeline as one batch. A group that
+        fails is retried one input at a time so a single bad upload only fails
+        its own request.
+        """
+        languages = languages or [None] * len(audio_inputs)
+        texts = [None] * len(audio_inputs)
+        groups = {}
+        for i, audio in enumerate(audio_inputs):
+            groups.setdefault((_length_bucket(_audio_duration(audio)), languages[i]), []).append(i)
+
+        for (_, language), positions in groups.items():
+            inputs = [_pipeline_input(audio_inputs[i]) for i in positions]
+            try:
+                with stage("whisper_forward"):
+                    results = self.pipe(inputs, batch_size=len(inputs), generate_kwargs=self._generate_kwargs(language))
+                for i, result in zip(positions, results):
+                    texts[i] = result["text"].strip()
+            except Exception as e:
+                logger.warning(f"Batched transcription of {len(inputs)} inputs failed, retrying one by one: {e}")
+                for i in positions:
+                    try:
+                        texts[i] = self.transcribe(audio_inputs[i], language)
+                    except Exception as item_error:
+                        texts[i] = item_error
+
+        return texts
+
+    def _decoder_prefix(self, language: str) -> List[int]:
+        tokenizer = self.pipe.tokenizer
+        return tokenizer.convert_tokens_to_ids(
+            ["<|startoftranscript|>", f"<|{language}|>", "<|transcribe|>", "<|notimestamps|>"]
+        )
+
+    def _ending_ids(self) -> List[int]:
+        """Ids of <|endoftext|> and of the punctuation marks that are single tokens"""
+        tokenizer = self.pipe.tokenizer
+        ids = [tokenizer.eos_token_id]
+        for text in ENDING_TEXTS:
+            tokens = tokenizer(text, add_special_tokens=False).input_ids
+            if len(tokens) == 1:
+                ids.append(tokens[0])
+        return list(dict.fromkeys(ids))
+
+    def score_candidates(self, audio: np.ndarray, candidates: List[str], language: str) -> List[dict]:
+        return self.score_candidates_batch([(audio, candidates, language)])[0]
+
+    @torch.no_grad()
+    def score_candidates_batch(self, requests: List[tuple]) -> List:
+        """
+        Scores the candidate answers of each (audio, candidates, language) request
+        without generating: the encoder runs once over every clip (only the first
+        30 s count), then each request's candidates are teacher-forced through the
+        decoder in one batch. A candidate's log-likelihood covers its tokens and
+        the end of the utterance (<|endoftext|> or a final punctuation mark),
+        summed over its spellings. Returns per request the candidates ranked by
+        log-likelihood, with their probability among the candidates.
+        """
+        model = self.pipe.model
+        tokenizer = self.pipe.tokenizer
+        endings = torch.tensor(self._ending_ids())
+
+        features = self.pipe.feature_extractor(
+            [audio for audio, _, _ in requests], sampling_rate=SAMPLE_RATE, return_tensors="pt"
+        ).input_features.to(model.device, model.dtype)
+        with stage("whisper_encoder"):
+            encoded = model.get_encoder()(features).last_hidden_state
+
+        results = []
+        for r, (_, candidates, language) in enumerate(requests):
+            prefix = self._decoder_prefix(language)
+            rows, owners = [], []
+            for c, text in enumerate(candidates):
+                for form in _surface_forms(text):
+                    rows.append(prefix + tokenizer(" " + form, add_special_tokens=False).input_ids)
+                    owners.append(c)
+
+            width = max(len(row) for row in rows)
+            ids = torch.full((len(rows), width), tokenizer.eos_token_id, dtype=torch.long)
+            mask = torch.zeros((len(rows), width), dtype=torch.long)
+            for i, row in enumerate(rows):
+                ids[i, :len(row)] = torch.tensor(row)
+                mask[i, :len(row)] = 1
+
+            with stage("whisper_score"):
+                # The clip's encoder states are shared by all rows, not copied
+                hidden = encoded[r:r + 1].expand(len(rows), -1, -1)
+                logits = model(encoder_outputs=(hidden,), decoder_input_ids=ids.to(model.device),
+                               decoder_attention_mask=mask.to(model.device)).logits.float().cpu()
+            log_probs = torch.log_softmax(logits, dim=-1)
+
+            form_scores = [[] for _ in candidates]
+            for i, row in enumerate(rows):
+                # Position t predicts token t + 1; the last position predicts the ending
+                positions = torch.arange(len(prefix) - 1, len(row) - 1)
+                tokens = log_probs[i, positions, ids[i, len(prefix):len(row)]].sum()
+                ending = torch.logsumexp(log_probs[i, len(row) - 1, endings], dim=0)
+                form_scores[owners[i]].append((tokens + ending, len(row) - len(prefix) + 1))
+
+            totals = torch.stack([torch.logsumexp(torch.stack([score for score, _ in scores]), dim=0)
+                                  for scores in form_scores])
+            probabilities = torch.softmax(totals, dim=0)
+            scored = [{
+                "text": text,
+                "log_likelihood": float(totals[c]),
+                "avg_log_prob": float(totals[c]) / min(length for _, length in form_scores[c]),
+                "probability": float(probabilities[c]),
+            } for c, text in enumerate(candidates)]
+            results.append(sorted(scored, key=lambda candidate: candidate["log_likelihood"], reverse=True))
+
+        return results
+
+def _transcribe_batch(items: List) -> List:
+    # Items are (audio, language) pairs
+    return model_registry.get("stt").transcribe_batch([audio for audio, _ in items],
+                                                      [language for _, language in items])
+
+def _score_batch(requests: List) -> List:
+    # Requests are (audio, candidates, language); one that fails only fails itself
+    model = model_registry.get("stt")
+    try:
+        return model.score_candidates_batch(requests)
+    except Exception as e:
+        logger.warning(f"Batched scoring of {len(requests)} requests failed, retrying one by one: {e}")
+        results = []
+        for request in requests:
+            try:
+                results.append(model.score_candidates_batch([request])[0])
+            except Exception as item_error:
+                results.append(item_error)
+        return results
+
+# Groups concurrent transcription requests into shared forward passes.
+# The model itself is loaded by the registry (models/registry.py).
+whisper_batcher = AsyncBatcher(
+    _transcribe_batch,
+    max_batch_size=int(os.getenv("STT_BATCH_MAX_SIZE", "16")),
+    max_wait_ms=float(os.getenv("STT_BATCH_MAX_WAIT_MS", "20")),
+    workers=int(os.getenv("STT_WORKERS", "1")),
+    max_queue_size=int(os.getenv("STT_QUEUE_MAX_SIZE", "64")),
+    timeout_s=float(os.getenv("STT_TIMEOUT_S", "60")),
+    name="whisper_batcher"
+)
+
+# Candidate scoring for /api/stt/verify: several requests share one encoder pass
+whisper_verify_batcher = AsyncBatcher(
+    _score_batch,
+    max_batch_size=int(os.getenv("STT_VERIFY_BATCH_MAX_SIZE", "8")),
+    max_wait_ms=float(os.getenv("STT_BATCH_MAX_WAIT_MS", "20")),
+    max_queue_size=int(os.getenv("STT_QUEUE_MAX_SIZE", "64")),
+    timeout_s=float(os.getenv("STT_TIMEOUT_S", "60")),
+    name="whisper_verify_batcher"
+)
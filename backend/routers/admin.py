@@ -0,0 +1,141 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from models.registry import model_registry
+from models.song_catalog import song_catalog
+from models.profiling import profiler
+import asyncio
+import hmac
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    token = os.getenv("ADMIN_TOKEN")
+    return bool(token) and hmac.compare_digest(x_admin_token or "", token)
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, and then require it in X-Admin-Token"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled, set ADMIN_TOKEN to enable it")
+    if not hmac.compare_digest(x_admin_token or "", token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+# Song edits touch the songs file, the catalog and the lyrics index; one at a time
+_edit_lock = asyncio.Lock()
+
+class SongUpsertRequest(BaseModel):
+    title: str
+    artist: str
+    language: str
+    difficulty: str
+    lyrics: List[str] = Field(..., min_length=1)
+
+@router.put("/songs/{song_id}")
+async def upsert_song(song_id: str, request: SongUpsertRequest):
+    """Adds or replaces a song; only its new or changed lines are embedded"""
+    lyrics_rag = model_registry.get("rag")
+    song = {"id": song_id, **request.model_dump()}
+
+    async with _edit_lock:
+        previous = song_catalog.get(song_id)
+        # The index first: if encoding fails, nothing has been written yet
+        try:
+            result = await asyncio.to_thread(lyrics_rag.upsert_song, song)
+        except Exception as e:
+            logger.error(f"Could not index song {song_id}: {e}")
+            raise HTTPException(status_code=500, detail=f"Could not index song: {song_id}")
+        try:
+            created = await asyncio.to_thread(song_catalog.upsert, song)
+        except OSError as e:
+            logger.error(f"Could not write song {song_id}, restoring the lyrics index: {e}")
+            if previous is not None:
+                await asyncio.to_thread(lyrics_rag.upsert_song, previous)
+            else:
+                await asyncio.to_thread(lyrics_rag.delete_song, song_id)
+            raise HTTPException(status_code=500, detail=f"Could not write song: {song_id}")
+        await asyncio.to_thread(_save_lyrics_index, lyrics_rag)
+
+    return {"created": created, **result}
+
+@router.delete("/songs/{song_id}")
+async def delete_song(song_id: str):
+    """Removes a song from the catalog and from lyrics search"""
+    lyrics_rag = model_registry.get("rag")
+
+    async with _edit_lock:
+        previous = song_catalog.get(song_id)
+        in_index = await asyncio.to_thread(lyrics_rag.delete_song, song_id)
+        try:
+            in_catalog = await asyncio.to_thread(song_catalog.delete, song_id)
+        except OSError as e:
+            logger.error(f"Could not delete song {song_id}, restoring the lyrics index: {e}")
+            if in_index and previous is not None:
+                await asyncio.to_thread(lyrics_rag.upsert_song, previous)
+            raise HTTPException(status_code=500, detail=f"Could not delete song: {song_id}")
+        if not (in_catalog or in_index):
+            raise HTTPException(status_code=404, detail=f"Song not found: {song_id}")
+        await asyncio.to_thread(_save_lyrics_index, lyrics_rag)
+
+    return {"song_id": song_id, **lyrics_rag.index_stats()}
+
+def _save_lyrics_index(lyrics_rag):
+    """The edit is live either way; an unsaved index only costs re-encoding at the next start"""
+    try:
+        lyrics_rag.save_index()
+    except OSError as e:
+        logger.warning(f"Could not save the lyrics index, the next start re-encodes the songs: {e}")
+
+def _sync_lyrics_index(snapshot):
+    """Catalog listener: applies edits made to the songs file directly to lyrics search"""
+    if not model_registry.is_ready("rag"):
+        return # Loading the index reads the new file anyway
+    lyrics_rag = model_registry.get("rag")
+    lyrics_rag.sync_songs([snapshot.songs[song_id] for song_id in snapshot.ids])
+    _save_lyrics_index(lyrics_rag)
+
+song_catalog.add_listener(_sync_lyrics_index)
+
+@router.post("/lyrics-index/compact")
+async def compact_lyrics_index():
+    """Drops tombstoned rows of replaced or deleted songs now instead of at the threshold"""
+    lyrics_rag = model_registry.get("rag")
+    async with _edit_lock:
+        removed = await asyncio.to_thread(lyrics_rag.compact)
+    return {"removed": removed, **lyrics_rag.index_stats()}
+
+@router.get("/lyrics-index")
+async def lyrics_index_stats():
+    return model_registry.get("rag").index_stats()
+
+class ProfileRequest(BaseModel):
+    route: str = Field(..., description="Request path to profile, e.g. /api/stt/transcribe")
+    requests: int = Field(1, ge=0, le=100, description="Requests to capture; 0 disarms the route")
+    sample_rate: float = Field(1.0, gt=0, le=1, description="Chance that a matching request is captured")
+
+@router.post("/profiles")
+async def arm_profiling(request: ProfileRequest):
+    """Profiles the model stages of the next requests to a route"""
+    return {"armed": profiler.arm(request.route, request.requests, request.sample_rate)}
+
+@router.get("/profiles")
+async def list_profiles():
+    return {"armed": profiler.armed(), "captures": await asyncio.to_thread(profiler.list_captures)}
+
+@router.get("/profiles/{capture_id}/{filename}")
+async def download_profile(capture_id: str, filename: str):
+    """One captured file: .prof (pstats), .txt (summary), .trace.json (chrome://tracing) or meta.json"""
+    path = await asyncio.to_thread(profiler.file_path, capture_id, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile file not found: {capture_id}/{filename}")
+    return FileResponse(path, filename=f"{capture_id}-{filename}")
+
+@router.delete("/profiles")
+async def clear_profiles():
+    """Disarms every route and deletes all captures"""
+    return {"removed": await asyncio.to_thread(profiler.clear)}
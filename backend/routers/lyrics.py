@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import json
-from models.lyrics_rag import lyrics_rag
-from models.llm_service import llm_service
+from models.lyrics_rag import lyrics_batcher
+from models.song_catalog import song_catalog, InvalidCursorError
+from models.practice_sessions import practice_sessions
+from models.registry import model_registry, ModelNotReadyError
+from models.metrics import metrics, publish_batcher, publish_cache
 import logging
 
 router = APIRouter()
@@ -17,11 +21,35 @@ class Song(BaseModel):
     language: str
     difficulty: str
 
+class SongDetail(Song):
+    lyrics: List[str]
+
 class StartPracticeRequest(BaseModel):
     song_id: str
 
 class NextLineRequest(BaseModel):
     sung_lyrics: str
+    # From /start; searches just after the last matched line of the song first
+    session_id: Optional[str] = None
+    # Optional pre-filters to scope the search
+    language: Optional[str] = None
+    song_id: Optional[str] = None
+    difficulty: Optional[str] = None
+    top_k: int = Field(default=1, ge=1, le=20)
+
+class BatchNextLineRequest(BaseModel):
+    lines: List[str] = Field(..., min_length=1, max_length=64)
+    language: Optional[str] = None
+    song_id: Optional[str] = None
+    difficulty: Optional[str] = None
+    top_k: int = Field(default=1, ge=1, le=20)
+
+class LineCandidate(BaseModel):
+    song_id: str
+    title: str
+    matched_line: str
+    matched_line_number: int
+    confidence: float
 
 class NextLineResponse(BaseModel):
     song_id: Optional[str] = None
@@ -29,8 +57,16 @@ class NextLineResponse(BaseModel):
     artist: Optional[str] = None
     next_lines: List[str] = []
     matched_line: Optional[str] = None
+    matched_line_number: Optional[int] = None
     found: bool
     confidence: float
+    # "window" (session search near the last match) or "global"
+    source: Optional[str] = None
+    session_id: Optional[str] = None
+    candidates: List[LineCandidate] = []
+
+class BatchNextLineResponse(BaseModel):
+    results: List[NextLineResponse]
 
 class ExplainRequest(BaseModel):
     lyrics: str
@@ -38,38 +74,74 @@ class ExplainRequest(BaseModel):
 class ExplainResponse(BaseModel):
     explanation: str
 
+def _not_modified(http_request: Request, etag: str) -> bool:
+    if_none_match = http_request.headers.get("if-none-match", "")
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def _json_bytes(http_request: Request, body: bytes, etag: str, headers=None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **(headers or {})}
+    if _not_modified(http_request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/songs", response_model=List[Song])
-async def get_songs():
-    """List available songs"""
+async def get_songs(
+    http_request: Request,
+    language: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500)
+):
+    """
+    List available songs (without lyrics), optionally filtered by language and difficulty.
+    When more songs match, the X-Next-Cursor header holds the cursor of the next page.
+    """
     try:
-        with open("data/songs.json", 'r') as f:
-            songs_data = json.load(f)
-            return [
-                Song(
-                    id=s['id'],
-                    title=s['title'],
-                    artist=s['artist'],
-                    language=s['language'],
-                    difficulty=s['difficulty'],
-                    lyrics=s['lyrics']
-                ) for s in songs_data
-            ]
+        body, etag, next_cursor = song_catalog.snapshot.page(language, difficulty, cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error loading songs: {e}")
         raise HTTPException(status_code=500, detail="Could not load songs")
 
+    return _json_bytes(http_request, body, etag, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+@router.get("/songs/{song_id}", response_model=SongDetail)
+async def get_song(song_id: str, http_request: Request):
+    """One song with its lyrics"""
+    song = song_catalog.snapshot.song(song_id)
+    if song is None:
+        raise HTTPException(status_code=404, detail=f"Song not found: {song_id}")
+    body, etag = song
+    return _json_bytes(http_request, body, etag)
+
 @router.post("/start")
 async def start_practice(request: StartPracticeRequest):
-    """Start practice for a song, returns first line"""
-    # Simply validating the song exists could be enough
-    # For now we'll just acknowledge start
-    return {"message": "Practice started", "song_id": request.song_id}
+    """
+    Start practice for a song. Returns a session_id to send with /next, and
+    explanations of the song's lines are generated in the background.
+    """
+    song = song_catalog.get(request.song_id)
+    if song is None:
+        raise HTTPException(status_code=404, detail=f"Song not found: {request.song_id}")
 
-@router.post("/next", response_model=NextLineResponse)
-async def get_next_line(request: NextLineRequest):
-    """Identify song and get next lines based on sung input using RAG"""
-    result = lyrics_rag.get_next_line(request.sung_lyrics)
-    
+    session = practice_sessions.create(request.song_id)
+
+    prefetching = 0
+    try:
+        model_registry.get("llm").start_prefetch(song['lyrics'], max_words=10)
+        prefetching = len(song['lyrics'])
+    except ModelNotReadyError:
+        logger.info("LLM not ready, skipping explanation prefetch")
+
+    return {
+        "message": "Practice started",
+        "song_id": request.song_id,
+        "session_id": session.session_id,
+        "prefetching": prefetching
+    }
+
+def _to_next_line_response(result) -> NextLineResponse:
     if not result:
         return NextLineResponse(
             found=False,
@@ -82,12 +154,122 @@ async def get_next_line(request: NextLineRequest):
         artist=result['artist'],
         next_lines=result['next_lines'],
         matched_line=result['matched_line'],
+        matched_line_number=result['matched_line_number'],
         confidence=result['confidence'],
+        source=result.get('source'),
+        candidates=result['candidates'],
         found=True
     )
 
+@router.post("/next", response_model=NextLineResponse)
+async def get_next_line(request: NextLineRequest):
+    """Identify song and get next lines based on sung input using RAG"""
+    session = None
+    if request.session_id:
+        session = practice_sessions.get(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Practice session not found or expired: {request.session_id}")
+
+    model_registry.ensure_ready("rag")
+    query = {
+        "user_input": request.sung_lyrics,
+        "language": request.language,
+        "song_id": request.song_id,
+        "difficulty": request.difficulty,
+        "top_k": request.top_k
+    }
+    if session:
+        query["window"] = session.window()
+
+    # Concurrent requests share one batched encode + search
+    result = await lyrics_batcher.submit(query)
+    response = _to_next_line_response(result)
+    if session:
+        session.record(result)
+        response.session_id = session.session_id
+    return response
+
+@router.post("/next:batch", response_model=BatchNextLineResponse)
+async def get_next_lines(request: BatchNextLineRequest):
+    """Identify several sung lines in one call, results are in request order"""
+    model_registry.ensure_ready("rag")
+    results = await lyrics_batcher.submit_many([
+        {
+            "user_input": line,
+            "language": request.language,
+            "song_id": request.song_id,
+            "difficulty": request.difficulty,
+            "top_k": request.top_k
+        } for line in request.lines
+    ])
+    return BatchNextLineResponse(results=[_to_next_line_response(result) for result in results])
+
+@router.get("/stats")
+async def get_stats():
+    """Query batching metrics (batch sizes and queue wait), cache hit/miss counters, practice sessions and LLM cache/queue stats"""
+    lyrics_rag = model_registry.get("rag") if model_registry.is_ready("rag") else None
+    llm_service = model_registry.get("llm") if model_registry.is_ready("llm") else None
+    return {
+        "query_batcher": lyrics_batcher.metrics(),
+        "llm": llm_service.stats() if llm_service else None,
+        "query_cache": lyrics_rag.query_cache.stats() if lyrics_rag else None,
+        "result_cache": lyrics_rag.result_cache.stats() if lyrics_rag else None,
+        "sessions": practice_sessions.stats(),
+        "retrieval": lyrics_rag.retrieval_stats() if lyrics_rag else None
+    }
+
+llm_in_flight = metrics.gauge("llm_generations_in_flight", "LLM generations waiting on the endpoint", ("kind",))
+
+def _collect_metrics():
+    publish_batcher(lyrics_batcher)
+    if model_registry.is_ready("rag"):
+        lyrics_rag = model_registry.get("rag")
+        publish_cache("lyrics_query", lyrics_rag.query_cache.hits, lyrics_rag.query_cache.misses)
+        publish_cache("lyrics_result", lyrics_rag.result_cache.hits, lyrics_rag.result_cache.misses)
+    if model_registry.is_ready("llm"):
+        llm_service = model_registry.get("llm")
+        publish_cache("llm_memory", llm_service.cache.memory.hits, llm_service.cache.memory.misses)
+        publish_cache("llm_disk", llm_service.cache.disk_hits, llm_service.cache.disk_misses)
+        llm_in_flight.set(llm_service.pending, "blocking")
+        llm_in_flight.set(llm_service.streams, "stream")
+
+metrics.add_collector(_collect_metrics)
+
 @router.post("/explain", response_model=ExplainResponse)
 async def explain_lyrics(request: ExplainRequest):
     """Get concise explanation of lyrics"""
-    explanation = llm_service.explain_lyrics(request.lyrics, max_words=10)
+    llm_service = model_registry.get("llm")
+    explanation = await llm_service.explain_lyrics(request.lyrics, max_words=10)
     return ExplainResponse(explanation=explanation)
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def _stream_explanation(llm_service, lyrics: str, max_words: int):
+    parts = []
+    async for piece in llm_service.explain_lyrics_stream(lyrics, max_words=max_words):
+        parts.append(piece)
+        yield _sse({"text": piece, "done": False})
+    yield _sse({"text": "", "done": True, "explanation": "".join(parts), "cached": False})
+
+@router.post("/explain/stream")
+async def explain_lyrics_stream(request: ExplainRequest):
+    """
+    Same as /explain as Server-Sent Events: {"text", "done": false} per chunk while
+    the model generates, then {"done": true, "explanation"}. A cached explanation
+    is sent as one {"done": true, "cached": true} event.
+    """
+    llm_service = model_registry.get("llm")
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    cached = await llm_service.cached_explanation(request.lyrics, max_words=10)
+    if cached is not None:
+        event = _sse({"text": cached, "done": True, "explanation": cached, "cached": True})
+        return StreamingResponse(iter([event]), media_type="text/event-stream", headers=headers)
+
+    llm_service.check_capacity()
+    return StreamingResponse(
+        _stream_explanation(llm_service, request.lyrics, max_words=10),
+        media_type="text/event-stream",
+        headers=headers
+    )
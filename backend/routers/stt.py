@@ -1,77 +1,293 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
-from models.whisper_model import whisper_model
-import tempfile
+from models.whisper_model import whisper_batcher, whisper_verify_batcher, whisper_language
+from models.registry import model_registry, ModelNotReadyError
+from models.batching import InferenceRejectedError
+from models.lyrics_rag import lyrics_batcher
+from models.audio import decode_audio, pcm_to_float32, AudioDecodeError, StreamingDecoder, PCM_FORMATS, SAMPLE_RATE
+from models.streaming_stt import StreamingTranscriber
+from models.vad import vad, VAD_ENABLED
+from models.cache import normalize_text
+from models.metrics import metrics, publish_batcher, stage, stage_duration
+from typing import List, Optional
+import asyncio
+import json
+import numpy as np
 import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+VERIFY_MAX_CANDIDATES = int(os.getenv("STT_VERIFY_MAX_CANDIDATES", "16"))
+
+def _parse_language(language: Optional[str]) -> Optional[str]:
+    try:
+        return whisper_language(language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _read_speech(http_request: Request, file: UploadFile) -> Optional[np.ndarray]:
+    """Decodes an upload and trims its silence; None when it holds no speech"""
+    # Receiving and parsing the multipart body happens before the handler runs
+    received_at = getattr(http_request.state, "received_at", None)
+    if received_at is not None:
+        stage_duration.observe(time.perf_counter() - received_at, "upload")
+
+    content = await file.read()
+
+    # Decode WebM/OGG/WAV straight to 16 kHz mono float32, in memory
+    try:
+        with stage("audio_decode"):
+            audio = await asyncio.to_thread(decode_audio, content)
+    except AudioDecodeError as e:
+        logger.error(f"Audio decoding failed for {file.filename}: {e}")
+        raise HTTPException(status_code=400, detail=f"Audio conversion failed: {str(e)}")
+
+    # Leading/trailing silence and long pauses never reach Whisper; silent uploads stop here
+    if VAD_ENABLED:
+        with stage("vad"):
+            speech = await asyncio.to_thread(vad.trim, audio)
+        if not speech.has_speech:
+            logger.info(f"No speech in {speech.input_s:.2f}s of audio from {file.filename}")
+            return None
+        audio = speech.audio
+    return audio
+
 @router.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(http_request: Request, file: UploadFile = File(...),
+                           language: Optional[str] = Form(default=None)):
     """
-    Transcribe audio file to text using Whisper
+    Transcribe audio file to text using Whisper.
+    `language` (en-SG, ja-JP, ja...) skips language detection.
     """
-    temp_path = None
-    wav_path = None
+    language = _parse_language(language)
+    # 503 + Retry-After while Whisper is still loading
+    model_registry.ensure_ready("stt")
+
     try:
-        # Check if ffmpeg is available
-        from pydub.utils import which
-        if not which("ffmpeg"):
-           logger.error("ffmpeg not found in PATH")
-           raise HTTPException(status_code=500, detail="Server configuration error: ffmpeg not found")
-
-        # Save uploaded file temporarily
-        suffix = os.path.splitext(file.filename)[1]
-        # Ensure we have a suffix default if missing
-        if not suffix:
-            suffix = ".webm"
-            
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
-        # Convert to WAV if needed (Whisper/Soundfile often struggle with WebM)
-        wav_path = temp_path
-        if suffix.lower() == '.webm':
-            try:
-                from pydub import AudioSegment
-                logger.info(f"Converting WebM to WAV: {temp_path}")
-                audio = AudioSegment.from_file(temp_path, format="webm")
-                wav_path = temp_path + ".wav"
-                audio.export(wav_path, format="wav")
-            except Exception as e:
-                logger.error(f"WebM conversion failed: {e}")
-                # Do NOT proceed with the original file if conversion failed, it will likely crash whisper
-                raise HTTPException(status_code=400, detail=f"Audio conversion failed: {str(e)}")
-
-        # Transcribe
-        logger.info(f"Transcribing audio file: {wav_path}")
-        if not os.path.exists(wav_path):
-             raise HTTPException(status_code=500, detail="Audio file lost during processing")
-
-        text = whisper_model.transcribe(wav_path)
+        audio = await _read_speech(http_request, file)
+        if audio is None:
+            return JSONResponse(content={"text": ""})
+
+        logger.info(f"Transcribing {len(audio) / 16000:.2f}s of audio from {file.filename}")
+
+        # Concurrent uploads are batched into one Whisper forward pass
+        text = await whisper_batcher.submit((audio, language))
         
         logger.info(f"Transcription result: {text}")
         return JSONResponse(content={"text": text})
         
-    except HTTPException as he:
-        raise he
+    except (HTTPException, InferenceRejectedError):
+        raise
     except Exception as e:
         logger.error(f"Error transcribing audio: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
-    finally:
-        # Clean up
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-        if wav_path and wav_path != temp_path and os.path.exists(wav_path):
+
+@router.post("/verify")
+async def verify_answer(http_request: Request, file: UploadFile = File(...), language: str = Form(...),
+                        candidates: List[str] = Form(...)):
+    """
+    Ranks the expected answers by how likely Whisper finds each one for the audio.
+    Nothing is generated: the encoder runs once and the candidates are scored
+    together, in the given language. Repeat the `candidates` field per answer.
+    """
+    language = _parse_language(language)
+    candidates = list(dict.fromkeys(candidate.strip() for candidate in candidates))
+    if not all(candidates):
+        raise HTTPException(status_code=400, detail="Candidates must not be empty")
+    if len(candidates) > VERIFY_MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"At most {VERIFY_MAX_CANDIDATES} candidates are allowed")
+    model_registry.ensure_ready("stt")
+
+    try:
+        audio = await _read_speech(http_request, file)
+        if audio is None:
+            return {"language": language, "speech": False, "best": None, "candidates": []}
+
+        ranked = await whisper_verify_batcher.submit((audio, candidates, language))
+        logger.info(f"Verified {len(candidates)} candidates, best: {ranked[0]['text']} ({ranked[0]['probability']:.2f})")
+        return {"language": language, "speech": True, "best": ranked[0]["text"], "candidates": ranked}
+
+    except (HTTPException, InferenceRejectedError):
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying audio: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
+
+STREAM_WINDOW_S = float(os.getenv("STT_STREAM_WINDOW_S", "8"))
+STREAM_STEP_S = float(os.getenv("STT_STREAM_STEP_S", "1"))
+# Longest stream accepted, in audio and in bytes received; beyond either the socket is closed with 1009
+STREAM_MAX_S = float(os.getenv("STT_STREAM_MAX_S", "600"))
+STREAM_MAX_BYTES = int(os.getenv("STT_STREAM_MAX_MB", "50")) * 1024 * 1024
+# Stable words needed before the lyrics index is queried
+STREAM_MIN_LYRICS_WORDS = 3
+
+def _is_stop_message(text: str) -> bool:
+    """Accepts either the plain text "stop" or {"type": "stop"}"""
+    text = text.strip()
+    if text.lower() == "stop":
+        return True
+    try:
+        return json.loads(text).get("type") == "stop"
+    except (ValueError, AttributeError):
+        return False
+
+async def _suggest_next_line(websocket: WebSocket, stable_text: str, last_query: str) -> str:
+    """Looks up the next lyrics line once the stable transcript changed, returns the query used"""
+    words = stable_text.split()
+    query = " ".join(words[-12:])
+    if len(words) < STREAM_MIN_LYRICS_WORDS or normalize_text(query) == normalize_text(last_query):
+        return last_query
+    # Suggestions are best effort, skip them until the lyrics index is loaded
+    try:
+        model_registry.ensure_ready("rag")
+    except ModelNotReadyError:
+        return last_query
+
+    try:
+        result = await lyrics_batcher.submit({"user_input": query})
+    except InferenceRejectedError:
+        # Retried with the next stable transcript
+        return last_query
+    if result:
+        await websocket.send_json({
+            "type": "next_line",
+            "song_id": result['song_id'],
+            "title": result['title'],
+            "artist": result['artist'],
+            "matched_line": result['matched_line'],
+            "next_lines": result['next_lines'],
+            "confidence": result['confidence']
+        })
+    return query
+
+@router.websocket("/stream")
+async def stream_transcription(websocket: WebSocket, format: str = "pcm16", suggest_lines: bool = False,
+                               language: Optional[str] = None):
+    """
+    Streaming transcription over a WebSocket.
+
+    Send binary audio frames as they are recorded: raw 16 kHz mono PCM
+    (format=pcm16 or f32) or container chunks such as MediaRecorder WebM
+    (format=webm, fed to one ffmpeg process for the whole stream). Send the
+    text "stop" to finish. Streams over STREAM_MAX_S of audio or
+    STREAM_MAX_BYTES are closed with 1009.
+    The server pushes {"type": "partial"} updates with text and stable_text,
+    {"type": "final"} segments, and with suggest_lines=true {"type": "next_line"}
+    as soon as the stable transcript matches a song. `language` works as for /transcribe.
+    """
+    await websocket.accept()
+    try:
+        language = whisper_language(language)
+    except ValueError as e:
+        # 1008 "Policy Violation": the request itself is invalid
+        await websocket.close(code=1008, reason=str(e))
+        return
+    try:
+        model_registry.ensure_ready("stt")
+    except ModelNotReadyError as e:
+        # 1013 "Try Again Later" is the WebSocket counterpart of 503
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    transcriber = StreamingTranscriber(window_s=STREAM_WINDOW_S, step_s=STREAM_STEP_S)
+    try:
+        decoder = None if format in PCM_FORMATS else StreamingDecoder()
+    except AudioDecodeError as e:
+        # 1003 "Unsupported Data"
+        await websocket.close(code=1003, reason=str(e))
+        return
+    leftover = b""
+    received = 0
+    last_lyrics_query = ""
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+            if message.get("text") is not None:
+                if _is_stop_message(message["text"]):
+                    break
+                continue
+
+            chunk = message.get("bytes") or b""
+            received += len(chunk)
+            if received > STREAM_MAX_BYTES:
+                # 1009 "Message Too Big"
+                await websocket.close(code=1009, reason=f"Streams are limited to {STREAM_MAX_BYTES} bytes")
+                return
+            if decoder is None:
+                samples, leftover = pcm_to_float32(leftover + chunk, format)
+            else:
+                samples = await asyncio.to_thread(decoder.feed, chunk)
+            transcriber.add_audio(samples)
+            if transcriber.total_samples > STREAM_MAX_S * SAMPLE_RATE:
+                await websocket.close(code=1009, reason=f"Streams are limited to {STREAM_MAX_S:g} s of audio")
+                return
+
+            if not transcriber.should_decode():
+                continue
+
             try:
-                os.unlink(wav_path)
-            except:
-                pass
+                text = await whisper_batcher.submit((transcriber.window(), language))
+            except InferenceRejectedError as e:
+                # Under load partial updates are dropped; the next step decodes the whole window again
+                logger.warning(f"Skipping partial transcription: {e}")
+                continue
+            update = transcriber.update(text)
+            await websocket.send_json({"type": "partial", "text": update["text"], "stable_text": update["stable_text"]})
+            if update["final"] is not None:
+                await websocket.send_json({"type": "final", "text": update["final"], "done": False})
+            if suggest_lines:
+                last_lyrics_query = await _suggest_next_line(websocket, update["stable_text"], last_lyrics_query)
+
+        # End of stream: decode whatever is left in the window
+        if decoder is not None:
+            transcriber.add_audio(await asyncio.to_thread(decoder.finish))
+        text = await whisper_batcher.submit((transcriber.window(), language)) if len(transcriber.window()) else None
+        final_text = transcriber.finish(text)
+        await websocket.send_json({"type": "final", "text": final_text, "done": True})
+        if suggest_lines:
+            await _suggest_next_line(websocket, final_text, last_lyrics_query)
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        logger.info("Streaming transcription client disconnected")
+    except AudioDecodeError as e:
+        logger.warning(f"Could not decode streamed audio: {e}")
+        try:
+            await websocket.close(code=1003, reason=str(e)[:120])
+        except RuntimeError:
+            pass
+    except InferenceRejectedError as e:
+        logger.warning(f"Streaming transcription rejected: {e}")
+        try:
+            await websocket.close(code=1013, reason=str(e))
+        except RuntimeError:
+            pass
+    except Exception as e:
+        logger.error(f"Error in streaming transcription: {str(e)}")
+        try:
+            await websocket.close(code=1011)
+        except RuntimeError:
+            pass
+    finally:
+        if decoder is not None:
+            decoder.close()
+
+@router.get("/stats")
+async def get_stats():
+    """Transcription batching metrics (batch sizes and queue wait) and audio cut by the VAD"""
+    return {"whisper_batcher": whisper_batcher.metrics(), "whisper_verify_batcher": whisper_verify_batcher.metrics(),
+            "vad": {"enabled": VAD_ENABLED, **vad.stats()}}
+
+def _collect_metrics():
+    publish_batcher(whisper_batcher)
+    publish_batcher(whisper_verify_batcher)
+
+metrics.add_collector(_collect_metrics)
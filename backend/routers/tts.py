@@ -1,52 +1,207 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from models.tts_model import tts_model
-import tempfile
-import os
+from typing import List, Literal
+from models.tts_model import tts_batcher, DEFAULT_VOICE, MODEL_VERSION
+from models.registry import model_registry
+from models.batching import InferenceRejectedError
+from models.tts_cache import tts_audio_cache
+from models.metrics import metrics, publish_batcher, publish_cache
+from models.speaker_embeddings import speaker_embedding_store
+from models.text_segmentation import split_text_for_tts
+from models.audio import float_to_pcm16, streaming_wav_header, encode_wav, SAMPLE_RATE
+import asyncio
+import numpy as np
+import soundfile as sf
+import io
+import zipfile
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Short pause inserted between streamed sentences
+STREAM_PAUSE_S = 0.1
+# Most clips one /synthesize:batch call may ask for
+BATCH_MAX_TEXTS = 32
+
 class TTSRequest(BaseModel):
     text: str
+    voice: str = DEFAULT_VOICE
+
+class TTSBatchRequest(BaseModel):
+    texts: List[str]
+    voice: str = DEFAULT_VOICE
+
+class TTSStreamRequest(BaseModel):
+    text: str
+    voice: str = DEFAULT_VOICE
+    # wav: a WAV header then 16-bit PCM, pcm: raw 16-bit little-endian PCM only
+    format: Literal["wav", "pcm"] = "wav"
+
+def _check_voice(voice: str):
+    # Before the store is first built only the default voice exists
+    if voice not in speaker_embedding_store and (speaker_embedding_store.voices or voice != DEFAULT_VOICE):
+        raise HTTPException(status_code=400, detail=f"Unknown voice: {voice}")
+
+async def _synthesize_cached(text: str, voice: str, http_request: Request) -> Response:
+    """Serves the clip from the audio cache (or 304) and synthesizes it on a miss"""
+    if not text or len(text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    _check_voice(voice)
+
+    key = tts_audio_cache.key(text, voice, MODEL_VERSION)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+
+    if_none_match = http_request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    try:
+        # Cache reads and writes touch the disk tier, so they run off the event loop
+        audio = await asyncio.to_thread(tts_audio_cache.get, key)
+        if audio is None:
+            # Cache hits are served while the model warms, misses get a 503
+            model_registry.ensure_ready("tts")
+            logger.info(f"Synthesizing speech for text: {text[:50]}...")
+            # Concurrent single-clip requests share one batched forward pass
+            audio = encode_wav(await tts_batcher.submit((text, voice)))
+            await asyncio.to_thread(tts_audio_cache.put, key, audio)
+            logger.info("Speech synthesis completed")
+            headers["X-Cache"] = "MISS"
+        else:
+            headers["X-Cache"] = "HIT"
+
+        headers["Content-Disposition"] = 'inline; filename="speech.wav"'
+        return Response(content=audio, media_type="audio/wav", headers=headers)
+
+    except InferenceRejectedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error synthesizing speech: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Synthesis failed: {str(e)}")
 
 @router.post("/synthesize")
-async def synthesize_speech(request: TTSRequest):
+async def synthesize_speech(request: TTSRequest, http_request: Request):
     """
     Synthesize speech from text using SpeechT5
     
     Args:
-        request: JSON with text to synthesize
+        request: JSON with text to synthesize and an optional voice (see GET /voices)
     
     Returns:
-        Audio file (WAV)
+        Audio file (WAV), with an ETag; If-None-Match returns 304
+    """
+    return await _synthesize_cached(request.text, request.voice, http_request)
+
+@router.get("/synthesize")
+async def synthesize_speech_get(text: str, http_request: Request, voice: str = DEFAULT_VOICE):
+    """Same as POST /synthesize, cacheable by browsers and CDNs"""
+    return await _synthesize_cached(text, voice, http_request)
+
+async def _segment_audio(segment: str, voice: str) -> np.ndarray:
+    """One sentence/clause of audio, served from the audio cache when possible"""
+    key = tts_audio_cache.key(segment, voice, MODEL_VERSION)
+    cached = await asyncio.to_thread(tts_audio_cache.get, key)
+    if cached is not None:
+        samples, _ = sf.read(io.BytesIO(cached), dtype="float32")
+        return samples
+
+    samples = await tts_batcher.submit((segment, voice))
+    await asyncio.to_thread(tts_audio_cache.put, key, encode_wav(samples))
+    return samples
+
+async def _stream_speech(segments, voice: str, audio_format: str):
+    """Synthesizes one segment at a time so only one segment is ever held in memory"""
+    if audio_format == "wav":
+        yield streaming_wav_header()
+
+    pause = float_to_pcm16(np.zeros(int(STREAM_PAUSE_S * SAMPLE_RATE), dtype=np.float32))
+    for i, segment in enumerate(segments):
+        samples = await _segment_audio(segment, voice)
+        if i > 0:
+            yield pause
+        yield float_to_pcm16(samples)
+
+@router.post("/synthesize:batch")
+async def synthesize_speech_batch(request: TTSBatchRequest):
     """
+    Synthesize several clips in one call (e.g. a list of profession names).
+    Cache misses are synthesized together in padded batches. Returns a zip with
+    one WAV per text, named 000.wav, 001.wav, ... in request order.
+    """
+    if not request.texts or len(request.texts) > BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_TEXTS} texts")
+    if any(not text or len(text.strip()) == 0 for text in request.texts):
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    _check_voice(request.voice)
+
     try:
-        if not request.text or len(request.text.strip()) == 0:
-            raise HTTPException(status_code=400, detail="Text cannot be empty")
-        
-        # Create temporary file for output
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        temp_path = temp_file.name
-        temp_file.close()
-        
-        # Synthesize
-        logger.info(f"Synthesizing speech for text: {request.text[:50]}...")
-        tts_model.synthesize(request.text, temp_path)
-        
-        logger.info("Speech synthesis completed")
-        
-        # Return audio file
-        return FileResponse(
-            temp_path,
-            media_type="audio/wav",
-            filename="speech.wav",
-            background=None  # File will be deleted after response
+        keys = [tts_audio_cache.key(text, request.voice, MODEL_VERSION) for text in request.texts]
+        clips = await asyncio.to_thread(lambda: [tts_audio_cache.get(key) for key in keys])
+
+        missing = [i for i, clip in enumerate(clips) if clip is None]
+        if missing:
+            model_registry.ensure_ready("tts")
+            logger.info(f"Synthesizing {len(missing)} of {len(clips)} clips in a batch")
+            for i, samples in zip(missing, await tts_batcher.submit_many([(request.texts[i], request.voice) for i in missing])):
+                clips[i] = encode_wav(samples)
+            await asyncio.to_thread(lambda: [tts_audio_cache.put(keys[i], clips[i]) for i in missing])
+
+        buffer = io.BytesIO()
+        # WAV data barely compresses, so store without deflate
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for i, clip in enumerate(clips):
+                archive.writestr(f"{i:03d}.wav", clip)
+
+        return Response(
+            content=buffer.getvalue(),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="speech.zip"'}
         )
-        
+
+    except InferenceRejectedError:
+        raise
     except Exception as e:
-        logger.error(f"Error synthesizing speech: {str(e)}")
+        logger.error(f"Error synthesizing speech batch: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Synthesis failed: {str(e)}")
+
+@router.post("/synthesize/stream")
+async def synthesize_speech_stream(request: TTSStreamRequest):
+    """
+    Streams speech sentence by sentence: the first chunk is sent as soon as the
+    first sentence is synthesized. Audio is 16 kHz mono 16-bit PCM, with a
+    streaming WAV header unless format is "pcm".
+    """
+    if not request.text or len(request.text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    _check_voice(request.voice)
+
+    segments = split_text_for_tts(request.text)
+    # Once streaming starts a 503 can no longer be sent, so check up front
+    keys = [tts_audio_cache.key(segment, request.voice, MODEL_VERSION) for segment in segments]
+    if not await asyncio.to_thread(lambda: all(tts_audio_cache.contains(key) for key in keys)):
+        model_registry.ensure_ready("tts")
+    logger.info(f"Streaming speech for {len(segments)} segments: {request.text[:50]}...")
+
+    media_type = "audio/wav" if request.format == "wav" else f"audio/L16;rate={SAMPLE_RATE};channels=1"
+    return StreamingResponse(_stream_speech(segments, request.voice, request.format), media_type=media_type)
+
+@router.get("/voices")
+async def list_voices():
+    """Voices accepted by the synthesize endpoints"""
+    return {"default": DEFAULT_VOICE, "voices": speaker_embedding_store.names() or [DEFAULT_VOICE]}
+
+@router.get("/stats")
+async def get_stats():
+    """Audio cache hit/miss counters, disk usage and synthesis batching metrics"""
+    return {"audio_cache": tts_audio_cache.stats(), "tts_batcher": tts_batcher.metrics()}
+
+def _collect_metrics():
+    publish_batcher(tts_batcher)
+    publish_cache("tts_audio_memory", tts_audio_cache.memory.hits, tts_audio_cache.memory.misses)
+    publish_cache("tts_audio_disk", tts_audio_cache.disk_hits, tts_audio_cache.disk_misses)
+
+metrics.add_collector(_collect_metrics)
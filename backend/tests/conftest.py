@@ -0,0 +1,77 @@
+import json
+import zlib
+import numpy as np
+import pytest
+
+TWINKLE = [{"id": "twinkle", "title": "Twinkle", "artist": "Traditional", "language": "en-US", "difficulty": "Easy",
+            "lyrics": ["Twinkle, twinkle, little star", "How I wonder what you are"]}]
+
+
+class CountingEncoder:
+    """Deterministic stand-in for SentenceTransformer that counts encoded texts"""
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, documents):
+        self.encoded += len(documents)
+        return np.array([[len(d), d.count(" "), 1.0] for d in documents], dtype=np.float32) / 100
+
+
+class WordHashEncoder:
+    """Deterministic stand-in for SentenceTransformer: normalized sum of per-word random vectors"""
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, documents):
+        self.encoded += len(documents)
+        vectors = np.zeros((len(documents), self.dim), dtype=np.float32)
+        for i, document in enumerate(documents):
+            for word in document.lower().split():
+                vectors[i] += np.random.default_rng(zlib.crc32(word.encode())).standard_normal(self.dim)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+@pytest.fixture
+def counting_encoder():
+    return CountingEncoder()
+
+
+@pytest.fixture
+def write_songs(tmp_path):
+    """Writes a songs catalog to tmp_path/<name>.json and returns its path"""
+    def write(songs=TWINKLE, name="songs"):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(songs))
+        return path
+    return write
+
+
+@pytest.fixture
+def make_rag(tmp_path, write_songs):
+    """
+    LyricsRAG over a catalog with its own index directory and a fresh encoder:
+    CountingEncoder, or WordHashEncoder when similar lines must rank close
+    """
+    def make(songs=TWINKLE, name="songs", word_hash=False, **kwargs):
+        from models.lyrics_rag import LyricsRAG
+        encoder = WordHashEncoder() if word_hash else CountingEncoder()
+        return LyricsRAG(data_path=str(write_songs(songs, name)), index_dir=str(tmp_path / f"{name}-index"),
+                         model=encoder, **kwargs)
+    return make
+
+
+@pytest.fixture
+def llm_stub():
+    """The benchmarks.hf_stub inference server: plain and SSE responses, requests counted in app.state"""
+    from benchmarks.hf_stub import create_app
+    return create_app()
+
+
+@pytest.fixture
+def make_llm_service(tmp_path):
+    """LLMService answered in-process by a stub app, with its response cache under tmp_path"""
+    def make(stub, api_url="http://hf-stub/generate"):
+        from benchmarks.hf_stub import stub_llm_service
+        return stub_llm_service(stub, str(tmp_path / "llm.sqlite3"), api_url, model_id="test-model")
+    return make
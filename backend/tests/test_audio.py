@@ -0,0 +1,55 @@
+import io
+import numpy as np
+import pytest
+import soundfile as sf
+from models import audio
+from models.audio import decode_audio, AudioDecodeError
+
+
+def _encode(samples, sample_rate, fmt, subtype=None):
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format=fmt, subtype=subtype)
+    return buffer.getvalue()
+
+
+def _tone(seconds, sample_rate, channels=1):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    return np.stack([tone] * channels, axis=1) if channels > 1 else tone
+
+
+def test_wav_is_resampled_to_16k_mono():
+    decoded = decode_audio(_encode(_tone(1.0, 44100, channels=2), 44100, "WAV"))
+
+    assert decoded.dtype == np.float32
+    assert decoded.ndim == 1
+    assert abs(len(decoded) - 16000) <= 1
+
+
+def test_ogg_is_decoded_in_process():
+    decoded = decode_audio(_encode(_tone(0.5, 16000), 16000, "OGG", "VORBIS"))
+    assert abs(len(decoded) - 8000) <= 160
+
+
+def test_undecodable_bytes_raise_decode_error(monkeypatch):
+    monkeypatch.setattr(audio, "FFMPEG_PATH", None)
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b"not audio at all")
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b"")
+
+
+@pytest.mark.skipif(audio.FFMPEG_PATH is None, reason="ffmpeg not installed")
+def test_ffmpeg_pipe_decodes_without_temp_files():
+    decoded = audio._decode_with_ffmpeg(_encode(_tone(0.5, 22050), 22050, "WAV"), 16000)
+    assert abs(len(decoded) - 8000) <= 160
+
+
+def test_streaming_wav_header_is_readable_with_pcm16_payload():
+    payload = audio.float_to_pcm16(np.array([0.0, 0.5, -1.0, 2.0], dtype=np.float32))
+    header = audio.streaming_wav_header()
+
+    assert len(header) == 44
+    assert header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+    assert int.from_bytes(header[24:28], "little") == 16000
+    np.testing.assert_array_equal(np.frombuffer(payload, dtype="<i2"), [0, 16383, -32767, 32767])
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import pytest
+from models.batching import AsyncBatcher, QueueFullError, InferenceTimeoutError
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = AsyncBatcher(process, max_batch_size=8, max_wait_ms=50)
+        return batcher, await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    batcher, results = asyncio.run(run())
+
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert batcher.stats.as_dict()["avg_batch_size"] == 5
+
+
+def test_max_batch_size_splits_batches():
+    calls = []
+
+    def process(items):
+        calls.append(len(items))
+        return items
+
+    async def run():
+        batcher = AsyncBatcher(process, max_batch_size=3, max_wait_ms=50)
+        return await batcher.submit_many(list(range(7)))
+
+    assert asyncio.run(run()) == list(range(7))
+    assert calls == [3, 3, 1]
+
+
+def test_batch_errors_reach_every_caller():
+    def process(items):
+        raise ValueError("boom")
+
+    async def run():
+        batcher = AsyncBatcher(process, max_wait_ms=1)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_per_item_exceptions_only_fail_their_caller():
+    def process(items):
+        return [ValueError(item) if item < 0 else item for item in items]
+
+    async def run():
+        batcher = AsyncBatcher(process, max_wait_ms=20)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(-1), return_exceptions=True)
+
+    ok, failed = asyncio.run(run())
+    assert ok == 1
+    assert isinstance(failed, ValueError)
+
+
+def test_full_queue_rejects_new_items():
+    release = threading.Event()
+
+    def process(items):
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = AsyncBatcher(process, max_batch_size=1, max_wait_ms=0, max_queue_size=2)
+        running = asyncio.ensure_future(batcher.submit(0))
+        await asyncio.sleep(0.05)  # item 0 is now on the worker
+        queued = [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await batcher.submit(3)
+        metrics = batcher.metrics()
+        release.set()
+        return metrics, await asyncio.gather(running, *queued)
+
+    metrics, results = asyncio.run(run())
+    assert results == [0, 1, 2]
+    assert metrics["queue_depth"] == 2
+    assert metrics["in_flight"] == 1
+    assert metrics["rejected"] == 1
+
+
+def test_timed_out_items_are_not_processed():
+    processed = []
+    release = threading.Event()
+
+    def process(items):
+        processed.extend(items)
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = AsyncBatcher(process, max_batch_size=1, max_wait_ms=0, timeout_s=0.1)
+        first = asyncio.ensure_future(batcher.submit("slow"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(InferenceTimeoutError):
+            await batcher.submit("queued")
+        release.set()
+        with pytest.raises(InferenceTimeoutError):
+            await first
+        await batcher.submit("next")
+        return batcher.stats.as_dict()
+
+    stats = asyncio.run(run())
+    # "queued" timed out before a worker was free, so it never ran
+    assert processed == ["slow", "next"]
+    assert stats["timed_out"] == 2
+
+
+def test_workers_run_batches_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def process(items):
+        barrier.wait()  # only returns once two batches are running at the same time
+        return items
+
+    async def run():
+        batcher = AsyncBatcher(process, max_batch_size=1, max_wait_ms=0, workers=2)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+    assert asyncio.run(run()) == [1, 2]
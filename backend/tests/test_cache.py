@@ -0,0 +1,40 @@
+import time
+from models.cache import LRUCache, normalize_text
+
+
+def test_normalize_folds_case_punctuation_and_whitespace():
+    assert normalize_text("Twinkle, twinkle,   LITTLE star!") == "twinkle twinkle little star"
+    assert normalize_text("I don't  care") == normalize_text("i dont care")
+    assert normalize_text("明日の今頃には、") == "明日の今頃には"
+    assert normalize_text("Ｔｗｉｎｋｌｅ") == "twinkle"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_expires_entries():
+    cache = LRUCache(maxsize=4, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_counters_and_clear():
+    cache = LRUCache(maxsize=4)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    cache.clear()
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+    assert stats["hit_ratio"] == 0.5
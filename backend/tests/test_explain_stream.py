@@ -0,0 +1,71 @@
+import asyncio
+import json
+import httpx
+from benchmarks.hf_stub import create_app
+from models.llm_service import LLMService
+from models.registry import model_registry
+
+GENERATED = " A star shines in the night sky and the child wonders what it really is, far away"
+
+
+def parse_events(body: str):
+    return [json.loads(line[5:]) for line in body.splitlines() if line.startswith("data:")]
+
+
+def test_stream_is_trimmed_like_the_blocking_call(make_llm_service):
+    server = create_app(text=GENERATED)
+
+    async def run():
+        service = make_llm_service(server)
+        pieces = [piece async for piece in service.explain_lyrics_stream("Twinkle twinkle", max_words=5)]
+        cached = await service.cached_explanation("Twinkle twinkle", max_words=5)
+        await service.aclose()
+        return service, pieces, cached
+
+    service, pieces, cached = asyncio.run(run())
+    expected = LLMService.trim(GENERATED, 5)
+    assert len(pieces) > 1
+    assert "".join(pieces) == expected == "A star shines in the..."
+    assert cached == expected
+    assert service.ttft_stats()["count"] == 1
+    assert server.state.requests == {"generate": 0, "generate_stream": 1}
+
+
+def test_short_generation_is_streamed_whole(make_llm_service):
+    server = create_app(text=" Wondering about a star")
+
+    async def run():
+        service = make_llm_service(server)
+        pieces = [piece async for piece in service.explain_lyrics_stream("Twinkle twinkle", max_words=10)]
+        await service.aclose()
+        return pieces
+
+    assert "".join(asyncio.run(run())) == "Wondering about a star"
+
+
+def test_sse_endpoint_serves_cache_hits_as_one_event(make_llm_service):
+    import main
+
+    server = create_app(text=GENERATED)
+
+    async def run():
+        service = make_llm_service(server)
+        model_registry.provide("llm", service)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/api/lyrics/explain/stream", json={"lyrics": "How I wonder what you are"})
+            second = await client.post("/api/lyrics/explain/stream", json={"lyrics": "How I wonder what you are"})
+        await service.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(first.text)
+    assert len(events) > 2
+    assert events[-1]["done"] and not events[-1]["cached"]
+    assert "".join(event["text"] for event in events) == events[-1]["explanation"] == LLMService.trim(GENERATED, 10)
+
+    cached_events = parse_events(second.text)
+    assert len(cached_events) == 1
+    assert cached_events[0]["cached"] and cached_events[0]["text"] == events[-1]["explanation"]
+    assert server.state.requests == {"generate": 0, "generate_stream": 1}
@@ -0,0 +1,57 @@
+import pytest
+import torch
+from torch import nn
+from transformers import WhisperConfig, WhisperForConditionalGeneration, SpeechT5HifiGanConfig, SpeechT5HifiGan
+from models import inference_backend
+from models.inference_backend import resolve_backend, quantize_int8, OnnxWhisperEncoder, OnnxVocoder
+
+
+def tiny_whisper():
+    torch.manual_seed(0)
+    config = WhisperConfig(
+        d_model=32, encoder_layers=1, decoder_layers=1, encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=64, decoder_ffn_dim=64, max_source_positions=100, max_target_positions=32
+    )
+    return WhisperForConditionalGeneration(config).eval()
+
+
+def test_resolve_backend():
+    assert resolve_backend("ONNX", "cpu") == "onnx"
+    assert resolve_backend(None, "cpu") == "eager"
+    assert resolve_backend("int8", "cuda:0") == "eager"
+    with pytest.raises(ValueError):
+        resolve_backend("tensorrt", "cpu")
+
+
+def test_int8_quantizes_linear_layers():
+    model = quantize_int8(nn.Sequential(nn.Linear(8, 8), nn.ReLU(), nn.Linear(8, 2)))
+    assert not any(type(module) is nn.Linear for module in model.modules())
+    assert model(torch.randn(3, 8)).shape == (3, 2)
+
+
+def test_onnx_whisper_encoder_matches_eager(tmp_path, monkeypatch):
+    pytest.importorskip("onnxruntime")
+    monkeypatch.setattr(inference_backend, "ONNX_CACHE_DIR", str(tmp_path))
+    model = tiny_whisper()
+    features = torch.randn(2, 80, 200)
+
+    with torch.no_grad():
+        expected = model.generate(features, max_new_tokens=4)
+        model.model.encoder = OnnxWhisperEncoder(model.model.encoder, "tiny/whisper")
+        assert torch.equal(model.generate(features, max_new_tokens=4), expected)
+    assert (tmp_path / "tiny--whisper-encoder.onnx").exists()
+
+
+def test_onnx_vocoder_matches_eager(tmp_path, monkeypatch):
+    pytest.importorskip("onnxruntime")
+    monkeypatch.setattr(inference_backend, "ONNX_CACHE_DIR", str(tmp_path))
+    torch.manual_seed(0)
+    vocoder = SpeechT5HifiGan(SpeechT5HifiGanConfig(upsample_initial_channel=32)).eval()
+    onnx_vocoder = OnnxVocoder(vocoder, "tiny-vocoder")
+
+    with torch.no_grad():
+        for spectrogram in (torch.randn(40, 80), torch.randn(2, 30, 80)):
+            expected = vocoder(spectrogram)
+            actual = onnx_vocoder(spectrogram)
+            assert actual.shape == expected.shape
+            assert torch.allclose(actual, expected, atol=1e-4)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from models.lexical_index import LexicalIndex
+
+LINES = [
+    "Twinkle, twinkle, little star",
+    "How I wonder what you are",
+    "All I want for Christmas is you",
+    "I don't care about the presents",
+    "いつか誰かとまた恋に落ちても",
+    "立ち止まる時間が",
+    "颳風這天 我試過握著你手",
+    "Bintang kecil di langit yang biru",
+]
+
+
+def best_line(index, query, mask=None):
+    candidates = index.search(query, k=5, mask=mask).candidates
+    return LINES[candidates[0][0]] if candidates else None
+
+
+def test_misspelled_and_unsegmented_queries_find_their_line():
+    index = LexicalIndex(LINES)
+    assert best_line(index, "twinkle twinkle litle stars") == LINES[0]
+    assert best_line(index, "i dont care about the presence") == LINES[3]
+    assert best_line(index, "立ち止まる") == LINES[5]
+    assert best_line(index, "誰かとまた恋に") == LINES[4]
+    assert best_line(index, "bintang kecil dilangit") == LINES[7]
+    assert index.search("zzzz qqqq").candidates == []
+
+
+def test_exact_line_scores_one_and_mask_excludes_rows():
+    index = LexicalIndex(LINES)
+    row, similarity = index.search("all i want for christmas is you!").candidates[0]
+    assert (row, similarity) == (2, pytest.approx(1.0))
+
+    mask = np.ones(len(LINES), dtype=bool)
+    mask[2] = False
+    assert best_line(index, "All I want for Christmas is you", mask) != LINES[2]
+
+
+def test_extend_matches_a_fresh_build():
+    extended = LexicalIndex(LINES[:3]).extend(LINES[3:6]).extend(LINES[6:])
+    fresh = LexicalIndex(LINES)
+    for query in ["twinkle little", "恋に落ちても", "what you are", "握著你手"]:
+        assert extended.search(query).candidates == fresh.search(query).candidates
+
+
+SONGS = [{"id": f"song_{i}", "title": f"Song {i}", "artist": "Traditional", "language": "en-US",
+          "difficulty": "Easy", "lyrics": LINES[i * 2:i * 2 + 2]} for i in range(4)]
+
+
+def test_near_exact_lines_skip_the_encoder(make_rag, monkeypatch):
+    monkeypatch.setenv("LYRICS_RETRIEVAL", "hybrid")
+    rag = make_rag(SONGS)
+    indexed = rag.model.encoded
+
+    result = rag.get_next_line("twinkle twinkle little star")
+    assert result["matched_line"] == LINES[0] and result["next_lines"] == [LINES[1]]
+    assert rag.get_next_line("いつか誰かとまた恋に落ちても")["song_id"] == "song_2"
+    assert rag.model.encoded == indexed and rag.lexical_resolved == 2
+
+    # A loose match goes through the encoder and fusion
+    rag.get_next_line("wonder about stars")
+    assert rag.model.encoded == indexed + 1
+
+
+def test_lexical_mode_never_encodes_and_dense_mode_always_does(make_rag, monkeypatch):
+    monkeypatch.setenv("LYRICS_RETRIEVAL", "lexical")
+    rag = make_rag(SONGS)
+    indexed = rag.model.encoded
+    assert rag.get_next_line("christmas is you")["matched_line"] == LINES[2]
+    rag.get_next_line("wonder about stars")
+    assert rag.model.encoded == indexed
+
+    rag.retrieval = "dense"
+    rag.get_next_line("twinkle twinkle little star")
+    assert rag.model.encoded == indexed + 1 and rag.lexical_resolved == 2
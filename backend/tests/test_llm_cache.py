@@ -0,0 +1,105 @@
+import asyncio
+from benchmarks.hf_stub import create_app
+from models.llm_cache import LLMResponseCache
+
+
+def test_concurrent_identical_prompts_share_one_call(make_llm_service):
+    stub = create_app(first_token_ms=50)
+
+    async def run():
+        service = make_llm_service(stub)
+        results = await asyncio.gather(*(service.explain_lyrics("Up above the world so high") for _ in range(10)))
+        await service.aclose()
+        return service, results
+
+    service, results = asyncio.run(run())
+    assert len(stub.state.prompts) == 1
+    assert len(set(results)) == 1
+    assert service.coalesced == 9
+
+
+def test_responses_persist_and_max_words_is_part_of_the_key(make_llm_service):
+    stub = create_app(first_token_ms=50)
+
+    async def run():
+        service = make_llm_service(stub)
+        first = await service.explain_lyrics("Like a diamond in the sky", max_words=10)
+        await service.explain_lyrics("Like a diamond in the sky", max_words=5)
+        await service.aclose()
+
+        # A new process only has the SQLite tier
+        restarted = make_llm_service(stub)
+        again = await restarted.explain_lyrics("Like a diamond in the sky", max_words=10)
+        await restarted.aclose()
+        return first, again, restarted
+
+    first, again, restarted = asyncio.run(run())
+    assert len(stub.state.prompts) == 2
+    assert first == again
+    assert restarted.cache.stats()["disk_hits"] == 1
+
+
+def test_disk_entries_are_counted_without_scanning_the_table(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMResponseCache(path)
+    for key, response in (("a", "one"), ("b", "two"), ("a", "three")):
+        cache.put(key, "model", "prompt", {}, response)
+    assert cache.stats()["disk_entries"] == 2
+    cache.close()
+
+    reopened = LLMResponseCache(path, memory_items=1)
+    assert reopened.stats()["disk_entries"] == 2
+    assert reopened.get("a") == "three"
+    reopened.close()
+
+
+def test_failures_fall_back_and_are_not_cached(make_llm_service):
+    stub = create_app(first_token_ms=50, status=503)
+
+    async def run():
+        service = make_llm_service(stub)
+        first = await service.explain_lyrics("Twinkle twinkle little star")
+        second = await service.explain_lyrics("Twinkle twinkle little star")
+        await service.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == "Meaning: Twinkle twinkle little star (unavailable)"
+    assert len(stub.state.prompts) == 2
+
+
+def test_prefetch_explains_uncached_lines_once(make_llm_service):
+    stub = create_app()
+    lines = ["Line one", "Line two", "Line one", "Line three"]
+
+    async def run():
+        service = make_llm_service(stub)
+        await service.explain_lyrics("Line two")
+        generated = await service.start_prefetch(lines)
+        await service.aclose()
+        return generated
+
+    assert asyncio.run(run()) == 2
+    assert len(stub.state.prompts) == 3
+
+
+def test_prefetch_burst_leaves_room_for_user_requests(make_llm_service, monkeypatch):
+    monkeypatch.setenv("LLM_QUEUE_MAX_SIZE", "4")
+    monkeypatch.setenv("LLM_PREFETCH_CONCURRENCY", "4")
+    monkeypatch.setenv("LLM_PREFETCH_RESERVE", "2")
+    stub = create_app(first_token_ms=200)
+
+    async def run():
+        service = make_llm_service(stub)
+        # Several songs started at once
+        jobs = [service.start_prefetch([f"Song {song} line {i}" for i in range(5)]) for song in range(3)]
+        await asyncio.sleep(0.05)
+        prefetching = service.pending
+        explanation = await service.explain_lyrics("The line the user asked about")
+        await asyncio.gather(*jobs)
+        await service.aclose()
+        return prefetching, explanation
+
+    prefetching, explanation = asyncio.run(run())
+    assert prefetching == 2
+    assert "the user asked about" in explanation
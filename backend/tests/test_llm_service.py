@@ -1,21 +1,49 @@
-import pytest
-from models.llm_service import llm_service
+import asyncio
+from benchmarks.hf_stub import explanation_for
 
-def test_explanation_length():
+# The serverless HF API route of the stub; make_llm_service uses its TGI route by default
+HF_API_URL = "http://hf-stub/models/test-model"
+
+
+def test_explanation_length(llm_stub, make_llm_service):
     lyrics = "Up above the world so high"
-    explanation = llm_service.explain_lyrics(lyrics, max_words=10)
-    
-    assert explanation is not None
-    assert isinstance(explanation, str)
-    assert len(explanation) > 0
+
+    async def run():
+        service = make_llm_service(llm_stub, HF_API_URL)
+        explanation = await service.explain_lyrics(lyrics, max_words=10)
+        await service.aclose()
+        return explanation
+
+    explanation = asyncio.run(run())
+    assert isinstance(explanation, str) and len(explanation) > 0
     # Check word count is reasonably close to limit (allow for "...")
-    assert len(explanation.split()) <= 15 
+    assert len(explanation.split()) <= 15
+    assert explanation.startswith("The singer says up above the world so high")
+
 
-def test_explanation_caching():
+def test_explanation_caching(llm_stub, make_llm_service):
     lyrics = "Like a diamond in the sky"
-    # First call
-    exp1 = llm_service.explain_lyrics(lyrics, max_words=10)
-    # Second call
-    exp2 = llm_service.explain_lyrics(lyrics, max_words=10)
-    
-    assert exp1 == exp2
+
+    async def run():
+        service = make_llm_service(llm_stub, HF_API_URL)
+        first = await service.explain_lyrics(lyrics, max_words=10)
+        second = await service.explain_lyrics(lyrics, max_words=10)
+        await service.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert llm_stub.state.requests["generate"] == 1
+
+
+def test_stub_streams_tgi_tokens(llm_stub, make_llm_service):
+    async def run():
+        service = make_llm_service(llm_stub)
+        pieces = [piece async for piece in service.explain_lyrics_stream("Like a diamond in the sky", max_words=30)]
+        await service.aclose()
+        return pieces
+
+    pieces = asyncio.run(run())
+    assert len(pieces) > 1
+    assert "".join(pieces) == explanation_for('"Like a diamond in the sky"').strip()
+    assert llm_stub.state.requests["generate_stream"] == 1
@@ -0,0 +1,77 @@
+import json
+import os
+import numpy as np
+import pytest
+from models.lyrics_index_store import LyricsIndexStore, flatten_songs
+
+SONGS = [
+    {"id": "a", "title": "A", "artist": "X", "language": "en-US", "difficulty": "Easy",
+     "lyrics": ["one line", "two lines here"]},
+    {"id": "b", "title": "B", "artist": "Y", "language": "ja-JP", "difficulty": "Hard",
+     "lyrics": ["solo"]},
+]
+
+
+@pytest.fixture
+def songs_file(write_songs):
+    return write_songs(SONGS)
+
+
+def test_second_load_uses_memory_mapped_index(songs_file, tmp_path, counting_encoder):
+    store = LyricsIndexStore(str(tmp_path / "index"))
+    encoder = counting_encoder
+
+    embeddings, metadatas = store.load_or_build(str(songs_file), encoder, "fake-model")
+    assert encoder.encoded == 3
+
+    loaded, loaded_meta = store.load_or_build(str(songs_file), encoder, "fake-model")
+    assert encoder.encoded == 3
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, embeddings)
+    assert loaded_meta == metadatas
+
+
+def test_metadata_round_trip_matches_flattened_songs(songs_file, tmp_path, counting_encoder):
+    store = LyricsIndexStore(str(tmp_path / "index"))
+    store.load_or_build(str(songs_file), counting_encoder, "fake-model")
+
+    _, expected = flatten_songs(json.loads(songs_file.read_text()))
+    _, loaded = store.load_or_build(str(songs_file), counting_encoder, "fake-model")
+
+    assert loaded == expected
+    assert loaded[1]["next_line"] == "END_OF_SONG"
+
+
+def test_rebuilds_when_songs_or_model_change(songs_file, tmp_path, counting_encoder):
+    store = LyricsIndexStore(str(tmp_path / "index"))
+    encoder = counting_encoder
+    store.load_or_build(str(songs_file), encoder, "fake-model")
+
+    store.load_or_build(str(songs_file), encoder, "other-model")
+    assert encoder.encoded == 6
+
+    songs = json.loads(songs_file.read_text())
+    songs[1]["lyrics"].append("another")
+    songs_file.write_text(json.dumps(songs))
+
+    _, metadatas = store.load_or_build(str(songs_file), encoder, "other-model")
+    assert encoder.encoded == 10
+    assert len(metadatas) == 4
+
+
+def test_a_save_interrupted_before_its_metadata_keeps_the_previous_index(songs_file, tmp_path, counting_encoder):
+    store = LyricsIndexStore(str(tmp_path / "index"))
+    encoder = counting_encoder
+    embeddings, metadatas = store.load_or_build(str(songs_file), encoder, "fake-model")
+    key = store.compute_key(str(songs_file), "fake-model")
+
+    # A crash after the new embeddings were written but before the metadata was
+    np.save(store.embeddings_path("interrupted"), np.ones((3, 3), dtype=np.float32))
+    loaded, loaded_meta = store.load(key)
+    np.testing.assert_array_equal(loaded, embeddings)
+    assert loaded_meta == metadatas
+
+    # The next completed save removes both older builds
+    store.load_or_build(str(songs_file), encoder, "fake-model", force=True)
+    assert len([name for name in os.listdir(store.index_dir) if name.endswith(".npy")]) == 1
+    assert encoder.encoded == 6
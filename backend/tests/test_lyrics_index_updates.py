@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import httpx
+import pytest
+from models.lyrics_rag import LyricsRAG
+from models.registry import model_registry
+
+
+def song(song_id, lyrics, language="en-US", difficulty="Easy"):
+    return {"id": song_id, "title": song_id.title(), "artist": "Traditional",
+            "language": language, "difficulty": difficulty, "lyrics": lyrics}
+
+
+SONGS = [
+    song("stars", ["twinkle twinkle little star", "how I wonder what you are", "up above the world so high"]),
+    song("boat", ["row row row your boat", "gently down the stream", "merrily merrily life is but a dream"]),
+    song("sheep", ["baa baa black sheep", "have you any wool", "yes sir three bags full"], difficulty="Medium"),
+    song("bridge", ["london bridge is falling down", "falling down falling down", "my fair lady"], language="en-GB"),
+]
+
+
+def queries(songs):
+    lines = [line for s in songs for line in s["lyrics"]]
+    lines += ["twinkle little star", "falling down", "row your boat down the stream", "three bags of wool"]
+    return [{"user_input": line, "top_k": 3, **filters}
+            for line in lines
+            for filters in ({}, {"language": "en-US"}, {"difficulty": "Medium"}, {"song_id": "stars"})]
+
+
+def comparable(results):
+    for result in results:
+        if result is not None:
+            result["confidence"] = round(result["confidence"], 5)
+            for candidate in result["candidates"]:
+                candidate["confidence"] = round(candidate["confidence"], 5)
+    return results
+
+
+@pytest.mark.parametrize("backend", ["exact", "ivf"])
+def test_edits_match_a_full_rebuild(make_rag, monkeypatch, backend):
+    # Probe every IVF list so approximate search cannot differ between the two indexes
+    monkeypatch.setenv("LYRICS_IVF_NLIST", "4")
+    monkeypatch.setenv("LYRICS_IVF_NPROBE", "4")
+    monkeypatch.setenv("LYRICS_COMPACT_RATIO", "0.5")
+    rag = make_rag(SONGS, "edited", word_hash=True, index_backend=backend)
+
+    final = [
+        song("stars", ["twinkle twinkle little star", "how I wonder what you are", "like a diamond in the sky"]),
+        song("sheep", ["baa baa black sheep", "have you any wool", "yes sir three bags full"], difficulty="Medium"),
+        song("bridge", ["london bridge is falling down", "build it up with iron bars", "my fair lady"],
+             language="en-GB", difficulty="Medium"),
+        song("frere", ["are you sleeping brother john", "morning bells are ringing"], language="fr-FR"),
+    ]
+    rag.upsert_song(final[0])
+    rag.delete_song("boat")
+    rag.upsert_song(song("frere", ["are you sleeping", "ding dang dong"], language="fr-FR"))
+    rag.upsert_song(final[2])
+    rag.upsert_song(final[3])
+    assert not rag.delete_song("boat")
+
+    rebuilt = make_rag(final, "rebuilt", word_hash=True, index_backend=backend)
+    assert comparable(rag.get_next_lines(queries(final))) == comparable(rebuilt.get_next_lines(queries(final)))
+
+    rag.compact()
+    assert rag.index_stats()["tombstones"] == 0
+    assert rag.index_stats()["rows"] == rebuilt.index_stats()["rows"]
+    assert comparable(rag.get_next_lines(queries(final))) == comparable(rebuilt.get_next_lines(queries(final)))
+
+
+def test_only_changed_lines_are_encoded_and_tombstones_compact(make_rag, monkeypatch):
+    monkeypatch.setenv("LYRICS_COMPACT_RATIO", "0.3")
+    rag = make_rag(SONGS, word_hash=True)
+    encoded = rag.model.encoded
+
+    stats = rag.upsert_song(song("stars", ["twinkle twinkle little star", "how I wonder what you are", "new line"]))
+    assert stats["encoded"] == rag.model.encoded - encoded == 1
+    assert stats["tombstones"] == 3
+
+    result = rag.get_next_line("how I wonder what you are")
+    assert result["song_id"] == "stars" and result["next_lines"] == ["new line"]
+
+    # Crossing LYRICS_COMPACT_RATIO drops the tombstones
+    rag.delete_song("boat")
+    assert rag.index_stats() == {"rows": 9, "tombstones": 0, "generation": rag.index_stats()["generation"]}
+    assert rag.get_next_line("row row row your boat", song_id="boat") is None
+
+
+def test_searches_during_updates_see_a_consistent_index(make_rag):
+    rag = make_rag(SONGS, word_hash=True)
+    stop = threading.Event()
+    errors = []
+
+    def edit():
+        i = 0
+        while not stop.is_set():
+            rag.upsert_song(song("boat", ["row row row your boat", f"verse {i}", "gently down the stream"]))
+            rag.delete_song("boat")
+            i += 1
+
+    writer = threading.Thread(target=edit)
+    writer.start()
+    try:
+        for _ in range(300):
+            result = rag.get_next_line("baa baa black sheep")
+            if result is None or result["next_lines"] != ["have you any wool", "yes sir three bags full"]:
+                errors.append(result)
+    finally:
+        stop.set()
+        writer.join()
+    assert errors == []
+
+
+def test_admin_api_edits_catalog_and_search(make_rag, monkeypatch):
+    import main
+    from models.song_catalog import song_catalog
+
+    rag = make_rag(SONGS, word_hash=True)
+    model_registry.provide("rag", rag)
+    monkeypatch.setattr(song_catalog, "data_path", rag.data_path)
+    monkeypatch.setattr(song_catalog, "_snapshot", None)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    body = {"title": "Frere", "artist": "Traditional", "language": "fr-FR", "difficulty": "Easy",
+            "lyrics": ["are you sleeping brother john", "morning bells are ringing"]}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        headers = {"X-Admin-Token": "secret"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            denied = await client.put("/api/admin/songs/frere", json=body)
+            created = await client.put("/api/admin/songs/frere", json=body, headers=headers)
+            deleted = await client.delete("/api/admin/songs/boat", headers=headers)
+            missing = await client.delete("/api/admin/songs/boat", headers=headers)
+        return denied, created, deleted, missing
+
+    denied, created, deleted, missing = asyncio.run(run())
+    assert denied.status_code == 401
+    assert created.json()["created"] and created.json()["encoded"] == 2
+    assert deleted.status_code == 200 and missing.status_code == 404
+
+    assert rag.get_next_line("are you sleeping brother john")["next_lines"] == ["morning bells are ringing"]
+    assert song_catalog.get("frere")["lyrics"] == body["lyrics"] and song_catalog.get("boat") is None
+
+    # The persisted index matches the edited file, so a restart encodes nothing
+    restarted = LyricsRAG(data_path=rag.data_path, index_dir=rag.index_store.index_dir, model=type(rag.model)())
+    assert restarted.model.encoded == 0
+    assert restarted.get_next_line("morning bells are ringing")["song_id"] == "frere"
+
+
+class FailingEncoder:
+    def encode(self, documents):
+        raise RuntimeError("encoder out of memory")
+
+
+def test_a_failed_admin_edit_leaves_the_catalog_and_index_unchanged(make_rag, monkeypatch):
+    import main
+    from models.song_catalog import song_catalog
+
+    rag = make_rag(SONGS, word_hash=True)
+    model_registry.provide("rag", rag)
+    monkeypatch.setattr(song_catalog, "data_path", rag.data_path)
+    monkeypatch.setattr(song_catalog, "_snapshot", None)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(rag, "model", FailingEncoder())
+    with open(rag.data_path) as f:
+        before = f.read()
+    body = {**SONGS[0], "lyrics": ["twinkle twinkle little star", "like a diamond in the sky"]}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.put("/api/admin/songs/stars", json=body, headers={"X-Admin-Token": "secret"})
+
+    response = asyncio.run(run())
+    assert response.status_code == 500
+    with open(rag.data_path) as f:
+        assert f.read() == before
+    assert song_catalog.get("stars")["lyrics"] == SONGS[0]["lyrics"]
+    assert rag.get_next_line("how I wonder what you are")["next_lines"] == ["up above the world so high"]
+
+
+def test_external_edits_of_the_songs_file_reach_search(make_rag, monkeypatch):
+    import json
+    from models.song_catalog import song_catalog
+
+    rag = make_rag(SONGS, word_hash=True)
+    model_registry.provide("rag", rag)
+    monkeypatch.setattr(song_catalog, "data_path", rag.data_path)
+    monkeypatch.setattr(song_catalog, "_snapshot", None)
+    song_catalog.reload_if_changed()
+
+    edited = [SONGS[0], {**SONGS[1], "lyrics": SONGS[1]["lyrics"][:2] + ["life is but a dream"]}, SONGS[3]]
+    with open(rag.data_path, "w") as f:
+        json.dump(edited, f)
+    encoded = rag.model.encoded
+    assert song_catalog.reload_if_changed()
+
+    # Only the changed line of the edited song was encoded; the removed song is gone
+    assert rag.model.encoded - encoded == 1
+    assert rag.get_next_line("gently down the stream")["next_lines"] == ["life is but a dream"]
+    assert rag.get_next_line("baa baa black sheep", song_id="sheep") is None
+
+    # The index was saved for the edited file, so a restart encodes nothing
+    restarted = LyricsRAG(data_path=rag.data_path, index_dir=rag.index_store.index_dir, model=type(rag.model)())
+    assert restarted.model.encoded == 0
@@ -1,30 +1,40 @@
 import pytest
-from models.lyrics_rag import lyrics_rag
+from sentence_transformers import SentenceTransformer
+from models.lyrics_rag import LyricsRAG
+from models.tiny_models import build_sentence_encoder
+
+
+@pytest.fixture(scope="module")
+def lyrics_rag(tmp_path_factory):
+    # The real catalog with the tiny random-weight encoder, so the test runs offline
+    encoder_dir = tmp_path_factory.mktemp("models") / "sentence_encoder"
+    build_sentence_encoder(str(encoder_dir))
+    index_dir = tmp_path_factory.mktemp("index")
+    return LyricsRAG(data_path="data/songs.json", index_dir=str(index_dir),
+                     model=SentenceTransformer(str(encoder_dir), device="cpu"))
+
+
+def test_basic_retrieval(lyrics_rag):
+    # Exact match from Twinkle Twinkle
+    result = lyrics_rag.get_next_line("Twinkle twinkle little star")
 
-def test_basic_retrieval():
-    # Test with exact match from Twinkle Twinkle
-    user_input = "Twinkle twinkle little star"
-    result = lyrics_rag.get_next_line(user_input, "twinkle_star")
-    
-    assert result is not None
-    assert result['next_line'] == "How I wonder what you are"
-    assert result['is_correct'] is True
-
-def test_retrieval_with_slight_mismatch():
-    # Test with slight mismatch
-    user_input = "twinkle twinkle little stars" # plural
-    result = lyrics_rag.get_next_line(user_input, "twinkle_star")
-    
     assert result is not None
-    assert result['next_line'] == "How I wonder what you are"
-    # Should still be correct due to semantic similarity
-    assert result['is_correct'] is True
-
-def test_wrong_song_id():
-    user_input = "Twinkle twinkle little star"
-    result = lyrics_rag.get_next_line(user_input, "christmas_you")
-    
-    # Should return a result (best match in wrong song) but marked as incorrect
+    assert result['song_id'] == "twinkle_star"
+    assert result['next_lines'][0] == "How I wonder what you are"
+
+
+def test_retrieval_with_slight_mismatch(lyrics_rag):
+    result = lyrics_rag.get_next_line("twinkle twinkle little stars") # plural
+
     assert result is not None
-    assert result['is_correct'] is False
-    assert result['confidence'] < 0.6
+    assert result['song_id'] == "twinkle_star"
+    assert result['next_lines'][0] == "How I wonder what you are"
+
+
+def test_song_filter(lyrics_rag):
+    exact = lyrics_rag.get_next_line("Twinkle twinkle little star", song_id="twinkle_star")
+    other = lyrics_rag.get_next_line("Twinkle twinkle little star", song_id="christmas_you")
+
+    assert exact['song_id'] == "twinkle_star"
+    # Only lines of the requested song can match, and none of them is the sung line
+    assert other is None or (other['song_id'] == "christmas_you" and other['confidence'] < exact['confidence'])
@@ -0,0 +1,98 @@
+import asyncio
+import re
+import httpx
+import numpy as np
+import torch
+from models import tts_model
+from models.metrics import MetricsRegistry, stage_duration
+from models.registry import model_registry
+from models.speaker_embeddings import SpeakerEmbeddingStore
+from models.tiny_models import build_hifigan, build_speecht5, build_tiny_voices
+
+
+def sample(text: str, name: str, **labels) -> float:
+    """Value of one sample in Prometheus text output"""
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    series = f"{name}{{{selector}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{series} not found"
+    return float(match.group(1))
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "decode")
+    gauge = registry.gauge("depth", "Queue depth", ("queue",))
+    gauge.set(3, 'a "quoted"\nname')
+    registry.add_collector(lambda: registry.counter("scrapes_total", "Scrapes").inc())
+
+    text = registry.render()
+    assert sample(text, "stage_seconds_bucket", stage="decode", le="0.1") == 2
+    assert sample(text, "stage_seconds_bucket", stage="decode", le="1.0") == 3
+    assert sample(text, "stage_seconds_bucket", stage="decode", le="+Inf") == 4
+    assert sample(text, "stage_seconds_count", stage="decode") == 4
+    assert sample(text, "stage_seconds_sum", stage="decode") == 3.65
+    assert 'depth{queue="a \\"quoted\\"\\nname"} 3.0' in text
+    assert "# TYPE stage_seconds histogram" in text and "scrapes_total 1.0" in text
+
+
+def test_metrics_endpoint_reports_routes_stages_and_caches(make_rag, monkeypatch):
+    import main
+
+    monkeypatch.setenv("LYRICS_RETRIEVAL", "hybrid")
+    model_registry.provide("rag", make_rag())
+    encodes = stage_duration.count("query_encode")
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for line in ["twinkle twinkle little star", "wonder about stars", "wonder about stars"]:
+                await client.post("/api/lyrics/next", json={"sung_lyrics": line})
+            await client.get("/api/lyrics/songs/unknown_song")
+            return await client.get("/metrics")
+
+    response = asyncio.run(run())
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    assert sample(text, "http_request_duration_seconds_count",
+                  method="POST", route="/api/lyrics/next", status="200") >= 3
+    # Labelled by route template, not by the requested path
+    assert sample(text, "http_request_duration_seconds_count",
+                  method="GET", route="/api/lyrics/songs/{song_id}", status="404") >= 1
+    assert stage_duration.count("query_encode") == encodes + 1
+    assert sample(text, "pipeline_stage_duration_seconds_count", stage="lexical_search") >= 2
+    assert sample(text, "cache_hits_total", cache="lyrics_result") >= 1
+    assert sample(text, "model_ready", model="rag") == 1
+    assert sample(text, "model_memory_bytes", model="rag") > 0
+    assert sample(text, "batcher_items_total", batcher="lyrics_query_batcher") >= 3
+    assert sample(text, "process_resident_memory_bytes") > 0
+
+
+def test_timed_vocoder_stage_matches_generate_speech(tmp_path, monkeypatch):
+    build_speecht5(str(tmp_path / "tts"))
+    build_hifigan(str(tmp_path / "vocoder"))
+    voices = SpeakerEmbeddingStore(str(tmp_path / "voices"))
+    build_tiny_voices(voices)
+    monkeypatch.setattr(tts_model, "TTS_MODEL_ID", str(tmp_path / "tts"))
+    monkeypatch.setattr(tts_model, "VOCODER_MODEL_ID", str(tmp_path / "vocoder"))
+    monkeypatch.setattr(tts_model, "speaker_embedding_store", voices)
+    model = tts_model.TTSModel(backend="eager")
+
+    texts = ["Hi there", "How I wonder what you are"]
+    inputs = model.processor(text=texts, padding=True, return_tensors="pt")
+    speakers = torch.cat([model.speaker_embedding("default")] * 2)
+    with torch.no_grad():
+        single = model.model.generate_speech(inputs["input_ids"][:1, :inputs["attention_mask"][0].sum()],
+                                             speakers[:1], vocoder=model.vocoder)
+        waveforms, lengths = model.model.generate_speech(inputs["input_ids"], speakers,
+                                                         attention_mask=inputs["attention_mask"],
+                                                         vocoder=model.vocoder, return_output_lengths=True)
+
+    assert np.allclose(model.generate(texts[0]), single.numpy(), atol=1e-5)
+    batched = model.generate_batch(texts)
+    for i, length in enumerate(lengths):
+        assert np.allclose(batched[i], waveforms[i, :length].numpy(), atol=1e-5)
+    assert stage_duration.count("vocoder") >= 2
@@ -0,0 +1,86 @@
+import asyncio
+import time
+import httpx
+from models.practice_sessions import PracticeSessionStore
+from models.registry import model_registry
+
+
+# The same line in two songs: a global search always picks the first one
+SONGS = [
+    {"id": "bridge", "title": "London Bridge", "artist": "Traditional", "language": "en-GB", "difficulty": "Easy",
+     "lyrics": ["london bridge is falling down", "falling down falling down", "my fair lady"]},
+    {"id": "rain", "title": "Rain", "artist": "Traditional", "language": "en-US", "difficulty": "Easy",
+     "lyrics": ["the rain keeps coming", "drops on the window", "falling down falling down", "puddles everywhere",
+                "umbrellas open wide", "clouds drift away", "the sun comes out", "rainbow in the sky"]},
+]
+
+
+def test_session_window_prefers_the_current_song(make_rag):
+    rag = make_rag(SONGS, word_hash=True)
+    sessions = PracticeSessionStore()
+    session = sessions.create("rain")
+
+    assert rag.get_next_line("falling down falling down")["song_id"] == "bridge"
+
+    for line in ["the rain keeps coming", "drops on the window", "falling down falling down"]:
+        result = rag.get_next_lines([{"user_input": line, "window": session.window()}])[0]
+        session.record(result)
+        assert result["source"] == "window"
+
+    assert result["song_id"] == "rain"
+    assert result["next_lines"] == ["puddles everywhere", "umbrellas open wide"]
+    assert session.line_number == 2 and rag.window_hits == 3
+
+
+def test_low_window_confidence_falls_back_to_global_search(make_rag):
+    rag = make_rag(SONGS, word_hash=True)
+    session = PracticeSessionStore().create("rain")
+
+    # Past the window: the user skipped ahead in the song
+    result = rag.get_next_lines([{"user_input": "rainbow in the sky", "window": session.window()}])[0]
+    session.record(result)
+    assert result["source"] == "global" and result["song_id"] == "rain"
+    assert session.line_number == 7
+
+    # Another song entirely: the session follows it
+    result = rag.get_next_lines([{"user_input": "my fair lady", "window": session.window()}])[0]
+    session.record(result)
+    assert (session.song_id, session.line_number, session.fallbacks) == ("bridge", 2, 2)
+    assert rag.window_fallbacks == 2
+
+
+def test_store_is_bounded_and_sessions_expire():
+    sessions = PracticeSessionStore(max_sessions=2, ttl_seconds=0.2)
+    first, second, third = (sessions.create("rain") for _ in range(3))
+    assert sessions.get(first.session_id) is None
+    assert sessions.get(third.session_id) is third
+
+    time.sleep(0.25)
+    assert sessions.get(second.session_id) is None
+    assert sessions.stats()["created"] == 3
+
+
+def test_start_and_next_endpoints_track_the_session(make_rag, monkeypatch):
+    import main
+    from models.song_catalog import song_catalog
+
+    rag = make_rag(SONGS, word_hash=True)
+    model_registry.provide("rag", rag)
+    monkeypatch.setattr(song_catalog, "data_path", rag.data_path)
+    monkeypatch.setattr(song_catalog, "_snapshot", None)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = await client.post("/api/lyrics/start", json={"song_id": "rain"})
+            session_id = started.json()["session_id"]
+            await client.post("/api/lyrics/next", json={"sung_lyrics": "drops on the window", "session_id": session_id})
+            matched = await client.post("/api/lyrics/next", json={"sung_lyrics": "falling down falling down",
+                                                                   "session_id": session_id})
+            expired = await client.post("/api/lyrics/next", json={"sung_lyrics": "x", "session_id": "unknown"})
+        return matched, expired
+
+    matched, expired = asyncio.run(run())
+    assert matched.json()["song_id"] == "rain" and matched.json()["source"] == "window"
+    assert matched.json()["matched_line_number"] == 2
+    assert expired.status_code == 404
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import pstats
+import httpx
+import torch
+from models.batching import AsyncBatcher
+from models.profiling import RequestProfiler, current_capture, profiler
+from models.registry import model_registry
+
+
+def test_armed_route_is_profiled_for_the_next_requests_only(tmp_path):
+    requests_profiler = RequestProfiler(str(tmp_path), max_captures=2)
+    assert requests_profiler.select("POST", "/api/stt/transcribe") is None
+
+    requests_profiler.arm("/api/stt/transcribe", 2)
+    assert requests_profiler.select("POST", "/api/tts/synthesize") is None
+    captures = [requests_profiler.select("POST", "/api/stt/transcribe") for _ in range(3)]
+    assert captures[0] and captures[1] and captures[2] is None
+    assert requests_profiler.armed() == {}
+
+    weights = torch.randn(64, 64)
+    result = requests_profiler.run_stage(captures[:2], "whisper_batcher", lambda x: (x @ weights).sum(), torch.ones(8, 64))
+    assert torch.is_tensor(result)
+    for capture in captures[:2]:
+        requests_profiler.finish(capture, 200, 0.5)
+    # The oldest capture goes once the limit is exceeded
+    forced = requests_profiler.select("GET", "/health", forced=True)
+    requests_profiler.finish(forced, 200, 0.1)
+
+    listed = requests_profiler.list_captures()
+    assert [c["id"] for c in listed] == [forced.id, captures[1].id]
+    stage = listed[1]["stages"][0]
+    assert stage["name"] == "whisper_batcher"
+    assert set(stage["files"]) <= set(listed[1]["files"])
+    trace = json.load(open(requests_profiler.file_path(captures[1].id, "01-whisper_batcher.trace.json")))
+    assert any("matmul" in event.get("name", "") for event in trace["traceEvents"])
+    assert requests_profiler.file_path(captures[1].id, "../meta.json") is None
+
+
+def test_batcher_profiles_only_batches_with_a_captured_request(tmp_path, monkeypatch):
+    requests_profiler = RequestProfiler(str(tmp_path), torch_trace=False)
+    capture = requests_profiler.select("POST", "/api/lyrics/next", forced=True)
+
+    async def run():
+        batcher = AsyncBatcher(lambda items: [item * 2 for item in items], max_wait_ms=0, name="doubler")
+        plain = await batcher.submit(1)
+        token = current_capture.set(capture)
+        try:
+            profiled = await batcher.submit(2)
+        finally:
+            current_capture.reset(token)
+        return plain, profiled
+
+    monkeypatch.setattr(profiler, "run_stage", requests_profiler.run_stage)
+    assert asyncio.run(run()) == (2, 4)
+    assert [stage["name"] for stage in capture.stages] == ["doubler"]
+
+
+def test_admin_endpoints_arm_list_and_download(tmp_path, monkeypatch, make_rag):
+    import main
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "profile_dir", str(tmp_path / "profiles"))
+    model_registry.provide("rag", make_rag())
+    admin = {"X-Admin-Token": "secret"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.post("/api/admin/profiles", json={"route": "/api/lyrics/next"})).status_code == 401
+            armed = await client.post("/api/admin/profiles", json={"route": "/api/lyrics/next", "requests": 1},
+                                      headers=admin)
+            assert armed.json()["armed"]["/api/lyrics/next"]["remaining"] == 1
+
+            first = await client.post("/api/lyrics/next", json={"sung_lyrics": "wonder about the stars"})
+            second = await client.post("/api/lyrics/next", json={"sung_lyrics": "wonder about a star"})
+            # X-Profile only counts with the admin token
+            ignored = await client.post("/api/lyrics/next", json={"sung_lyrics": "little star"},
+                                        headers={"X-Profile": "1"})
+            forced = await client.post("/api/lyrics/next", json={"sung_lyrics": "twinkle little star"},
+                                       headers={"X-Profile": "1", **admin})
+            listed = (await client.get("/api/admin/profiles", headers=admin)).json()
+            capture = next(c for c in listed["captures"] if c["id"] == first.headers["X-Profile-Id"])
+            prof_file = next(name for name in capture["files"] if name.endswith(".prof"))
+            download = await client.get(f"/api/admin/profiles/{capture['id']}/{prof_file}", headers=admin)
+            missing = await client.get(f"/api/admin/profiles/{capture['id']}/nothing.prof", headers=admin)
+            return first, second, ignored, forced, listed, capture, download, missing
+
+    first, second, ignored, forced, listed, capture, download, missing = asyncio.run(run())
+    assert "X-Profile-Id" not in second.headers and "X-Profile-Id" not in ignored.headers
+    assert forced.headers["X-Profile-Id"] != first.headers["X-Profile-Id"]
+    assert listed["armed"] == {} and len(listed["captures"]) == 2
+    assert capture["route"] == "/api/lyrics/next" and capture["status"] == 200
+    assert capture["stages"][0]["name"] == "lyrics_query_batcher"
+
+    assert download.status_code == 200 and missing.status_code == 404
+    prof_path = tmp_path / "downloaded.prof"
+    prof_path.write_bytes(download.content)
+    assert pstats.Stats(str(prof_path)).total_calls > 0
@@ -0,0 +1,67 @@
+import threading
+import pytest
+from models.registry import ModelRegistry, ModelNotReadyError
+
+
+def test_eager_models_load_concurrently_in_background():
+    release = threading.Event()
+    started = []
+
+    def loader(name):
+        def load():
+            started.append(name)
+            release.wait(5)
+            return name.upper()
+        return load
+
+    registry = ModelRegistry()
+    registry.register("a", loader("a"))
+    registry.register("b", loader("b"))
+    registry.start()
+
+    with pytest.raises(ModelNotReadyError) as excinfo:
+        registry.get("a")
+    assert excinfo.value.state == "loading"
+
+    # Both loaders are running at the same time
+    for _ in range(100):
+        if len(started) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert sorted(started) == ["a", "b"]
+
+    release.set()
+    assert registry.get("a", wait=True) == "A"
+    assert registry.get("b", wait=True) == "B"
+    status = registry.status()
+    assert status["a"]["state"] == "ready"
+    assert status["a"]["load_seconds"] >= 0
+
+
+def test_lazy_model_loads_on_first_use():
+    calls = []
+    registry = ModelRegistry()
+    registry.register("lazy", lambda: calls.append(1) or "model", lazy=True)
+    registry.start()
+    assert registry.status()["lazy"]["state"] == "pending"
+    assert calls == []
+
+    assert registry.get("lazy", wait=True) == "model"
+    assert registry.get("lazy") == "model"
+    assert calls == [1]
+
+
+def test_failed_load_is_reported():
+    def broken():
+        raise OSError("weights not found")
+
+    registry = ModelRegistry()
+    registry.register("broken", broken)
+    with pytest.raises(RuntimeError):
+        registry.get("broken", wait=True)
+
+    status = registry.status()["broken"]
+    assert status["state"] == "failed"
+    assert "weights not found" in status["error"]
+    with pytest.raises(ModelNotReadyError):
+        registry.ensure_ready("broken")
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import httpx
+import pytest
+from models.song_catalog import SongCatalog, InvalidCursorError
+
+SONGS = [
+    {"id": f"song_{i}", "title": f"Song {i}", "artist": "Traditional",
+     "language": "en-US" if i % 2 else "ja-JP", "difficulty": "Easy" if i < 3 else "Medium",
+     "lyrics": [f"Line one of {i}", f"Line two of {i}"]}
+    for i in range(6)
+]
+
+
+def write_songs(path, songs):
+    path.write_text(json.dumps(songs))
+    # Make the change visible even on filesystems with coarse mtimes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_pages_follow_the_cursor_and_filters(tmp_path):
+    path = tmp_path / "songs.json"
+    write_songs(path, SONGS)
+    snapshot = SongCatalog(str(path)).snapshot
+
+    ids, cursor = [], None
+    while True:
+        body, etag, cursor = snapshot.page(language="en-US", cursor=cursor, limit=2)
+        page = json.loads(body)
+        assert all("lyrics" not in song for song in page)
+        ids += [song["id"] for song in page]
+        if cursor is None:
+            break
+    assert ids == ["song_1", "song_3", "song_5"]
+
+    body, _, cursor = snapshot.page(difficulty="easy")
+    assert [song["id"] for song in json.loads(body)] == ["song_0", "song_1", "song_2"]
+    assert cursor is None
+
+    with pytest.raises(InvalidCursorError):
+        snapshot.page(cursor="bm9wZQ")
+
+
+def test_reload_swaps_snapshot_and_keeps_old_one_on_bad_file(tmp_path):
+    path = tmp_path / "songs.json"
+    write_songs(path, SONGS)
+    catalog = SongCatalog(str(path))
+    before = catalog.snapshot
+    _, etag, _ = before.page()
+
+    assert catalog.reload_if_changed() is False
+    write_songs(path, SONGS[:2])
+    assert catalog.reload_if_changed() is True
+    assert catalog.get("song_5") is None
+    _, new_etag, _ = catalog.snapshot.page()
+    assert new_etag != etag
+    # Readers holding the old snapshot still see the old catalog
+    assert "song_5" in before.songs
+
+    path.write_text("[{not json")
+    assert catalog.reload_if_changed() is False
+    assert catalog.get("song_1")["lyrics"] == SONGS[1]["lyrics"]
+    assert catalog.reloads == 1
+
+
+def test_songs_endpoints_serve_etags_and_cursors(tmp_path, monkeypatch):
+    import main
+    from models.song_catalog import song_catalog
+
+    path = tmp_path / "songs.json"
+    write_songs(path, SONGS)
+    monkeypatch.setattr(song_catalog, "data_path", str(path))
+    monkeypatch.setattr(song_catalog, "_snapshot", None)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/api/lyrics/songs", params={"limit": 4})
+            rest = await client.get("/api/lyrics/songs", params={"limit": 4, "cursor": first.headers["x-next-cursor"]})
+            cached = await client.get("/api/lyrics/songs", params={"limit": 4},
+                                      headers={"If-None-Match": first.headers["etag"]})
+            bad_cursor = await client.get("/api/lyrics/songs", params={"cursor": "!!"})
+            one = await client.get("/api/lyrics/songs/song_2")
+            missing = await client.get("/api/lyrics/songs/unknown")
+        return first, rest, cached, bad_cursor, one, missing
+
+    first, rest, cached, bad_cursor, one, missing = asyncio.run(run())
+    assert [song["id"] for song in first.json() + rest.json()] == [song["id"] for song in SONGS]
+    assert "x-next-cursor" not in rest.headers
+    assert cached.status_code == 304 and cached.content == b""
+    assert bad_cursor.status_code == 400
+    assert one.json()["lyrics"] == SONGS[2]["lyrics"] and one.headers["etag"]
+    assert missing.status_code == 404
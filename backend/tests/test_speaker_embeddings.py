@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from models.speaker_embeddings import SpeakerEmbeddingStore, extract_voices, DEFAULT_VOICE_ROW
+
+
+class FakeXVectorDataset:
+    """Rows of {"filename", "xvector"} with column access like a datasets.Dataset"""
+
+    def __init__(self, filenames):
+        self.rows = [{"filename": name, "xvector": [float(i)] * 4} for i, name in enumerate(filenames)]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return [row[key] for row in self.rows]
+        return self.rows[key]
+
+
+def test_store_round_trip_is_memory_mapped(tmp_path):
+    voices = {"default": np.ones(512, dtype=np.float32), "bdl": np.arange(512, dtype=np.float32)}
+    SpeakerEmbeddingStore(str(tmp_path)).save(voices)
+
+    store = SpeakerEmbeddingStore(str(tmp_path))
+    assert store.load()
+    assert isinstance(store.embeddings, np.memmap)
+    assert store.names() == ["default", "bdl"]
+    np.testing.assert_array_equal(store.get("bdl"), voices["bdl"])
+    assert "slt" not in store
+    with pytest.raises(KeyError):
+        store.get("slt")
+
+
+def test_missing_store_does_not_load(tmp_path):
+    store = SpeakerEmbeddingStore(str(tmp_path / "missing"))
+    assert not store.load()
+    assert store.names() == []
+
+
+def test_extract_voices_picks_default_row_and_one_row_per_speaker():
+    filenames = [f"cmu_us_{speaker}_arctic-wav-arctic_a{i:04d}"
+                 for speaker in ("bdl", "clb", "jmk", "ksp", "rms", "slt") for i in range(1300)]
+    voices = extract_voices(FakeXVectorDataset(filenames))
+
+    assert list(voices) == ["default", "bdl", "clb", "jmk", "ksp", "rms", "slt"]
+    assert voices["default"][0] == DEFAULT_VOICE_ROW
+    assert voices["clb"][0] == 1300
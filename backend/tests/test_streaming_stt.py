@@ -0,0 +1,178 @@
+import subprocess
+import sys
+import time
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from benchmarks.common import synthetic_speech
+from models.audio import FFMPEG_PATH, AudioDecodeError, StreamingDecoder, float_to_pcm16, pcm_to_float32
+from models.registry import model_registry
+from models.streaming_stt import StreamingTranscriber
+
+
+def _seconds(value, sample_rate=16000):
+    return np.zeros(int(value * sample_rate), dtype=np.float32)
+
+
+def test_decodes_every_step_of_new_audio():
+    transcriber = StreamingTranscriber(window_s=8, step_s=1, min_audio_s=0.5)
+    transcriber.add_audio(_seconds(0.4))
+    assert not transcriber.should_decode()
+
+    transcriber.add_audio(_seconds(0.6))
+    assert transcriber.should_decode()
+    transcriber.update("twinkle")
+    assert not transcriber.should_decode()
+
+
+def test_stable_text_is_agreement_of_consecutive_hypotheses():
+    transcriber = StreamingTranscriber(window_s=8, step_s=1)
+    transcriber.add_audio(_seconds(1))
+    first = transcriber.update("twinkle twinkle")
+    transcriber.add_audio(_seconds(1))
+    second = transcriber.update("twinkle twinkle little star")
+
+    assert first["stable_text"] == ""
+    assert second["stable_text"] == "twinkle twinkle"
+    assert second["text"] == "twinkle twinkle little star"
+
+
+def test_full_window_commits_a_final_segment():
+    transcriber = StreamingTranscriber(window_s=2, step_s=1)
+    transcriber.add_audio(_seconds(2))
+    update = transcriber.update("how I wonder")
+
+    assert update["final"] == "how I wonder"
+    assert len(transcriber.buffer) == 0
+
+    transcriber.add_audio(_seconds(1))
+    assert transcriber.update("what you are")["text"] == "how I wonder what you are"
+    assert transcriber.finish() == "how I wonder what you are"
+
+
+def test_pcm16_conversion_keeps_partial_samples():
+    samples, leftover = pcm_to_float32(np.array([0, 16384, -32768], dtype="<i2").tobytes() + b"\x01")
+    np.testing.assert_allclose(samples, [0.0, 0.5, -1.0])
+    assert leftover == b"\x01"
+
+
+# Stands in for ffmpeg where the stream is already float32 PCM: copies stdin to stdout as it arrives
+PASSTHROUGH = [sys.executable, "-c",
+               "import sys\nfor chunk in iter(lambda: sys.stdin.buffer.read1(65536), b''):\n"
+               "    sys.stdout.buffer.write(chunk); sys.stdout.buffer.flush()"]
+
+
+class RecordingWhisper:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_batch(self, audio_inputs, languages=None):
+        self.calls += len(audio_inputs)
+        return ["twinkle twinkle little star"] * len(audio_inputs)
+
+
+def test_decoder_process_returns_every_sample_once():
+    audio = synthetic_speech(3.0)
+    decoder = StreamingDecoder(command=PASSTHROUGH)
+    chunks = [audio[i:i + 1001].tobytes() for i in range(0, len(audio), 1001)]
+    try:
+        # Chunk boundaries split samples; the decoder keeps partial samples for later
+        decoded = [decoder.feed(chunks[0][:5]), decoder.feed(chunks[0][5:])]
+        decoded += [decoder.feed(chunk) for chunk in chunks[1:]]
+        decoded.append(decoder.finish())
+    finally:
+        decoder.close()
+    np.testing.assert_array_equal(np.concatenate(decoded), audio)
+    assert decoder.bytes_in == audio.nbytes
+
+
+def test_webm_stream_feeds_each_chunk_to_the_decoder_once(monkeypatch):
+    import main
+    from routers import stt
+
+    decoders = []
+
+    def passthrough_decoder():
+        decoders.append(StreamingDecoder(command=PASSTHROUGH))
+        return decoders[-1]
+
+    whisper = RecordingWhisper()
+    model_registry.provide("stt", whisper)
+    monkeypatch.setattr(stt, "StreamingDecoder", passthrough_decoder)
+
+    # 40 chunks of 250 ms, as MediaRecorder sends them
+    audio = synthetic_speech(10.0)
+    chunks = [audio[i:i + 4000].tobytes() for i in range(0, len(audio), 4000)]
+    with TestClient(main.app).websocket_connect("/api/stt/stream?format=webm") as socket:
+        for chunk in chunks:
+            socket.send_bytes(chunk)
+        socket.send_text("stop")
+        messages = []
+        while not messages or not messages[-1].get("done"):
+            messages.append(socket.receive_json())
+
+    # Every byte is decoded once, not the whole stream again for every chunk
+    assert decoders[0].bytes_in == sum(len(chunk) for chunk in chunks)
+    assert messages[-1]["text"].startswith("twinkle twinkle little star")
+    assert any(message["type"] == "partial" for message in messages) and whisper.calls >= 9
+
+
+def test_streams_over_the_limit_are_closed_with_1009(monkeypatch):
+    import main
+    from routers import stt
+
+    model_registry.provide("stt", RecordingWhisper())
+    monkeypatch.setattr(stt, "STREAM_MAX_S", 2.0)
+    chunk = float_to_pcm16(synthetic_speech(0.5))
+
+    with TestClient(main.app).websocket_connect("/api/stt/stream?format=pcm16") as socket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            for _ in range(10):
+                socket.send_bytes(chunk)
+            while True:
+                socket.receive_json()
+    assert closed.value.code == 1009
+
+
+@pytest.mark.skipif(FFMPEG_PATH is None, reason="ffmpeg is not installed")
+def test_ffmpeg_decodes_webm_chunks_at_a_flat_cost():
+    audio = synthetic_speech(20.0)
+    encoded = subprocess.run(
+        [FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-f", "f32le", "-ar", "16000", "-ac", "1", "-i", "pipe:0",
+         "-c:a", "libopus", "-f", "webm", "pipe:1"],
+        input=audio.tobytes(), capture_output=True, check=True
+    ).stdout
+    chunks = [encoded[i:i + 4096] for i in range(0, len(encoded), 4096)]
+
+    decoder = StreamingDecoder()
+    timings, decoded = [], []
+    try:
+        for chunk in chunks:
+            start = time.perf_counter()
+            decoded.append(decoder.feed(chunk))
+            timings.append(time.perf_counter() - start)
+        decoded.append(decoder.finish())
+    finally:
+        decoder.close()
+
+    assert abs(len(np.concatenate(decoded)) - len(audio)) < 0.1 * 16000
+    # The last chunks cost no more than the first ones
+    quarter = max(1, len(timings) // 4)
+    assert sum(timings[-quarter:]) < 3 * sum(timings[:quarter]) + 0.05
+
+
+def test_a_decoder_flooding_stderr_does_not_block_its_input():
+    # Like ffmpeg on a corrupt stream: an error line for every packet, far more than a pipe buffer holds
+    noisy = [sys.executable, "-c",
+             "import sys\nfor chunk in iter(lambda: sys.stdin.buffer.read1(65536), b''):\n"
+             "    sys.stderr.write('Invalid data found when processing input\\n' * 1000); sys.stderr.flush()\n"
+             "sys.exit(1)"]
+    decoder = StreamingDecoder(command=noisy)
+    try:
+        for _ in range(20):
+            decoder.feed(b"\0" * 4096)
+        with pytest.raises(AudioDecodeError, match="Invalid data"):
+            decoder.finish()
+    finally:
+        decoder.close()
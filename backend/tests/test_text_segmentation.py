@@ -0,0 +1,26 @@
+from models.text_segmentation import split_text_for_tts
+
+
+def test_splits_on_sentences_and_keeps_text():
+    text = "Smooth like butter. Like a criminal undercover! Gon' pop like trouble?"
+    chunks = split_text_for_tts(text, max_chars=30)
+
+    assert chunks[0] == "Smooth like butter."
+    assert " ".join(chunks) == text
+
+
+def test_first_chunk_is_a_short_clause():
+    text = ("Twinkle, twinkle, little star, how I wonder what you are, "
+            "up above the world so high, like a diamond in the sky.")
+    chunks = split_text_for_tts(text, first_max_chars=60, first_min_chars=20)
+
+    assert chunks[0] == "Twinkle, twinkle, little star,"
+    assert " ".join(chunks) == text
+
+
+def test_cjk_sentences_and_overlong_text():
+    assert split_text_for_tts("明日の今頃には。わたしはきっと泣いてる。", max_chars=10) == [
+        "明日の今頃には。", "わたしはきっと泣いてる。"
+    ]
+    assert all(len(chunk) <= 20 for chunk in split_text_for_tts("word " * 50, max_chars=20))
+    assert split_text_for_tts("   ") == []
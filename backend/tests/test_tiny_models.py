@@ -0,0 +1,38 @@
+import os
+import torch
+from transformers import SpeechT5ForTextToSpeech, SpeechT5HifiGan, SpeechT5Processor
+from benchmarks.common import synthetic_speech
+from models import tiny_models
+from models.whisper_model import WhisperModel
+
+
+def test_tiny_whisper_runs_the_real_pipeline(tmp_path):
+    path = str(tmp_path / "whisper")
+    tiny_models.build_whisper(path)
+    model = WhisperModel(backend="eager", model_id=path)
+
+    texts = model.transcribe_batch([synthetic_speech(2), synthetic_speech(4, seed=1)])
+    assert all(isinstance(text, str) for text in texts)
+    assert isinstance(model.transcribe(synthetic_speech(1)), str)
+
+
+def test_tiny_models_are_built_once_under_the_tiny_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiny_models, "TINY_MODELS_DIR", str(tmp_path))
+    # Hub ids and other directories are left alone
+    assert tiny_models.ensure_tiny_model("microsoft/speecht5_tts") == "microsoft/speecht5_tts"
+    assert not os.listdir(tmp_path)
+
+    tts_path = tiny_models.ensure_tiny_model(str(tmp_path / "speecht5_tts"))
+    vocoder_path = tiny_models.ensure_tiny_model(str(tmp_path / "speecht5_hifigan"))
+    built_at = os.path.getmtime(os.path.join(tts_path, "config.json"))
+    assert tiny_models.ensure_tiny_model(tts_path) == tts_path
+    assert os.path.getmtime(os.path.join(tts_path, "config.json")) == built_at
+
+    # Character tokenizer, no sentencepiece needed
+    processor = SpeechT5Processor.from_pretrained(tts_path)
+    inputs = processor(text="Twinkle twinkle little star", return_tensors="pt")
+    with torch.no_grad():
+        speech = SpeechT5ForTextToSpeech.from_pretrained(tts_path).generate_speech(
+            inputs["input_ids"], torch.randn(1, 512), vocoder=SpeechT5HifiGan.from_pretrained(vocoder_path)
+        )
+    assert speech.ndim == 1 and len(speech) > 0
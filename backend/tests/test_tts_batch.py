@@ -0,0 +1,87 @@
+import asyncio
+import io
+import zipfile
+import httpx
+import numpy as np
+import pytest
+import soundfile as sf
+from models import tts_model
+from models.registry import model_registry
+from models.speaker_embeddings import SpeakerEmbeddingStore
+from models.tiny_models import build_hifigan, build_speecht5, build_tiny_voices
+from models.tts_cache import TTSAudioCache
+
+TEXTS = ["Chef", "Doctor", "Police officer", "How I wonder what you are"]
+
+
+@pytest.fixture(scope="module")
+def tts(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tts")
+    build_speecht5(str(path / "tts"))
+    build_hifigan(str(path / "vocoder"))
+    voices = SpeakerEmbeddingStore(str(path / "voices"))
+    build_tiny_voices(voices)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(tts_model, "TTS_MODEL_ID", str(path / "tts"))
+        monkeypatch.setattr(tts_model, "VOCODER_MODEL_ID", str(path / "vocoder"))
+        monkeypatch.setattr(tts_model, "speaker_embedding_store", voices)
+        yield tts_model.TTSModel(backend="eager")
+
+
+def test_batched_clips_match_single_synthesis(tts):
+    batched = tts.generate_batch([(text, "default") for text in TEXTS])
+    for text, clip in zip(TEXTS, batched):
+        single = tts.generate(text)
+        assert len(clip) == len(single), text
+        assert np.allclose(clip, single, atol=1e-4), text
+
+
+class CountingTTS:
+    """Counts the texts the batcher hands to the model"""
+    def __init__(self, model):
+        self.model = model
+        self.synthesized = []
+
+    def generate_batch(self, items):
+        self.synthesized += [text for text, _ in items]
+        return self.model.generate_batch(items)
+
+
+def test_batch_endpoint_returns_clips_in_order_and_reuses_the_cache(tts, tmp_path, monkeypatch):
+    import main
+    from routers import tts as tts_router
+
+    counting = CountingTTS(tts)
+    model_registry.provide("tts", counting)
+    monkeypatch.setattr(tts_router, "tts_audio_cache", TTSAudioCache(str(tmp_path / "cache")))
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def batch(texts):
+                return client.post("/api/tts/synthesize:batch", json={"texts": texts})
+
+            # The first clip is cached by a single-clip request
+            await client.post("/api/tts/synthesize", json={"text": TEXTS[1]})
+            return (
+                await batch(TEXTS),
+                await batch([]),
+                await batch(["Chef", " "]),
+                await batch(["Chef"] * 33),
+            )
+
+    response, empty, blank, oversized = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["000.wav", "001.wav", "002.wav", "003.wav"]
+        clips = [sf.read(io.BytesIO(archive.read(name)), dtype="float32")[0] for name in archive.namelist()]
+
+    assert [len(clip) for clip in clips] == [len(tts.generate(text)) for text in TEXTS]
+    # The cached clip was not synthesized again
+    assert counting.synthesized.count(TEXTS[1]) == 1
+    assert sorted(counting.synthesized) == sorted(TEXTS)
+
+    assert empty.status_code == 400 and blank.status_code == 400 and oversized.status_code == 400
@@ -0,0 +1,48 @@
+import os
+from models.tts_cache import TTSAudioCache, prewarm
+
+
+def test_keys_depend_on_text_voice_and_model():
+    key = TTSAudioCache.key("Chef", "default", "v1")
+    assert key == TTSAudioCache.key(" Chef ", "default", "v1")
+    assert key != TTSAudioCache.key("Chef", "other", "v1")
+    assert key != TTSAudioCache.key("Chef", "default", "v2")
+
+
+def test_disk_tier_survives_a_new_memory_tier(tmp_path):
+    key = TTSAudioCache.key("hello", "default", "v1")
+    TTSAudioCache(str(tmp_path)).put(key, b"RIFFdata")
+
+    cache = TTSAudioCache(str(tmp_path))
+    assert cache.get(key) == b"RIFFdata"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get(key) == b"RIFFdata"
+    assert cache.stats()["memory"]["hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), memory_items=0, disk_max_bytes=250)
+    keys = [TTSAudioCache.key(str(i), "default", "v1") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, b"x" * 100)
+        cache.wait_for_eviction()
+        os.utime(cache._path(key), (i, i))
+
+    cache.put(TTSAudioCache.key("new", "default", "v1"), b"x" * 100)
+    cache.wait_for_eviction()
+
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["disk_bytes"] <= 250
+
+
+def test_prewarm_only_synthesizes_missing_texts(tmp_path):
+    cache = TTSAudioCache(str(tmp_path))
+    calls = []
+
+    def synthesize(text):
+        calls.append(text)
+        return text.encode()
+
+    assert prewarm(["a", "b", "a", " "], synthesize, cache, "default", "v1") == 2
+    assert prewarm(["a", "b", "c"], synthesize, cache, "default", "v1") == 1
+    assert calls == ["a", "b", "c"]
@@ -0,0 +1,121 @@
+import asyncio
+import io
+import httpx
+import numpy as np
+import soundfile as sf
+from benchmarks.common import synthetic_recording, synthetic_speech
+from models.registry import model_registry
+from models.vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+
+
+def room_noise(seconds, seed=0):
+    return synthetic_recording([("silence", seconds)], seed=seed)
+
+
+def recording(*parts):
+    return synthetic_recording(parts)
+
+
+def test_edges_are_trimmed_and_long_pauses_shortened():
+    vad = EnergyVAD(padding_s=0.2, max_pause_s=0.6)
+    audio = recording(("silence", 1.5), ("speech", 1.0), ("silence", 2.0), ("speech", 1.0), ("silence", 1.5))
+
+    result = vad.trim(audio)
+    assert result.has_speech
+    # 2 s of speech, 0.2 s padding around each part, 0.6 s of the pause
+    assert abs(result.kept_s - 3.4) < 0.15
+    assert abs(result.removed_s - 3.6) < 0.15
+    assert vad.stats()["removed_s"] == round(result.removed_s, 3)
+
+
+def test_continuous_speech_is_kept_whole():
+    audio = synthetic_speech(3.0, seed=4)
+    assert EnergyVAD().trim(audio).kept_s >= 2.9
+
+
+def test_silent_and_empty_clips_are_rejected():
+    vad = EnergyVAD()
+    assert not vad.trim(room_noise(5.0)).has_speech
+    assert not vad.trim(np.zeros(SAMPLE_RATE * 2, dtype=np.float32)).has_speech
+    assert not vad.trim(np.zeros(0, dtype=np.float32)).has_speech
+    # A click is not speech
+    click = room_noise(3.0)
+    click[16000:16100] = 0.5
+    assert not vad.trim(click).has_speech
+    assert vad.stats()["rejected"] == 4
+
+
+class RecordingWhisper:
+    def __init__(self):
+        self.durations = []
+
+    def transcribe_batch(self, audio_inputs, languages=None):
+        self.durations += [len(audio) / SAMPLE_RATE for audio in audio_inputs]
+        return ["hello"] * len(audio_inputs)
+
+
+def noise_at(db, seconds=4.0):
+    return synthetic_recording([("silence", seconds)], noise_scale=10 ** (db / 20))
+
+
+def test_steady_noise_and_hum_are_rejected():
+    vad = EnergyVAD()
+    for db in (-50, -45, -40, -35, -30):
+        assert not vad.trim(noise_at(db)).has_speech, f"noise at {db} dBFS"
+
+    t = np.arange(SAMPLE_RATE * 4) / SAMPLE_RATE
+    hum = (0.01 * np.sqrt(2) * np.sin(2 * np.pi * 50 * t)).astype(np.float32) + noise_at(-60)
+    assert not vad.trim(hum).has_speech
+
+
+def test_speech_over_loud_room_noise_is_found():
+    vad = EnergyVAD(padding_s=0.2)
+    for db in (-45, -35):
+        audio = synthetic_recording([("silence", 1.5), ("speech", 1.5), ("silence", 1.5)], noise_scale=10 ** (db / 20))
+        result = vad.trim(audio)
+        assert result.has_speech and abs(result.kept_s - 1.9) < 0.15, f"noise at {db} dBFS"
+
+
+def test_quiet_speech_near_the_level_floor_is_kept():
+    vad = EnergyVAD(min_db=-40.0, padding_s=0.2)
+    speech = synthetic_speech(1.5, seed=3)
+    loud_db = np.percentile(vad.frame_levels(speech), 99)
+    for peak_db in (-38, -40, -42):
+        quiet = speech * 10 ** ((peak_db - loud_db) / 20)
+        audio = room_noise(4.5)
+        audio[24000:48000] += quiet
+        result = vad.trim(audio)
+        assert result.has_speech and abs(result.kept_s - 1.9) < 0.15, f"speech peaking at {peak_db} dBFS"
+
+    # Far under the floor it is silence, even in a very quiet room
+    audio = noise_at(-75, seconds=4.5)
+    audio[24000:48000] += speech * 10 ** ((-58 - loud_db) / 20)
+    assert not vad.trim(audio).has_speech
+
+
+def test_transcribe_skips_whisper_for_silence():
+    import main
+
+    whisper = RecordingWhisper()
+    model_registry.provide("stt", whisper)
+
+    def wav(audio):
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, SAMPLE_RATE, format="WAV")
+        return buffer.getvalue()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            silent = await client.post("/api/stt/transcribe", files={"file": ("a.wav", wav(room_noise(10.0)))})
+            spoken = await client.post("/api/stt/transcribe", files={
+                "file": ("b.wav", wav(recording(("silence", 2.0), ("speech", 1.5), ("silence", 3.0))))
+            })
+            return silent, spoken, (await client.get("/api/stt/stats")).json()
+
+    silent, spoken, stats = asyncio.run(run())
+    assert silent.json() == {"text": ""} and spoken.json() == {"text": "hello"}
+    assert len(whisper.durations) == 1 and whisper.durations[0] < 2.0
+    assert stats["vad"]["rejected"] >= 1 and stats["vad"]["removed_s"] >= 10.0
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from models.vector_index import ExactIndex, IVFIndex, build_vector_index
+
+
+def _unit_rows(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.normal(size=(n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_exact_top_k_matches_brute_force():
+    embeddings = _unit_rows(200)
+    queries = _unit_rows(5, seed=1)
+    scores, ids = ExactIndex(embeddings).search(queries, k=3)
+
+    expected = np.argsort(-(queries @ embeddings.T), axis=1)[:, :3]
+    np.testing.assert_array_equal(ids, expected)
+    assert np.all(scores[:, 0] >= scores[:, 1])
+
+
+def test_exact_search_respects_mask_and_pads():
+    embeddings = _unit_rows(50)
+    mask = np.zeros(50, dtype=bool)
+    mask[[3, 7]] = True
+
+    scores, ids = ExactIndex(embeddings).search(embeddings[10], k=4, mask=mask)
+
+    assert set(ids[0, :2]) == {3, 7}
+    assert list(ids[0, 2:]) == [-1, -1]
+    assert np.all(np.isneginf(scores[0, 2:]))
+
+
+def test_ivf_with_full_probe_is_exact():
+    embeddings = _unit_rows(500)
+    queries = _unit_rows(10, seed=2)
+    index = IVFIndex(embeddings, nlist=8, nprobe=8)
+
+    _, ivf_ids = index.search(queries, k=5)
+    _, exact_ids = ExactIndex(embeddings).search(queries, k=5)
+    np.testing.assert_array_equal(ivf_ids, exact_ids)
+
+
+def test_ivf_filtered_results_stay_inside_filter():
+    embeddings = _unit_rows(500)
+    mask = np.zeros(500, dtype=bool)
+    mask[::3] = True
+    index = IVFIndex(embeddings, nlist=8, nprobe=2, exact_filter_threshold=10)
+
+    _, ids = index.search(_unit_rows(4, seed=3), k=5, mask=mask)
+    assert np.all(mask[ids[ids >= 0]])
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        build_vector_index(_unit_rows(10), backend="nope")
@@ -0,0 +1,84 @@
+import asyncio
+import io
+import httpx
+import pytest
+import soundfile as sf
+from benchmarks.common import synthetic_recording
+from models.registry import model_registry
+from models.tiny_models import build_whisper
+from models.whisper_model import WhisperModel, whisper_language
+
+
+@pytest.fixture(scope="module")
+def whisper(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("models") / "whisper")
+    build_whisper(path)
+    return WhisperModel(backend="eager", model_id=path)
+
+
+def test_language_tags_map_to_whisper_codes():
+    assert whisper_language("en-SG") == "en"
+    assert whisper_language("zh_CN") == "zh"
+    assert whisper_language("Japanese") == "ja"
+    assert whisper_language(None) is None
+    with pytest.raises(ValueError):
+        whisper_language("xx-YY")
+
+
+def test_batched_scores_match_scoring_each_candidate_alone(whisper):
+    audio = synthetic_recording([("speech", 1.5)])
+    candidates = ["isha", "omawarisan", "keisatsu kan"]
+
+    ranked = whisper.score_candidates(audio, candidates, "ja")
+    assert sorted(c["text"] for c in ranked) == sorted(candidates)
+    assert [c["log_likelihood"] for c in ranked] == sorted((c["log_likelihood"] for c in ranked), reverse=True)
+    assert abs(sum(c["probability"] for c in ranked) - 1) < 1e-5
+
+    # Padding to the longest candidate does not change anyone's score
+    for candidate in ranked:
+        alone = whisper.score_candidates(audio, [candidate["text"]], "ja")[0]
+        assert abs(alone["log_likelihood"] - candidate["log_likelihood"]) < 1e-3
+
+    # Several requests in one batch score as they do on their own
+    other = synthetic_recording([("speech", 2.5)], seed=3)
+    batched = whisper.score_candidates_batch([(audio, candidates, "ja"), (other, ["doctor", "chef"], "en")])
+    assert batched[0] == pytest.approx(ranked, rel=1e-4)
+    assert batched[1] == pytest.approx(whisper.score_candidates(other, ["doctor", "chef"], "en"), rel=1e-4)
+
+
+def test_verify_endpoint_and_language_hint(whisper):
+    import main
+
+    model_registry.provide("stt", whisper)
+
+    def wav(audio):
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, 16000, format="WAV")
+        return buffer.getvalue()
+
+    spoken = wav(synthetic_recording([("silence", 1.0), ("speech", 1.2), ("silence", 1.0)]))
+    silent = wav(synthetic_recording([("silence", 3.0)]))
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def verify(audio, language, candidates):
+                return client.post("/api/stt/verify", files={"file": ("a.wav", audio)},
+                                   data={"language": language, "candidates": candidates})
+
+            return (
+                await verify(spoken, "ja-JP", ["isha", "sensei", "isha "]),
+                await verify(silent, "ja-JP", ["isha"]),
+                await verify(spoken, "klingon", ["isha"]),
+                await verify(spoken, "ja", ["isha", ""]),
+                await client.post("/api/stt/transcribe", files={"file": ("a.wav", spoken)}, data={"language": "ko-KR"}),
+            )
+
+    verified, no_speech, bad_language, empty_candidate, transcribed = asyncio.run(run())
+    body = verified.json()
+    assert verified.status_code == 200 and body["language"] == "ja" and body["speech"]
+    assert sorted(c["text"] for c in body["candidates"]) == ["isha", "sensei"]
+    assert body["best"] == body["candidates"][0]["text"]
+    assert no_speech.json() == {"language": "ja", "speech": False, "best": None, "candidates": []}
+    assert bad_language.status_code == 400 and empty_candidate.status_code == 400
+    assert transcribed.status_code == 200 and isinstance(transcribed.json()["text"], str)
@@ -58,7 +58,7 @@ export async function getSongs(): Promise<Song[]> {
     return await response.json();
 }
 
-export async function startLyricsPractice(songId: string): Promise<{ song_id: string }> {
+export async function startLyricsPractice(songId: string): Promise<{ song_id: string; session_id: string }> {
     const response = await fetch(`${API_BASE_URL}/api/lyrics/start`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -68,12 +68,13 @@ export async function startLyricsPractice(songId: string): Promise<{ song_id: st
     return await response.json();
 }
 
-export async function getNextLine(sungLyrics: string): Promise<NextLineResponse> {
+export async function getNextLine(sungLyrics: string, sessionId?: string): Promise<NextLineResponse> {
     const response = await fetch(`${API_BASE_URL}/api/lyrics/next`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
-            sung_lyrics: sungLyrics
+            sung_lyrics: sungLyrics,
+            session_id: sessionId
         }),
     });
     if (!response.ok) throw new Error('Failed to get next line');